@@ -0,0 +1,372 @@
+#!/usr/bin/env python
+
+"""Smartphone Framework Forensics
+    End-to-end benchmark of the modules.
+    Copyright (C) 2017  Sergio A. Nevarez
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+    Runs each module with each output format in a new process
+    (sff.py run) and measures its wall time and peak resident set
+    size. The backup is either given or generated with
+    generate_backup.py. The files written to the output directory by
+    each run are removed after it, except the caches (output/cache),
+    so the search indexes are only built by the first run that
+    uses them.
+
+    The results can be saved to a JSON file and compared with the
+    results of a previous run (the baseline). A benchmark regressed
+    if its wall time or peak RSS grew by more than the threshold.
+    The exit status is 1 if any benchmark failed or regressed.
+
+    Usage: python benchmarks/bench_end_to_end.py
+               [--backup-dir DIR | --messages N --contacts N ...]
+               [--output results.json] [--baseline baseline.json]
+"""
+
+# Parser for command-line options, arguments and sub-commands
+# https://docs.python.org/2/library/argparse.html
+import argparse
+# JSON encoder and decoder
+# https://docs.python.org/2/library/json.html
+import json
+# Miscellaneous operating system interfaces
+# https://docs.python.org/2/library/os.html
+import os
+# Access to underlying platform's identifying data
+# https://docs.python.org/2/library/platform.html
+import platform
+# High-level file operations
+# https://docs.python.org/2/library/shutil.html
+import shutil
+# Subprocess management
+# https://docs.python.org/2/library/subprocess.html
+import subprocess
+# System-specific parameters and functions
+# https://docs.python.org/2/library/sys.html
+import sys
+# Generate temporary files and directories
+# https://docs.python.org/2/library/tempfile.html
+import tempfile
+# Time access and conversions
+# https://docs.python.org/2/library/time.html
+import time
+
+APP_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, APP_PATH)
+
+# Generator of synthetic iOS backups
+from benchmarks import generate_backup
+# The db module includes the code to run queries on sqlite databases.
+from lib.common.db.sqlite import db
+# The backup module includes the index of the files of iOS backups.
+from lib.common.mobile.ios import backup
+# The ioscontants module contains the names of important iOS backup files.
+from lib.common.mobile.ios import iosconstants
+
+# Version of the format of the results file.
+RESULTS_VERSION = 1
+
+# Output formats measured by default. The pdf format needs wkhtmltopdf.
+DEFAULT_FORMATS = ["stdout", "csv", "jsonl", "html", "sqlite"]
+
+# Differences in wall time below this many seconds are never
+# reported as regressions (noise of short runs).
+MIN_WALL_TIME_DIFFERENCE = 0.1
+
+# Runs a command and prints its wall time, peak RSS and exit status.
+# On Linux, a forked process starts with the peak RSS of its parent,
+# so commands are started from this small process instead of from the
+# benchmark (which may have generated a backup in memory).
+MEASURE_SCRIPT = "import os, resource, subprocess, sys, time; " \
+    + "start = time.time(); " \
+    + "status = subprocess.call(sys.argv[1:], " \
+    + "stdout = open(os.devnull, 'w')); " \
+    + "print time.time() - start, " \
+    + "resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss, status"
+
+# Benchmarks: (name, module ID, options). Every benchmark
+# with an OUTPUT_FORMAT of None is run once per output format.
+BENCHMARKS = [
+    ("contacts/list", "1", [("OUTPUT_FORMAT", None)]),
+    ("contacts/list keywords", "1",
+        [("OUTPUT_FORMAT", "stdout"), ("KEYWORDS", "smith,555-0001")]),
+    ("messages/list", "3",
+        [("OUTPUT_FORMAT", None), ("SHOW_CONTACT_INFO", "false")]),
+    ("messages/list contact info", "3",
+        [("OUTPUT_FORMAT", "stdout"), ("SHOW_CONTACT_INFO", "true")]),
+    ("messages/extract_conversations", "2",
+        [("OUTPUT_FORMAT", None), ("CONVERSATION_IDS", None),
+         ("SHOW_CONTACT_INFO", "true")]),
+    ("messages/extract_conversations keywords", "2",
+        [("OUTPUT_FORMAT", "stdout"), ("CONVERSATION_IDS", None),
+         ("KEYWORDS", "lunch,caf\xc3\xa9")]),
+    ("messages/extract_conversations search index", "2",
+        [("OUTPUT_FORMAT", "stdout"), ("CONVERSATION_IDS", None),
+         ("KEYWORDS", "lunch,caf\xc3\xa9"), ("SEARCH_INDEX", "true")]),
+    ("messages/search", "4",
+        [("OUTPUT_FORMAT", "stdout"), ("KEYWORDS", "lunch,caf\xc3\xa9"),
+         ("LIMIT", "0")])
+]
+
+def compare(results, baseline, threshold):
+    """Compare the results with the results of a previous run.
+
+    Args:
+      results: Results of this run (see run_benchmarks).
+      baseline: Results of the previous run.
+      threshold: Maximum relative growth (e.g., 0.25 for 25%).
+
+    Returns:
+      The names of the benchmarks that regressed.
+    """
+    previous = dict([(r["name"], r) for r in baseline["results"]])
+    regressions = []
+    print
+    print "%-52s %9s %9s %8s %9s %8s" % ("Compared with baseline",
+        "wall (s)", "baseline", "change", "RSS (MB)", "change")
+    for r in results:
+        b = previous.get(r["name"])
+        if (b is None or r["returncode"] != 0 or b["returncode"] != 0):
+            continue
+        wall_change = _get_change(r["wall_time"], b["wall_time"])
+        rss_change = _get_change(r["peak_rss_kb"], b["peak_rss_kb"])
+        status = ""
+        if ((wall_change > threshold and r["wall_time"] - b["wall_time"]
+                > MIN_WALL_TIME_DIFFERENCE)
+            or rss_change > threshold):
+            status = "REGRESSION"
+            regressions.append(r["name"])
+        print "%-52s %9.2f %9.2f %+7.0f%% %9.1f %+7.0f%% %s" % (r["name"],
+            r["wall_time"], b["wall_time"], wall_change * 100,
+            r["peak_rss_kb"] / 1024.0, rss_change * 100, status)
+    return regressions
+
+def get_conversation_ids(backup_dir):
+    """Get the range with the IDs of all the conversations of a backup."""
+    sms_db_path = backup.get_backup_index(backup_dir).get_path(
+        iosconstants.Backup.HOME_DOMAIN,
+        iosconstants.Backup.MESSAGES_DB_RELATIVE_PATH)
+    r = db.query(sms_db_path, "SELECT min(rowid), max(rowid) FROM chat")[0]
+    db.close_all()
+    return "%d-%d" % r
+
+def measure(args):
+    """Run a command and measure its wall time and peak RSS.
+
+    Returns:
+      (wall time in seconds, peak RSS in KB, exit status,
+      last line of stderr) tuple.
+    """
+    process = subprocess.Popen(
+        [sys.executable, "-c", MEASURE_SCRIPT] + args, cwd = APP_PATH,
+        stdout = subprocess.PIPE, stderr = subprocess.PIPE)
+    stdout, stderr = process.communicate()
+    wall_time, peak_rss, status = stdout.split()
+    peak_rss = int(peak_rss)
+    if (sys.platform == "darwin"):
+        # Bytes instead of KB
+        peak_rss /= 1024
+    error = ""
+    if (stderr.strip() != ""):
+        error = stderr.strip().splitlines()[-1]
+    return (float(wall_time), peak_rss, int(status), error)
+
+def run_benchmarks(backup_dir, formats, repeat):
+    """Run every benchmark.
+
+    Args:
+      backup_dir: Path to the iOS backup.
+      formats: Output formats of the benchmarks that
+               are run once per output format.
+      repeat: Number of runs of each benchmark. The fastest
+              wall time and the highest peak RSS are kept.
+
+    Returns:
+      List of dictionaries with the results of each benchmark.
+    """
+    conversation_ids = get_conversation_ids(backup_dir)
+    output_dir = os.path.join(APP_PATH, "output")
+    results = []
+    print "%-52s %9s %9s" % ("Benchmark", "wall (s)", "RSS (MB)")
+    for name, module, options in BENCHMARKS:
+        output_formats = [o[1] for o in options if o[0] == "OUTPUT_FORMAT"]
+        if (output_formats[0] is None):
+            output_formats = formats
+        for output_format in output_formats:
+            args = [sys.executable, os.path.join(APP_PATH, "sff.py"),
+                "run", module, "--set", "BACKUP_DIR=" + backup_dir,
+                "--set", "OUTPUT_FILE_NAME_PREFIX=bench"]
+            if (output_format == "sqlite"):
+                args.extend(["--set", "CASE_DATABASE=bench_case.db"])
+            for option, value in options:
+                if (option == "OUTPUT_FORMAT"):
+                    value = output_format
+                elif (option == "CONVERSATION_IDS"):
+                    value = conversation_ids
+                args.extend(["--set", option + "=" + value])
+            wall_times = []
+            peak_rss = 0
+            returncode = 0
+            error = ""
+            for i in range(repeat):
+                files = _list_output_files(output_dir)
+                r = measure(args)
+                _remove_output_files(output_dir, files)
+                wall_times.append(r[0])
+                peak_rss = max(peak_rss, r[1])
+                returncode = returncode or r[2]
+                error = error or r[3]
+            result = {
+                "name": name + " (" + output_format + ")",
+                "module": module,
+                "output_format": output_format,
+                "wall_time": min(wall_times),
+                "peak_rss_kb": peak_rss,
+                "returncode": returncode
+            }
+            results.append(result)
+            status = ""
+            if (returncode != 0):
+                status = "FAILED (exit status %d) %s" % (returncode, error)
+            print "%-52s %9.2f %9.1f %s" % (result["name"],
+                result["wall_time"], peak_rss / 1024.0, status)
+    return results
+
+def _get_change(value, baseline_value):
+    """Get the relative change of a value (e.g., 0.1 for +10%)."""
+    if (baseline_value == 0):
+        return 0.0
+    return (value - baseline_value) / float(baseline_value)
+
+def _get_git_commit():
+    """Get the commit of the working tree (None if unknown)."""
+    try:
+        with open(os.devnull, "w") as devnull:
+            return subprocess.check_output(["git", "rev-parse", "HEAD"],
+                cwd = APP_PATH, stderr = devnull).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _list_output_files(output_dir):
+    """List the files in the output directory."""
+    if (not os.path.isdir(output_dir)):
+        return set()
+    return set(os.listdir(output_dir))
+
+def _parse_args():
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(
+        description = "Run the modules end to end and measure " \
+            + "their wall time and peak RSS.")
+    parser.add_argument("--backup-dir",
+        help = "iOS backup to use. If not given, a backup is " \
+            + "generated in a temporary directory.")
+    parser.add_argument("--messages", type = int, default = 100000,
+        help = "Number of messages of the generated backup " \
+            + "(default: %(default)s).")
+    parser.add_argument("--chats", type = int, default = 1000,
+        help = "Number of conversations of the generated backup " \
+            + "(default: %(default)s).")
+    parser.add_argument("--contacts", type = int, default = 5000,
+        help = "Number of contacts of the generated backup " \
+            + "(default: %(default)s).")
+    parser.add_argument("--attachment-rate", type = float, default = 0.05,
+        help = "Fraction of the messages with an attachment in the " \
+            + "generated backup (default: %(default)s).")
+    parser.add_argument("--formats", default = ",".join(DEFAULT_FORMATS),
+        help = "Comma-separated list of output formats " \
+            + "(default: %(default)s).")
+    parser.add_argument("--repeat", type = int, default = 1,
+        help = "Number of runs of each benchmark (default: %(default)s).")
+    parser.add_argument("--output",
+        help = "Save the results to this JSON file.")
+    parser.add_argument("--baseline",
+        help = "Compare the results with this JSON file.")
+    parser.add_argument("--threshold", type = float, default = 0.25,
+        help = "Relative growth of the wall time or peak RSS that is " \
+            + "reported as a regression (default: %(default)s).")
+    return parser.parse_args()
+
+def _remove_output_files(output_dir, previous_files):
+    """Remove the files written to the output directory by a run.
+
+    The caches (output/cache) are kept.
+
+    Args:
+      output_dir: Path to the output directory.
+      previous_files: Files in the output directory before the run.
+    """
+    for name in _list_output_files(output_dir) - previous_files:
+        path = os.path.join(output_dir, name)
+        if (name == "cache"):
+            continue
+        if (os.path.isdir(path)):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+
+def main():
+    args = _parse_args()
+    baseline = None
+    if (args.baseline is not None):
+        with open(args.baseline, "r") as baseline_file:
+            baseline = json.load(baseline_file)
+        if (baseline.get("version") != RESULTS_VERSION):
+            print "Error: '%s' is not a results file of this version." \
+                % args.baseline
+            sys.exit(1)
+    backup_dir = args.backup_dir
+    generated = None
+    temp_dir = None
+    if (backup_dir is None):
+        temp_dir = tempfile.mkdtemp(prefix = "sff_bench_")
+        backup_dir = os.path.join(temp_dir, "backup")
+        print "Generating backup in %s..." % backup_dir
+        generated = generate_backup.BackupGenerator(backup_dir).generate(
+            args.messages, args.chats, args.contacts, args.attachment_rate)
+    cache_dir = os.path.join(APP_PATH, "output", "cache")
+    cache_files = _list_output_files(cache_dir)
+    try:
+        results = run_benchmarks(os.path.abspath(backup_dir),
+            args.formats.split(","), max(1, args.repeat))
+    finally:
+        if (temp_dir is not None):
+            shutil.rmtree(temp_dir)
+            # The indexes of the generated backup are not used again.
+            _remove_output_files(cache_dir, cache_files)
+
+    regressions = []
+    if (baseline is not None):
+        regressions = compare(results, baseline, args.threshold)
+    if (args.output is not None):
+        with open(args.output, "w") as output_file:
+            json.dump({
+                "version": RESULTS_VERSION,
+                "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "git_commit": _get_git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "backup_dir": args.backup_dir,
+                "generated_backup": generated,
+                "results": results
+            }, output_file, indent = 2, sort_keys = True)
+        print "Results saved to: " + args.output
+    failed = [r["name"] for r in results if r["returncode"] != 0]
+    if (len(failed) > 0 or len(regressions) > 0):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+"""Smartphone Framework Forensics
+    Benchmark of the decoding of message bodies.
+    Copyright (C) 2017  Sergio A. Nevarez
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+    Compares the per-message cost of the previous decoding
+    (hex-encode the text, split on the hex string 'efbfbc' and
+    unhexlify every piece) with messages_helper.decode_message().
+
+    Usage: python benchmarks/bench_message_decoder.py [num_messages]
+"""
+
+# Convert between binary and ASCII
+# https://docs.python.org/2/library/binascii.html
+import binascii
+# Miscellaneous operating system interfaces
+# https://docs.python.org/2/library/os.html
+import os
+# Regular expression operations
+# https://docs.python.org/2/library/re.html
+import re
+# System-specific parameters and functions
+# https://docs.python.org/2/library/sys.html
+import sys
+# Measure execution time of small code snippets
+# https://docs.python.org/2/library/timeit.html
+import timeit
+
+sys.path.insert(0,
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Helper methods to decode messages from the SMS/iMessage database
+from lib.common.mobile.ios import messages_helper
+
+def hex_decode(text, attachments):
+    """Previous decoding of a message body (hex round trip)."""
+    result = re.split(r"efbfbc", binascii.hexlify(text.encode("utf-8")))
+    for i in range(len(result)):
+        result[i] = binascii.unhexlify(result[i]).decode("utf-8")
+        if (i > 0 and i <= len(attachments)):
+            result[i] = attachments[i - 1].transfer_name + result[i]
+    return "".join(result)
+
+def unicode_decode(text, attachments):
+    """Decoding of a message body with decode_message()."""
+    return "".join(
+        [p.value if (p.type == messages_helper.TEXT)
+            else p.value.transfer_name
+            for p in messages_helper.decode_message(text, attachments)])
+
+def get_messages(num_messages):
+    """Create a list of (text, attachments) tuples to decode.
+
+    One in ten messages has an attachment.
+    """
+    attachment = messages_helper.Attachment(
+        "image/jpeg", "~/Library/SMS/Attachments/00/00/IMG_0001.JPG",
+        "IMG_0001.JPG", 1024)
+    messages = []
+    for i in range(num_messages):
+        text = u"Message %d with some text and an accent: caf\xe9. " % i * 3
+        if (i % 10 == 0):
+            messages.append(
+                (messages_helper.OBJECT_REPLACEMENT_CHARACTER + text,
+                    [attachment]))
+        else:
+            messages.append((text, []))
+    return messages
+
+def main():
+    num_messages = 100000
+    if (len(sys.argv) > 1):
+        num_messages = int(sys.argv[1])
+    messages = get_messages(num_messages)
+    for name, decode in [("hex round trip", hex_decode),
+                         ("decode_message", unicode_decode)]:
+        seconds = min(timeit.repeat(
+            lambda: [decode(t, a) for t, a in messages],
+            repeat = 3, number = 1))
+        print "%-15s %8.3f s  %6.2f us/message" \
+            % (name, seconds, seconds * 1000000 / num_messages)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+"""Smartphone Framework Forensics
+    Benchmark of the startup time of the framework.
+    Copyright (C) 2017  Sergio A. Nevarez
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+    Measures, in new interpreter processes:
+      * Time to prompt: start the interactive menu and exit.
+      * Time to first run: run a module with stdout output
+        (only if a backup directory is given).
+      * Import time of each third-party dependency and whether
+        it is imported at startup.
+
+    Usage: python benchmarks/bench_startup.py [backup_dir] [repeat]
+"""
+
+# Miscellaneous operating system interfaces
+# https://docs.python.org/2/library/os.html
+import os
+# Subprocess management
+# https://docs.python.org/2/library/subprocess.html
+import subprocess
+# System-specific parameters and functions
+# https://docs.python.org/2/library/sys.html
+import sys
+# Time access and conversions
+# https://docs.python.org/2/library/time.html
+import time
+
+APP_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Third-party modules that should only be imported when used.
+DEPENDENCIES = ["pdfkit", "phonenumbers"]
+
+# Module runs measured by the "first run" benchmark.
+# The output format is stdout and contact information is off, so
+# none of the pdf or phone number dependencies are needed.
+RUNS = [
+    ["1"],
+    ["3", "--set", "SHOW_CONTACT_INFO=false"],
+    ["2", "--set", "OUTPUT_FORMAT=stdout", "--set", "CONVERSATION_IDS=1"]
+]
+
+def measure(args, repeat, stdin = ""):
+    """Run a command and return the fastest wall time in seconds."""
+    times = []
+    with open(os.devnull, "w") as devnull:
+        for i in range(repeat):
+            start = time.time()
+            process = subprocess.Popen(args, cwd = APP_PATH,
+                stdin = subprocess.PIPE, stdout = devnull, stderr = devnull)
+            process.communicate(stdin)
+            times.append(time.time() - start)
+    return min(times)
+
+def main():
+    backup_dir = None
+    repeat = 5
+    if (len(sys.argv) > 1):
+        backup_dir = sys.argv[1]
+    if (len(sys.argv) > 2):
+        repeat = int(sys.argv[2])
+    python = sys.executable
+    sff = os.path.join(APP_PATH, "sff.py")
+
+    interpreter = measure([python, "-c", "pass"], repeat)
+    print "%-40s %8.1f ms" % ("interpreter", interpreter * 1000)
+    print "%-40s %8.1f ms" % ("time to prompt",
+        measure([python, sff], repeat, "exit\n") * 1000)
+    if (backup_dir is not None):
+        for run in RUNS:
+            args = [python, sff, "run", run[0],
+                "--set", "BACKUP_DIR=" + backup_dir] + run[1:]
+            print "%-40s %8.1f ms" % ("time to first run (module %s)" % run[0],
+                measure(args, repeat) * 1000)
+
+    # Dependencies imported by starting the interactive menu
+    loaded = subprocess.check_output([python, "-c",
+        "import sys; sys.path.insert(0, %r); " % APP_PATH
+        + "from sff.core.base import Forensics; Forensics(); "
+        + "print ','.join(sorted(sys.modules))"], cwd = APP_PATH)
+    loaded = loaded.strip().split(",")
+    for d in DEPENDENCIES:
+        seconds = measure([python, "-c", "import " + d], repeat)
+        print "%-40s %8.1f ms  (imported at startup: %s)" \
+            % ("import " + d, (seconds - interpreter) * 1000,
+                "yes" if d in loaded else "no")
+
+if __name__ == "__main__":
+    main()
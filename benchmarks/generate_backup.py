@@ -0,0 +1,568 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Smartphone Framework Forensics
+    Generator of synthetic iOS backups.
+    Copyright (C) 2017  Sergio A. Nevarez
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+    Writes an unencrypted iOS backup with:
+      * sms.db: chats (one to one and group chats), handles (phone
+        numbers and email addresses), messages and attachments, with
+        the tables and indexes of the iOS SMS/iMessage database.
+      * AddressBook.sqlitedb: contacts with phone numbers and email
+        addresses. Most handles belong to a contact.
+      * The attachment files, stored under the name (SHA-1 hash)
+        that iOS backups use.
+    iOS 10+ backups (default) list the files in Manifest.db and store
+    them in subdirectories. Flat backups have no manifest.
+    The content is random but reproducible (see --seed). Conversation
+    sizes are skewed, so a few conversations have most of the messages.
+
+    Usage: python benchmarks/generate_backup.py <backup_dir>
+               [--messages N] [--chats N] [--contacts N] ...
+"""
+
+# Parser for command-line options, arguments and sub-commands
+# https://docs.python.org/2/library/argparse.html
+import argparse
+# Efficient arbitrary-length iteration
+# https://docs.python.org/2/library/itertools.html
+import itertools
+# Miscellaneous operating system interfaces
+# https://docs.python.org/2/library/os.html
+import os
+# Generate pseudo-random numbers
+# https://docs.python.org/2/library/random.html
+import random
+# DB-API 2.0 interface for SQLite databases
+# https://docs.python.org/2/library/sqlite3.html
+import sqlite3
+# System-specific parameters and functions
+# https://docs.python.org/2/library/sys.html
+import sys
+# Time access and conversions
+# https://docs.python.org/2/library/time.html
+import time
+
+sys.path.insert(0,
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The backup module includes the index of the files of iOS backups.
+from lib.common.mobile.ios import backup
+# The ioscontants module contains the names of important iOS backup files.
+from lib.common.mobile.ios import iosconstants
+# Helper methods to decode messages from the SMS/iMessage database
+from lib.common.mobile.ios import messages_helper
+
+# Date of the first message (2016-01-01 00:00:00 UTC) in seconds
+# since 2001-01-01 (the format of message.date).
+FIRST_DATE = 473385600
+
+# Maximum number of seconds between two messages.
+MAX_DATE_STEP = 600
+
+# Number of messages inserted with each executemany call.
+BATCH_SIZE = 10000
+
+# Fraction of the chats that are group chats.
+GROUP_CHAT_RATE = 0.1
+
+# Fraction of the handles that are email addresses.
+EMAIL_RATE = 0.3
+
+# Fraction of the handles that belong to a contact.
+KNOWN_HANDLE_RATE = 0.8
+
+FIRST_NAMES = [u"Alice", u"Bob", u"Carol", u"David", u"Eve", u"Frank",
+    u"Grace", u"Heidi", u"Iván", u"José", u"Judy", u"Mallory", u"Oscar",
+    u"Peggy", u"Renée", u"Sybil", u"Trent", u"Victor", u"Walter", u"Zoë"]
+LAST_NAMES = [u"Brown", u"García", u"Jones", u"Miller", u"Müller",
+    u"Nevarez", u"Nguyen", u"O'Brien", u"Smith", u"Taylor", u"Williams",
+    u"Wilson", u"张"]
+ORGANIZATIONS = [None, None, None, u"ACME", u"Globex", u"Initech",
+    u"Umbrella"]
+WORDS = [u"the", u"meeting", u"is", u"at", u"noon", u"see", u"you",
+    u"there", u"ok", u"thanks", u"call", u"me", u"later", u"café",
+    u"tomorrow", u"running", u"late", u"😀", u"👍", u"where", u"are",
+    u"lunch", u"sounds", u"good", u"sent", u"the", u"photo", u"home",
+    u"on", u"my", u"way", u"¿qué", u"tal?", u"<b>", u"&", u"love"]
+LABELS = [u"_$!<Mobile>!$_", u"_$!<Home>!$_", u"_$!<Work>!$_", u"iPhone"]
+
+# Properties of the Address Book entries.
+PHONE_PROPERTY = 3
+EMAIL_PROPERTY = 4
+
+# Attachments: (mime type, file name format, uti).
+ATTACHMENT_TYPES = [
+    ("image/png", "IMG_%04d.PNG", "public.png"),
+    ("image/png", "IMG_%04d.PNG", "public.png"),
+    ("image/png", "IMG_%04d.PNG", "public.png"),
+    ("video/quicktime", "IMG_%04d.MOV", "com.apple.quicktime-movie"),
+    ("application/pdf", "Document_%04d.pdf", "com.adobe.pdf")
+]
+
+# A 1x1 PNG image. The data of image attachments starts with it,
+# so they can be displayed.
+PNG_IMAGE = "89504e470d0a1a0a0000000d4948445200000001000000010806000000" \
+    "1f15c4890000000d4944415478da63f8ffff3f0005fe02fea7d1a4cf0000000049" \
+    "454e44ae426082".decode("hex")
+
+SMS_SCHEMA = """
+CREATE TABLE handle (ROWID INTEGER PRIMARY KEY AUTOINCREMENT UNIQUE,
+    id TEXT NOT NULL, country TEXT, service TEXT NOT NULL,
+    uncanonicalized_id TEXT, person_centric_id TEXT,
+    UNIQUE (id, service));
+CREATE TABLE chat (ROWID INTEGER PRIMARY KEY AUTOINCREMENT,
+    guid TEXT UNIQUE NOT NULL, style INTEGER, state INTEGER,
+    account_id TEXT, properties BLOB, chat_identifier TEXT,
+    service_name TEXT, room_name TEXT, account_login TEXT,
+    is_archived INTEGER DEFAULT 0, last_addressed_handle TEXT,
+    display_name TEXT, group_id TEXT, is_filtered INTEGER,
+    successful_query INTEGER);
+CREATE TABLE message (ROWID INTEGER PRIMARY KEY AUTOINCREMENT,
+    guid TEXT UNIQUE NOT NULL, text TEXT, replace INTEGER DEFAULT 0,
+    service_center TEXT, handle_id INTEGER DEFAULT 0, subject TEXT,
+    country TEXT, attributedBody BLOB, version INTEGER DEFAULT 0,
+    type INTEGER DEFAULT 0, service TEXT, account TEXT,
+    account_guid TEXT, error INTEGER DEFAULT 0, date INTEGER,
+    date_read INTEGER, date_delivered INTEGER,
+    is_delivered INTEGER DEFAULT 0, is_finished INTEGER DEFAULT 0,
+    is_emote INTEGER DEFAULT 0, is_from_me INTEGER DEFAULT 0,
+    is_empty INTEGER DEFAULT 0, is_read INTEGER DEFAULT 0,
+    is_sent INTEGER DEFAULT 0, cache_has_attachments INTEGER DEFAULT 0,
+    cache_roomnames TEXT);
+CREATE TABLE attachment (ROWID INTEGER PRIMARY KEY AUTOINCREMENT,
+    guid TEXT UNIQUE NOT NULL, created_date INTEGER DEFAULT 0,
+    start_date INTEGER DEFAULT 0, filename TEXT, uti TEXT,
+    mime_type TEXT, transfer_state INTEGER DEFAULT 0,
+    is_outgoing INTEGER DEFAULT 0, user_info BLOB, transfer_name TEXT,
+    total_bytes INTEGER DEFAULT 0);
+CREATE TABLE chat_handle_join (chat_id INTEGER REFERENCES chat (ROWID)
+    ON DELETE CASCADE, handle_id INTEGER REFERENCES handle (ROWID)
+    ON DELETE CASCADE, UNIQUE(chat_id, handle_id));
+CREATE TABLE chat_message_join (chat_id INTEGER REFERENCES chat (ROWID)
+    ON DELETE CASCADE, message_id INTEGER REFERENCES message (ROWID)
+    ON DELETE CASCADE, message_date INTEGER DEFAULT 0,
+    PRIMARY KEY (chat_id, message_id));
+CREATE TABLE message_attachment_join (message_id INTEGER
+    REFERENCES message (ROWID) ON DELETE CASCADE, attachment_id INTEGER
+    REFERENCES attachment (ROWID) ON DELETE CASCADE,
+    UNIQUE(message_id, attachment_id));
+CREATE INDEX message_idx_handle ON message(handle_id, date);
+CREATE INDEX message_idx_date ON message(date);
+CREATE INDEX chat_message_join_idx_message_id_only
+    ON chat_message_join(message_id);
+CREATE INDEX chat_message_join_idx_message_date_id_chat_id
+    ON chat_message_join(chat_id, message_date, message_id);
+CREATE INDEX message_attachment_join_idx_message_id
+    ON message_attachment_join(message_id);
+CREATE INDEX chat_handle_join_idx_handle_id ON chat_handle_join(handle_id);
+"""
+
+CONTACTS_SCHEMA = """
+CREATE TABLE ABPerson (ROWID INTEGER PRIMARY KEY AUTOINCREMENT,
+    First TEXT, Last TEXT, Middle TEXT, FirstPhonetic TEXT,
+    MiddlePhonetic TEXT, LastPhonetic TEXT, Organization TEXT,
+    Department TEXT, Note TEXT, Kind INTEGER, Birthday TEXT,
+    JobTitle TEXT, Nickname TEXT, Prefix TEXT, Suffix TEXT,
+    FirstSort TEXT, LastSort TEXT, CreationDate INTEGER,
+    ModificationDate INTEGER);
+CREATE TABLE ABMultiValue (UID INTEGER PRIMARY KEY, record_id INTEGER,
+    property INTEGER, identifier INTEGER, label INTEGER, value TEXT);
+CREATE TABLE ABMultiValueLabel (value TEXT, UNIQUE(value));
+CREATE INDEX ABMultiValueRecordIDIndex ON ABMultiValue(record_id);
+"""
+
+MANIFEST_SCHEMA = """
+CREATE TABLE Files (fileID TEXT PRIMARY KEY, domain TEXT,
+    relativePath TEXT, flags INTEGER, file BLOB);
+CREATE INDEX FilesDomainIdx ON Files(domain);
+CREATE INDEX FilesRelativePathIdx ON Files(relativePath);
+"""
+
+class BackupGenerator(object):
+    """Writer of a synthetic iOS backup.
+
+    Attributes:
+      backup_dir: Path to the backup.
+      nested: Whether files are stored in subdirectories and
+              listed in Manifest.db (iOS 10+) or not.
+      files: (file ID, domain, relative path) tuples of the
+             files written to the backup.
+    """
+    def __init__(self, backup_dir, nested = True, seed = 0):
+        """Initializes the generator.
+
+        Args:
+          backup_dir: Path to the backup. It is created if needed.
+          nested: Write an iOS 10+ backup (see above).
+          seed: Seed of the random content.
+        """
+        self.backup_dir = backup_dir
+        self.nested = nested
+        self.files = []
+        self._random = random.Random(seed)
+        if (not os.path.isdir(backup_dir)):
+            os.makedirs(backup_dir)
+
+    def generate(self, num_messages, num_chats, num_contacts,
+        attachment_rate = 0.05, attachment_size = 4096,
+        nanoseconds = True):
+        """Write the backup.
+
+        Args:
+          num_messages: Number of messages.
+          num_chats: Number of conversations.
+          num_contacts: Number of contacts in the Address Book.
+          attachment_rate: Fraction of the messages with an attachment.
+          attachment_size: Size of each attachment file in bytes.
+          nanoseconds: Store the dates in nanoseconds (iOS 11+)
+                       instead of seconds.
+
+        Returns:
+          Dictionary with the number of rows of each table.
+        """
+        handles = self._get_handles(num_chats)
+        chats = self._get_chats(handles, num_chats)
+        summary = self._write_messages(handles, chats, num_messages,
+            attachment_rate, attachment_size, nanoseconds)
+        summary["contacts"] = self._write_contacts(handles, num_contacts)
+        summary["chats"] = len(chats)
+        summary["handles"] = len(handles)
+        if (self.nested):
+            self._write_manifest()
+        return summary
+
+    # ***************************************************************
+    # HELPER methods
+    # ***************************************************************
+
+    def _connect(self, domain, relative_path):
+        """Create a database stored in the backup.
+
+        Args:
+          domain: Domain of the file (e.g., HomeDomain).
+          relative_path: Path of the file relative to the domain.
+        """
+        path = self._get_file_path(domain, relative_path)
+        if (os.path.exists(path)):
+            os.remove(path)
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        return conn
+
+    def _get_chats(self, handles, num_chats):
+        """Get the handles of each chat.
+
+        The first handles are the handles of the one to one chats.
+        Group chats have three to five random handles.
+
+        Returns:
+          List of lists of handle IDs (handles rowid - 1).
+        """
+        chats = []
+        for i in range(num_chats):
+            if (self._random.random() < GROUP_CHAT_RATE):
+                chats.append(sorted(set(
+                    [self._random.randint(0, len(handles) - 1)
+                        for j in range(self._random.randint(3, 5))])))
+            else:
+                chats.append([i])
+        return chats
+
+    def _get_file_path(self, domain, relative_path):
+        """Get the path to a new file of the backup."""
+        file_id = backup.get_file_id(domain, relative_path)
+        self.files.append((file_id, domain, relative_path))
+        if (not self.nested):
+            return os.path.join(self.backup_dir, file_id)
+        directory = os.path.join(self.backup_dir, file_id[:2])
+        if (not os.path.isdir(directory)):
+            os.mkdir(directory)
+        return os.path.join(directory, file_id)
+
+    def _get_handles(self, num_chats):
+        """Get the (address, service) of each handle.
+
+        There is one handle per chat, so every one to one chat
+        has its own handle, plus some handles that are only
+        members of group chats.
+        """
+        handles = []
+        for i in range(num_chats + num_chats / 10 + 1):
+            if (self._random.random() < EMAIL_RATE):
+                handles.append((u"user%d@example.com" % i, u"iMessage"))
+            else:
+                handles.append((u"+1555%07d" % i,
+                    self._random.choice([u"iMessage", u"SMS"])))
+        return handles
+
+    def _get_text(self, num_words):
+        """Get the random text of a message."""
+        return u" ".join([self._random.choice(WORDS)
+            for i in range(num_words)])
+
+    def _iter_contact_entries(self, handles, num_contacts, people):
+        """Yield the rows of ABMultiValue.
+
+        The first contacts have the addresses of the handles (phone
+        numbers formatted as in the Address Book), so most handles
+        can be resolved to a name.
+
+        Args:
+          handles: List of (address, service) tuples.
+          num_contacts: Number of contacts.
+          people: List where the rows of ABPerson are appended.
+        """
+        known_handles = int(len(handles) * KNOWN_HANDLE_RATE)
+        uid = 0
+        for i in range(num_contacts):
+            people.append((i + 1,
+                self._random.choice(FIRST_NAMES),
+                self._random.choice(LAST_NAMES),
+                self._random.choice(ORGANIZATIONS),
+                FIRST_DATE + i))
+            values = []
+            if (i < known_handles):
+                values.append(handles[i][0])
+            for j in range(self._random.randint(0, 2)):
+                values.append(u"+1666%07d" % self._random.randint(0,
+                    9999999))
+            for value in values:
+                uid += 1
+                if (u"@" in value):
+                    yield (uid, i + 1, EMAIL_PROPERTY, 0, 2, value)
+                else:
+                    # e.g., +15551234567 -> (555) 123-4567
+                    value = u"(%s) %s-%s" % (value[2:5], value[5:8],
+                        value[8:])
+                    yield (uid, i + 1, PHONE_PROPERTY, 0,
+                        self._random.choice([1, 3, 4]), value)
+
+    def _iter_messages(self, handles, chats, num_messages, attachment_rate,
+        attachment_size, nanoseconds):
+        """Yield the rows of the messages.
+
+        Also writes the attachment files.
+
+        Args:
+          handles: List of (address, service) tuples.
+          chats: List of lists of handle IDs.
+          num_messages: Number of messages.
+          attachment_rate: Fraction of the messages with an attachment.
+          attachment_size: Size of each attachment file in bytes.
+          nanoseconds: Store the dates in nanoseconds.
+
+        Yields
+          Tuples with the rows of the message and chat_message_join
+          tables and the row of the attachment table (None if the
+          message has no attachment).
+        """
+        scale = 1
+        if (nanoseconds):
+            scale = messages_helper.NANOSECONDS_PER_SECOND
+        date = FIRST_DATE
+        num_attachments = 0
+        for i in range(1, num_messages + 1):
+            date += self._random.randint(0, MAX_DATE_STEP)
+            # Conversations with a lower ID have more messages
+            chat = int(len(chats) * self._random.random() ** 3)
+            members = chats[chat]
+            handle = members[self._random.randint(0, len(members) - 1)]
+            text = self._get_text(self._random.randint(1, 30))
+            attachment = None
+            if (self._random.random() < attachment_rate):
+                num_attachments += 1
+                attachment = self._write_attachment(num_attachments, i,
+                    date, attachment_size)
+                text = messages_helper.OBJECT_REPLACEMENT_CHARACTER \
+                    + self._random.choice([u"", u" " + text])
+            yield ((i, u"MSG-%08d" % i, text, handle + 1,
+                    handles[handle][1], date * scale,
+                    self._random.randint(0, 1), int(attachment is not None)),
+                (chat + 1, i, date * scale),
+                attachment)
+
+    def _write_attachment(self, attachment_id, message_id, date, size):
+        """Write the file of an attachment.
+
+        Returns:
+          The row of the attachment table.
+        """
+        mime_type, name, uti = self._random.choice(ATTACHMENT_TYPES)
+        name = name % (attachment_id % 10000)
+        relative_path = "Library/SMS/Attachments/%02x/%02d/AT-%08d/%s" \
+            % (attachment_id % 256, attachment_id % 100, attachment_id,
+                name)
+        data = ""
+        if (mime_type.startswith("image/")):
+            data = PNG_IMAGE
+        data += "\0" * max(0, size - len(data))
+        with open(self._get_file_path(iosconstants.Backup.MEDIA_DOMAIN,
+            relative_path), "wb") as f:
+            f.write(data)
+        return (attachment_id, u"AT-%08d" % attachment_id, date,
+            u"~/" + relative_path, uti, mime_type, name, len(data),
+            message_id)
+
+    def _write_contacts(self, handles, num_contacts):
+        """Write the Address Book.
+
+        Returns:
+          The number of contacts.
+        """
+        conn = self._connect(iosconstants.Backup.HOME_DOMAIN,
+            iosconstants.Backup.CONTACTS_DB_RELATIVE_PATH)
+        conn.executescript(CONTACTS_SCHEMA)
+        conn.executemany("INSERT INTO ABMultiValueLabel VALUES (?)",
+            [(l,) for l in LABELS])
+        people = []
+        conn.executemany("INSERT INTO ABMultiValue " \
+            + "(UID, record_id, property, identifier, label, value) " \
+            + "VALUES (?, ?, ?, ?, ?, ?)",
+            self._iter_contact_entries(handles, num_contacts, people))
+        conn.executemany("INSERT INTO ABPerson " \
+            + "(ROWID, First, Last, Organization, CreationDate) " \
+            + "VALUES (?, ?, ?, ?, ?)", people)
+        conn.commit()
+        conn.close()
+        return len(people)
+
+    def _write_manifest(self):
+        """Write the list of files of the backup (Manifest.db)."""
+        path = os.path.join(self.backup_dir,
+            iosconstants.Backup.MANIFEST_DB_FILE_NAME)
+        if (os.path.exists(path)):
+            os.remove(path)
+        conn = sqlite3.connect(path)
+        conn.executescript(MANIFEST_SCHEMA)
+        conn.executemany("INSERT INTO Files " \
+            + "(fileID, domain, relativePath, flags) VALUES (?, ?, ?, ?)",
+            [f + (iosconstants.Backup.FLAG_FILE,) for f in self.files])
+        conn.commit()
+        conn.close()
+
+    def _write_messages(self, handles, chats, num_messages,
+        attachment_rate, attachment_size, nanoseconds):
+        """Write the SMS/iMessage database and the attachments.
+
+        Returns:
+          Dictionary with the number of messages and attachments.
+        """
+        conn = self._connect(iosconstants.Backup.HOME_DOMAIN,
+            iosconstants.Backup.MESSAGES_DB_RELATIVE_PATH)
+        conn.executescript(SMS_SCHEMA)
+        conn.executemany("INSERT INTO handle " \
+            + "(ROWID, id, country, service, uncanonicalized_id) " \
+            + "VALUES (?, ?, 'us', ?, ?)",
+            [(i + 1, h[0], h[1], h[0]) for i, h in enumerate(handles)])
+        conn.executemany("INSERT INTO chat " \
+            + "(ROWID, guid, style, chat_identifier, service_name, " \
+            + "display_name) VALUES (?, ?, ?, ?, ?, '')",
+            [_get_chat_row(i + 1, [handles[h] for h in c])
+                for i, c in enumerate(chats)])
+        conn.executemany("INSERT INTO chat_handle_join VALUES (?, ?)",
+            itertools.chain.from_iterable(
+                [[(i + 1, h + 1) for h in c]
+                    for i, c in enumerate(chats)]))
+        num_attachments = 0
+        rows = self._iter_messages(handles, chats, num_messages,
+            attachment_rate, attachment_size, nanoseconds)
+        while True:
+            batch = list(itertools.islice(rows, BATCH_SIZE))
+            if (len(batch) == 0):
+                break
+            attachments = [r[2] for r in batch if r[2] is not None]
+            num_attachments += len(attachments)
+            conn.executemany("INSERT INTO message " \
+                + "(ROWID, guid, text, handle_id, service, date, " \
+                + "is_from_me, cache_has_attachments) " \
+                + "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [r[0] for r in batch])
+            conn.executemany("INSERT INTO chat_message_join " \
+                + "VALUES (?, ?, ?)", [r[1] for r in batch])
+            conn.executemany("INSERT INTO attachment " \
+                + "(ROWID, guid, created_date, filename, uti, " \
+                + "mime_type, transfer_name, total_bytes) " \
+                + "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [a[:-1] for a in attachments])
+            conn.executemany("INSERT INTO message_attachment_join " \
+                + "VALUES (?, ?)", [(a[-1], a[0]) for a in attachments])
+        conn.commit()
+        conn.close()
+        return {"messages": num_messages, "attachments": num_attachments}
+
+def _get_chat_row(chat_id, members):
+    """Get the row of the chat table of a chat.
+
+    Args:
+      chat_id: ROWID of the chat.
+      members: (address, service) tuples of the handles of the chat.
+    """
+    if (len(members) == 1):
+        identifier = members[0][0]
+        style = 45
+    else:
+        identifier = u"chat%d" % chat_id
+        style = 43
+    service = members[0][1]
+    return (chat_id, service + u";-;" + identifier, style, identifier,
+        service)
+
+def _parse_args():
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(
+        description = "Write a synthetic iOS backup.")
+    parser.add_argument("backup_dir",
+        help = "Directory of the backup (created if needed).")
+    parser.add_argument("--messages", type = int, default = 10000,
+        help = "Number of messages (default: %(default)s).")
+    parser.add_argument("--chats", type = int, default = 100,
+        help = "Number of conversations (default: %(default)s).")
+    parser.add_argument("--contacts", type = int, default = 1000,
+        help = "Number of contacts (default: %(default)s).")
+    parser.add_argument("--attachment-rate", type = float, default = 0.05,
+        help = "Fraction of the messages with an attachment " \
+            + "(default: %(default)s).")
+    parser.add_argument("--attachment-size", type = int, default = 4096,
+        help = "Size of each attachment in bytes (default: %(default)s).")
+    parser.add_argument("--seconds", action = "store_true",
+        help = "Store the dates in seconds (iOS 10 and earlier) " \
+            + "instead of nanoseconds.")
+    parser.add_argument("--flat", action = "store_true",
+        help = "Write a backup without manifest where all the files " \
+            + "are in the backup directory.")
+    parser.add_argument("--seed", type = int, default = 0,
+        help = "Seed of the random content (default: %(default)s).")
+    return parser.parse_args()
+
+def main():
+    args = _parse_args()
+    if (args.chats < 1 or args.messages < 0 or args.contacts < 0):
+        print "Error: --chats must be a positive integer, " \
+            + "and --messages and --contacts cannot be negative."
+        sys.exit(1)
+    start = time.time()
+    generator = BackupGenerator(args.backup_dir, not args.flat, args.seed)
+    summary = generator.generate(args.messages, args.chats, args.contacts,
+        args.attachment_rate, args.attachment_size, not args.seconds)
+    for key in sorted(summary):
+        print "%-12s %10d" % (key, summary[key])
+    print "Backup written to %s in %.1f s" % (args.backup_dir,
+        time.time() - start)
+
+if __name__ == "__main__":
+    main()
@@ -16,30 +16,174 @@
     along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+# Miscellaneous operating system interfaces
+# https://docs.python.org/2/library/os.html
+import os
 # DB-API 2.0 interface for SQLite databases
 # https://docs.python.org/2/library/sqlite3.html
 import sqlite3
+# Time access and conversions
+# https://docs.python.org/2/library/time.html
+import time
+# Quote parts of a URL
+# https://docs.python.org/2/library/urllib.html
+from urllib import pathname2url
+
+# The metrics module keeps the counters and timers of the current run.
+from lib.common import metrics
+
+# PRAGMAs applied to every connection opened by this module.
+# Evidence databases are only read, so a large page cache,
+# memory-mapped I/O and in-memory temporary storage (used by
+# ORDER BY and GROUP BY) are safe to enable.
+# For reference:
+# https://www.sqlite.org/pragma.html
+PRAGMAS = {
+    # Negative values are in KiB (i.e., 64 MB)
+    "cache_size": -65536,
+    # 256 MB
+    "mmap_size": 268435456,
+    "temp_store": "MEMORY"
+}
+
+# Number of rows requested from sqlite at a time by iter_query().
+FETCH_BATCH_SIZE = 1000
+
+# Number of prepared statements kept by each pooled connection.
+# Statements are reused as long as the SQL text is the same
+# (i.e., only the parameters change).
+STATEMENT_CACHE_SIZE = 256
+
+# Pool of open connections keyed by the absolute database path.
+_connections = {}
+
+# Databases attached to the pooled connections.
+# Absolute database path -> {schema name: attached database path}
+_attached = {}
+
+# Connections inherited from the parent process (see reset_after_fork).
+_inherited = []
 
 def _connect(db_path):
     """Connect to sqlite database.
 
+    The database is opened in read-only mode and the connection
+    is kept in the pool so that it can be reused by later queries.
+
     Args:
       db_path: Path to the sqlite database.
     """
-    conn = sqlite3.connect(db_path)
+    key = os.path.abspath(db_path)
+    conn = _connections.get(key)
+    if (conn is None):
+        conn = _open_read_only(key)
+        for pragma, value in PRAGMAS.items():
+            conn.execute("PRAGMA %s = %s" % (pragma, value))
+        _connections[key] = conn
     return conn
 
 def _disconnect(conn):
     """Disconnect from sqlite database."""
     conn.close()
 
+def _open_read_only(db_path):
+    """Open a sqlite database without modifying it.
+
+    The 'immutable' URI parameter tells SQLite that the file
+    cannot change, so no locks are taken and no journal (e.g., the
+    -wal and -shm files of a WAL-mode database) is read or created.
+    A database that does not exist is not created.
+    The connection is never opened in read-write mode: if the URI
+    is not honored, an IOError is raised instead.
+
+    Args:
+      db_path: Absolute path to the sqlite database.
+
+    Raises:
+      sqlite3.OperationalError: The database cannot be opened
+                                (e.g., it does not exist).
+      IOError: The database cannot be opened in read-only mode.
+    """
+    uri = "file:" + pathname2url(db_path) + "?mode=ro&immutable=1"
+    try:
+        conn = sqlite3.connect(uri,
+            cached_statements = STATEMENT_CACHE_SIZE, uri = True)
+    except TypeError:
+        # The 'uri' argument is not supported (Python 2), but
+        # sqlite3 passes the file name to SQLite, which reads
+        # URIs if it was built with URI support.
+        conn = sqlite3.connect(uri,
+            cached_statements = STATEMENT_CACHE_SIZE)
+    # If the URI was read as a file name, the main database is
+    # not db_path. query_only also blocks writes if it was.
+    conn.execute("PRAGMA query_only = ON")
+    main_paths = [d[2] for d in conn.execute("PRAGMA database_list")
+        if d[1] == "main"]
+    if ((main_paths != [db_path]
+        and [os.path.realpath(p) for p in main_paths]
+            != [os.path.realpath(db_path)])
+        or conn.execute("PRAGMA query_only").fetchone()[0] != 1):
+        conn.close()
+        raise IOError("Unable to open '%s' in read-only mode." % db_path)
+    return conn
+
+def attach(db_path, other_db_path, schema_name):
+    """Attach a database to the pooled connection of another database.
+
+    Queries on db_path can then use the tables of other_db_path
+    (e.g., schema_name.table). If a database was already attached
+    with the same schema name, it is detached first, so a database
+    that was rebuilt since it was attached is read again.
+
+    Args:
+      db_path: Path to the sqlite database.
+      other_db_path: Path to the database to attach.
+      schema_name: Name used to refer to the attached database.
+    """
+    key = os.path.abspath(db_path)
+    conn = _connect(key)
+    attached = _attached.setdefault(key, {})
+    if (schema_name in attached):
+        conn.execute("DETACH DATABASE " + schema_name)
+        del attached[schema_name]
+    conn.execute("ATTACH DATABASE ? AS " + schema_name,
+        (os.path.abspath(other_db_path),))
+    attached[schema_name] = os.path.abspath(other_db_path)
+
+def close_all():
+    """Close every connection in the pool."""
+    for conn in _connections.values():
+        _disconnect(conn)
+    _connections.clear()
+    _attached.clear()
+
+def connect_writable(db_path):
+    """Open a sqlite database that is created and written by the framework.
+
+    Only use this function for files created by the framework
+    (e.g., caches in the output directory), never for evidence.
+    The connection is not pooled; the caller must close it.
+
+    Args:
+      db_path: Path to the sqlite database.
+    """
+    conn = sqlite3.connect(db_path,
+        cached_statements = STATEMENT_CACHE_SIZE)
+    conn.execute("PRAGMA cache_size = %s" % PRAGMAS["cache_size"])
+    conn.execute("PRAGMA temp_store = %s" % PRAGMAS["temp_store"])
+    return conn
+
 def query(db_path, q, params = None):
     """Run a query on a sqlite database and return the results.
 
+    The query is counted in the db.* metrics.
+
     Args:
       db_path: Path to the sqlite database.
       q: Query to run.
+      params: Optional sequence with the values of the query parameters.
     """
+    start = time.time()
     conn = _connect(db_path)
     c = conn.cursor()
     if (params is None):
@@ -47,5 +191,64 @@ def query(db_path, q, params = None):
     else:
         c.execute(q, params)
     rows = c.fetchall()
-    _disconnect(conn)
+    c.close()
+    metrics.add_time("db.query", time.time() - start)
+    metrics.increment("db.rows", len(rows))
     return rows
+
+def iter_query(db_path, q, params = None, batch_size = None):
+    """Run a query on a sqlite database and yield the results one by one.
+
+    Rows are fetched in batches so that the full result set
+    is never held in memory. The time of each batch is added to
+    the db.* metrics as soon as it is fetched, so that the time
+    of the rows read while a document is written is known (see
+    metrics.document); the time spent by the caller between rows
+    is not part of the query time. The query is counted once.
+
+    Args:
+      db_path: Path to the sqlite database.
+      q: Query to run.
+      params: Optional sequence with the values of the query parameters.
+      batch_size: Number of rows to fetch at a time.
+                  Defaults to FETCH_BATCH_SIZE.
+    """
+    if (batch_size is None):
+        batch_size = FETCH_BATCH_SIZE
+    start = time.time()
+    conn = _connect(db_path)
+    c = conn.cursor()
+    # The call is only counted with the first batch
+    calls = 1
+    try:
+        if (params is None):
+            c.execute(q)
+        else:
+            c.execute(q, params)
+        while True:
+            rows = c.fetchmany(batch_size)
+            metrics.add_time("db.query", time.time() - start, calls)
+            calls = 0
+            if (not rows):
+                break
+            metrics.increment("db.rows", len(rows))
+            for r in rows:
+                yield r
+            start = time.time()
+    finally:
+        c.close()
+
+def reset_after_fork():
+    """Empty the pool in a child process (e.g., a multiprocessing worker).
+
+    SQLite connections must not be used, or closed, by a process
+    forked after they were opened, so the inherited connections
+    are kept (to prevent them from being closed when they are
+    garbage collected) but removed from the pool. Later queries
+    open new connections.
+    For reference:
+    https://www.sqlite.org/howtocorrupt.html
+    """
+    _inherited.extend(_connections.values())
+    _connections.clear()
+    _attached.clear()
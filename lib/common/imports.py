@@ -0,0 +1,51 @@
+"""Smartphone Framework Forensics
+    Deferred imports of third-party modules.
+    Copyright (C) 2017  Sergio A. Nevarez
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+# Convenience wrappers for __import__
+# https://docs.python.org/2/library/importlib.html
+import importlib
+# System-specific parameters and functions
+# https://docs.python.org/2/library/sys.html
+import sys
+
+def require(name):
+    """Import a third-party module the first time it is needed.
+
+    Heavy dependencies (e.g., pdfkit, phonenumbers) are imported
+    by the code that uses them instead of at startup, so a run
+    that does not need them does not pay for importing them.
+    Python caches imported modules, so only the first call
+    for each module is expensive.
+
+    Args:
+      name: Name of the module to import (e.g., pdfkit).
+
+    Returns:
+      The module. If the module is not installed, an error message
+      is displayed and the program exits.
+    """
+    module = sys.modules.get(name)
+    if (module is not None):
+        return module
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        # The required module is not installed on this system.
+        print "Module \"{0}\" not installed".format(name)
+        # Exit program
+        sys.exit(1)
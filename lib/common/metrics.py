@@ -0,0 +1,189 @@
+"""Smartphone Framework Forensics
+    Counters and timers of module runs.
+    Copyright (C) 2017  Sergio A. Nevarez
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+    The metrics of a run are kept in this module so that any part of
+    the framework (e.g., the db module) can update them without
+    knowing which module is running. They are reset at the start of
+    every run (see BaseModule.do_run).
+    Metric names start with the part of the framework they measure:
+      attachments.*: Attachments resolved in the backup and read.
+      backup: Time of the run of each backup, when several backups
+              are processed at the same time.
+      backups.*: Backups processed at the same time.
+      contacts.*: Lookups of handles in the contact index.
+      db.*: Queries run on the backup databases.
+      render.*: Time to write the output, by output format.
+      run: Total time of the run.
+"""
+
+# Context manager utilities
+# https://docs.python.org/2/library/contextlib.html
+import contextlib
+# JSON encoder and decoder
+# https://docs.python.org/2/library/json.html
+import json
+# Miscellaneous operating system interfaces
+# https://docs.python.org/2/library/os.html
+import os
+# Time access and conversions
+# https://docs.python.org/2/library/time.html
+import time
+
+# Counters of the current run: name -> value.
+_counters = {}
+
+# Timers of the current run: name -> [seconds, calls].
+_timers = {}
+
+# Bytes written to each output file during the current run:
+# path -> [output format, bytes].
+_files = {}
+
+def add_file(file_path, output_format, num_bytes):
+    """Record the bytes written to an output file.
+
+    Args:
+      file_path: Path to the output file.
+      output_format: Format of the file (e.g., html).
+      num_bytes: Number of bytes written to the file.
+    """
+    entry = _files.setdefault(file_path, [output_format, 0])
+    entry[1] += num_bytes
+
+def add_time(name, seconds, calls = 1):
+    """Add time to a timer.
+
+    Args:
+      name: Name of the timer (e.g., db.query).
+      seconds: Time to add.
+      calls: Number of timed calls.
+    """
+    entry = _timers.get(name)
+    if (entry is None):
+        _timers[name] = [seconds, calls]
+    else:
+        entry[0] += seconds
+        entry[1] += calls
+
+@contextlib.contextmanager
+def document(output_format, file_path = None):
+    """Measure the rendering of a document.
+
+    The time spent in the block, excluding the time spent in
+    queries (db.query) in the meantime, is added to the
+    render.<output_format> timer. The rows of the documents are
+    read from the backup as the documents are written, so the time
+    of the queries would otherwise be counted twice.
+    If a file path is given, the bytes it grew by are recorded
+    (see add_file).
+
+    Args:
+      output_format: Format of the document (e.g., html).
+      file_path: Optional path to the file of the document.
+    """
+    size = _get_size(file_path)
+    query_time = get_time("db.query")
+    start = time.time()
+    try:
+        yield
+    finally:
+        add_time("render." + output_format, time.time() - start \
+            - (get_time("db.query") - query_time))
+        if (file_path is not None):
+            add_file(file_path, output_format,
+                max(_get_size(file_path) - size, 0))
+
+def get_stats():
+    """Get the metrics of the current run.
+
+    Returns:
+      Dictionary with the counters (name -> value), the timers
+      (name -> {seconds, calls}) and the output files
+      (path -> {format, bytes}).
+    """
+    return {
+        "counters": dict(_counters),
+        "timers": dict([(name, {"seconds": t[0], "calls": t[1]})
+            for name, t in _timers.iteritems()]),
+        "files": dict([(path, {"format": f[0], "bytes": f[1]})
+            for path, f in _files.iteritems()])
+    }
+
+def get_time(name):
+    """Get the seconds of a timer (0 if it was not used)."""
+    entry = _timers.get(name)
+    if (entry is None):
+        return 0.0
+    return entry[0]
+
+def increment(name, value = 1):
+    """Increment a counter.
+
+    Args:
+      name: Name of the counter (e.g., db.rows).
+      value: Value to add.
+    """
+    _counters[name] = _counters.get(name, 0) + value
+
+def merge(stats):
+    """Add the metrics of another run (e.g., in a worker process).
+
+    Args:
+      stats: Dictionary returned by get_stats().
+    """
+    for name, value in stats["counters"].iteritems():
+        increment(name, value)
+    for name, entry in stats["timers"].iteritems():
+        add_time(name, entry["seconds"], entry["calls"])
+    for file_path, entry in stats["files"].iteritems():
+        add_file(file_path, entry["format"], entry["bytes"])
+
+def reset():
+    """Reset every metric (i.e., start a new run)."""
+    _counters.clear()
+    _timers.clear()
+    _files.clear()
+
+def save(file_path):
+    """Save the metrics of the current run to a JSON file.
+
+    Args:
+      file_path: Path to the JSON file.
+    """
+    with open(file_path, "w") as output_file:
+        json.dump(get_stats(), output_file, indent = 2,
+            separators = (",", ": "), sort_keys = True)
+        output_file.write("\n")
+
+@contextlib.contextmanager
+def timer(name):
+    """Add the time spent in a block to a timer.
+
+    Args:
+      name: Name of the timer.
+    """
+    start = time.time()
+    try:
+        yield
+    finally:
+        add_time(name, time.time() - start)
+
+def _get_size(file_path):
+    """Get the size of a file (0 if there is no file)."""
+    if (file_path is None or not os.path.isfile(file_path)):
+        return 0
+    return os.path.getsize(file_path)
@@ -0,0 +1,245 @@
+"""Smartphone Framework Forensics
+    Index of the files stored in an iOS backup.
+    Copyright (C) 2017  Sergio A. Nevarez
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+# High-performance container datatypes
+# https://docs.python.org/2/library/collections.html
+from collections import namedtuple
+# Secure hashes and message digests
+# https://docs.python.org/2/library/hashlib.html
+import hashlib
+# Miscellaneous operating system interfaces
+# https://docs.python.org/2/library/os.html
+import os
+# DB-API 2.0 interface for SQLite databases
+# https://docs.python.org/2/library/sqlite3.html
+import sqlite3
+
+# The db module includes the code to run queries on sqlite databases.
+from lib.common.db.sqlite import db
+# The ioscontants module contains the names of important iOS backup files.
+from lib.common.mobile.ios import iosconstants
+# The mbdb module reads the list of files of iOS 9 backups.
+from lib.common.mobile.ios import mbdb
+
+# A file of the backup.
+#   path: Path to the file in the backup directory.
+#   size: Size of the file in bytes or None if the
+#         backup manifest does not include it.
+#   flags: Type of the entry (see iosconstants.Backup.FLAG_*).
+BackupFile = namedtuple("BackupFile", ["path", "size", "flags"])
+
+# Indexes of the backups used by this process keyed by backup directory.
+_indexes = {}
+
+class BackupIndex(object):
+    """Index of the files stored in an iOS backup.
+
+    Files in a backup are stored under a name derived from their
+    domain and relative path on the device. iOS 10+ backups list
+    the files in Manifest.db and store them in subdirectories named
+    after the first two characters of the file ID. Older backups
+    list the files in Manifest.mbdb and store them in the backup
+    directory itself.
+
+    The manifest is read once and lookups are served from memory,
+    so resolving a file does not require any file system access.
+
+    Attributes:
+      backup_dir: Path to the iOS backup.
+      mtime: Modification time of the manifest (or of the backup
+             directory) when the index was built.
+    """
+    def __init__(self, backup_dir):
+        """Initializes the index.
+
+        Args:
+          backup_dir: Path to the iOS backup.
+
+        Raises:
+          IOError: The manifest cannot be read
+                   (e.g., the backup is encrypted).
+        """
+        self.backup_dir = backup_dir
+        # (domain, relative path) -> (file ID, size, flags)
+        self._files = {}
+        # Names of the files in a backup without manifest.
+        self._file_names = None
+        # Whether files are stored in subdirectories (iOS 10+)
+        self._nested = False
+        manifest_path = _get_manifest_path(backup_dir)
+        if (manifest_path is None):
+            self.mtime = os.path.getmtime(backup_dir)
+            self._file_names = set(os.listdir(backup_dir))
+            return
+        self.mtime = os.path.getmtime(manifest_path)
+        if (manifest_path.endswith(
+            iosconstants.Backup.MANIFEST_DB_FILE_NAME)):
+            self._nested = True
+            self._read_manifest_db(manifest_path)
+        else:
+            # Records are decoded as they are looked up
+            self._files = mbdb.Mbdb(manifest_path)
+
+    def exists(self, domain, relative_path):
+        """Determine if a regular file is stored in the backup.
+
+        Args:
+          domain: Domain of the file (e.g., HomeDomain).
+          relative_path: Path of the file relative to the domain.
+        """
+        return self.get_file(domain, relative_path) is not None
+
+    def get_file(self, domain, relative_path):
+        """Get a regular file stored in the backup.
+
+        Args:
+          domain: Domain of the file (e.g., HomeDomain).
+          relative_path: Path of the file relative to the domain.
+
+        Returns:
+          The BackupFile or None if the file is not in the backup.
+        """
+        if (self._file_names is not None):
+            file_id = get_file_id(domain, relative_path)
+            if (file_id not in self._file_names):
+                return None
+            return BackupFile(os.path.join(self.backup_dir, file_id),
+                None, iosconstants.Backup.FLAG_FILE)
+        entry = self._files.get((domain, relative_path))
+        if (entry is None or entry[2] != iosconstants.Backup.FLAG_FILE):
+            return None
+        if (self._nested):
+            path = os.path.join(self.backup_dir, entry[0][:2], entry[0])
+        else:
+            path = os.path.join(self.backup_dir, entry[0])
+        return BackupFile(path, entry[1], entry[2])
+
+    def get_path(self, domain, relative_path):
+        """Get the path to a regular file stored in the backup.
+
+        Args:
+          domain: Domain of the file (e.g., HomeDomain).
+          relative_path: Path of the file relative to the domain.
+
+        Returns:
+          The path to the file in the backup directory
+          or None if the file is not in the backup.
+        """
+        backup_file = self.get_file(domain, relative_path)
+        if (backup_file is None):
+            return None
+        return backup_file.path
+
+    def get_size(self, domain, relative_path):
+        """Get the size of a regular file stored in the backup.
+
+        The size is read from the manifest if it is included
+        (Manifest.mbdb). Otherwise the file is stat'ed.
+
+        Args:
+          domain: Domain of the file (e.g., HomeDomain).
+          relative_path: Path of the file relative to the domain.
+
+        Returns:
+          The size in bytes or None if the file is not in the backup.
+        """
+        backup_file = self.get_file(domain, relative_path)
+        if (backup_file is None):
+            return None
+        if (backup_file.size is not None):
+            return backup_file.size
+        return os.path.getsize(backup_file.path)
+
+    # ***************************************************************
+    # HELPER methods
+    # ***************************************************************
+
+    def _read_manifest_db(self, manifest_path):
+        """Read the list of files of an iOS 10+ backup.
+
+        Args:
+          manifest_path: Path to Manifest.db.
+        """
+        query = "SELECT domain, relativePath, fileID, flags FROM Files"
+        try:
+            for r in db.iter_query(manifest_path, query):
+                # The size is stored in an archived property list
+                # (Files.file), which is not decoded.
+                self._files[(r[0], r[1])] = (str(r[2]), None, r[3])
+        except sqlite3.DatabaseError as e:
+            raise IOError("Unable to read '%s' (%s). " % (manifest_path, e)
+                + "Encrypted backups are not supported.")
+
+def clear_backup_indexes():
+    """Remove every backup index from the cache."""
+    _indexes.clear()
+
+def get_backup_index(backup_dir):
+    """Get the index of an iOS backup.
+
+    The index is built the first time it is requested and
+    rebuilt if the backup was modified since then.
+
+    Args:
+      backup_dir: Path to the iOS backup.
+
+    Raises:
+      IOError: The manifest of the backup cannot be read.
+    """
+    backup_dir = os.path.abspath(backup_dir)
+    index = _indexes.get(backup_dir)
+    if (index is None or index.mtime != _get_mtime(backup_dir)):
+        index = BackupIndex(backup_dir)
+        _indexes[backup_dir] = index
+    return index
+
+def get_file_id(domain, relative_path):
+    """Get the ID (i.e., name in the backup) of a file.
+
+    Args:
+      domain: Domain of the file (e.g., HomeDomain).
+      relative_path: Path of the file relative to the domain.
+    """
+    name = domain + "-" + relative_path
+    if (type(name) is unicode):
+        name = name.encode("utf-8")
+    return hashlib.sha1(name).hexdigest()
+
+def _get_manifest_path(backup_dir):
+    """Get the path to the list of files of a backup.
+
+    Args:
+      backup_dir: Path to the iOS backup.
+
+    Returns:
+      The path to Manifest.db or Manifest.mbdb or None if
+      the backup has neither.
+    """
+    for name in [iosconstants.Backup.MANIFEST_DB_FILE_NAME,
+                 iosconstants.Backup.MANIFEST_MBDB_FILE_NAME]:
+        manifest_path = os.path.join(backup_dir, name)
+        if (os.path.isfile(manifest_path)):
+            return manifest_path
+    return None
+
+def _get_mtime(backup_dir):
+    """Get the modification time used to detect changes to a backup."""
+    manifest_path = _get_manifest_path(backup_dir)
+    if (manifest_path is not None):
+        return os.path.getmtime(manifest_path)
+    return os.path.getmtime(backup_dir)
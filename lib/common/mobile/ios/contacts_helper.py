@@ -16,67 +16,201 @@
     along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+# Miscellaneous operating system interfaces
+# https://docs.python.org/2/library/os.html
+import os
 # Regular expression operations
 # https://docs.python.org/2/library/re.html
 import re
 
-# DB-API 2.0 interface for SQLite databases
-# https://docs.python.org/2/library/sqlite3.html
-import sqlite3
-
 # The db module includes the code to run queries on sqlite databases.
 from lib.common.db.sqlite import db
+# The imports module loads third-party modules when they are first used.
+from lib.common import imports
+# The metrics module keeps the counters and timers of the current run.
+from lib.common import metrics
+# The backup module includes the index of the files of iOS backups.
+from lib.common.mobile.ios import backup
+# The ioscontants module contains the names of important iOS backup files.
+from lib.common.mobile.ios import iosconstants
 
-try:
-    # https://pypi.python.org/pypi/phonenumberslite
-    import phonenumbers
-except ImportError as e:
-    # At least one of the required modules is not installed
-    # on this system.
-    print "Module \"{0}\" not installed".format(e.message[16:])
-    # Exit program
-    sys.exit(1)
-
-CONTACTS_DATABASE_FILE_NAME = \
-    "HomeDomain-Library/AddressBook/AddressBook.sqlitedb"
-CONTACTS_DATABASE_FILE_NAME_HASH = \
-    "31bb7ba8914766d4ba40d6dfb6113c8b614be442"
 
-def get_contact_by_id(backup_dir, id):
-    if ("@" in id):
-        # Treat as email address
-        contact_id = id
-        rows = list_contacts(backup_dir)
-        for r in rows:
+# Shortest suffix of the digits used as a key in the phone number
+# index. Shorter numbers (e.g., short codes) only match a contact
+# number with the same digits.
+MIN_PHONE_NUMBER_DIGITS = 7
+
+# Contact indexes keyed by the path of the Address Book.
+_indexes = {}
+
+class ContactIndex(object):
+    """In-memory index to resolve handles to contact names.
+
+    The index is built in one pass over the Address Book.
+    Phone numbers are stored by their digits and by every
+    suffix of their digits (down to MIN_PHONE_NUMBER_DIGITS),
+    so that a national number matches a contact number stored
+    with or without the country code or trunk prefix.
+    Numbers shorter than MIN_PHONE_NUMBER_DIGITS are only
+    stored by their digits.
+    Email addresses are stored in lower case.
+    If more than one contact matches, the contact with the lowest
+    ID is used.
+
+    Attributes:
+      emails: Dictionary of lower case email address -> name.
+      mtime: Modification time of the Address Book when the
+             index was built.
+      phone_numbers: Dictionary of digits -> name.
+    """
+    def __init__(self, db_path):
+        """Builds the index from the Address Book.
+
+        Args:
+          db_path: Path to the Address Book database.
+        """
+        self.mtime = os.path.getmtime(db_path)
+        self.emails = {}
+        self.phone_numbers = {}
+        # Names of the handles that were already resolved
+        self._resolved = {}
+        for r in _iter_contacts(db_path):
+            name = r[1]
             contact_value = r[2]
+            if (name is None):
+                continue
             if ("@" in contact_value):
-                if contact_id in contact_value:
-                    if (r[1] is not None):
-                        return str(r[1])
-    else:
-        return get_contact_by_phone_number(backup_dir, id)
+                self.emails.setdefault(contact_value.lower(), name)
+                continue
+            contact_number = re.sub(r"[^0-9]", "", contact_value)
+            if (contact_number == ""):
+                continue
+            suffixes = \
+                max(len(contact_number) - MIN_PHONE_NUMBER_DIGITS, 0) + 1
+            for i in range(suffixes):
+                self.phone_numbers.setdefault(contact_number[i:], name)
+
+    def get_contact_by_id(self, id):
+        """Get the name of the contact for a handle.
+
+        Args:
+          id: Phone number or email address of the handle.
+
+        Returns:
+          The name of the contact or an empty string if the
+          handle is not in the Address Book.
+        """
+        metrics.increment("contacts.lookups")
+        name = self._resolved.get(id)
+        if (name is not None):
+            metrics.increment("contacts.cache_hits")
+        else:
+            metrics.increment("contacts.cache_misses")
+            if ("@" in id):
+                name = self.emails.get(id.lower(), "")
+            else:
+                name = self.get_contact_by_phone_number(id)
+            self._resolved[id] = name
+        return name
+
+    def get_contact_by_phone_number(self, full_number):
+        """Get the name of the contact for a phone number.
+
+        Numbers shorter than MIN_PHONE_NUMBER_DIGITS (e.g.,
+        short codes) are matched by their digits.
+
+        Args:
+          full_number: Phone number including the country code.
+
+        Returns:
+          The name of the contact or an empty string if the
+          number is not in the Address Book.
+        """
+        digits = re.sub(r"[^0-9]", "", full_number)
+        if (len(digits) < MIN_PHONE_NUMBER_DIGITS):
+            return self.phone_numbers.get(digits, "")
+        # https://pypi.python.org/pypi/phonenumberslite
+        phonenumbers = imports.require("phonenumbers")
+        try:
+            number = phonenumbers.parse(full_number)
+        except phonenumbers.phonenumberutil.NumberParseException:
+            return ""
+        return self.phone_numbers.get(str(number.national_number), "")
+
+def clear_contact_indexes():
+    """Remove every contact index from the cache."""
+    _indexes.clear()
 
-    return ""
+def get_contact_index(backup_dir):
+    """Get the contact index of an iOS backup.
+
+    The index is built the first time it is requested and
+    rebuilt if the Address Book was modified since then.
+    Each call checks the Address Book for changes, so modules
+    get the index once per run and resolve every handle with
+    ContactIndex.get_contact_by_id.
+
+    Args:
+      backup_dir: Path to the iOS backup.
+
+    Raises:
+      IOError: The Address Book is not in the backup.
+    """
+    path = _get_contacts_db_path(backup_dir)
+    index = _indexes.get(path)
+    if (index is None or index.mtime != os.path.getmtime(path)):
+        with metrics.timer("contacts.build_index"):
+            index = ContactIndex(path)
+        _indexes[path] = index
+    return index
+
+def get_contact_by_id(backup_dir, id):
+    """Get the name of the contact for a handle.
+
+    Args:
+      backup_dir: Path to the iOS backup.
+      id: Phone number or email address of the handle.
+    """
+    return get_contact_index(backup_dir).get_contact_by_id(id)
 
 def get_contact_by_phone_number(backup_dir, full_number):
-    try:
-        number = phonenumbers.parse(full_number)
-    except phonenumbers.phonenumberutil.NumberParseException:
-        return ""
-
-    number_no_country_code = str(number.national_number)
-    rows = list_contacts(backup_dir)
-    for r in rows:
-        contact_value = r[2]
-        contact_number = re.sub(r"[^0-9]", "", contact_value)
-        if number_no_country_code in contact_number:
-            if (r[1] is not None):
-                return str(r[1])
-
-    return ""
+    """Get the name of the contact for a phone number.
+
+    Args:
+      backup_dir: Path to the iOS backup.
+      full_number: Phone number including the country code.
+    """
+    return get_contact_index(
+        backup_dir).get_contact_by_phone_number(full_number)
 
 def list_contacts(backup_dir):
-    path = backup_dir + "/" + CONTACTS_DATABASE_FILE_NAME_HASH
+    path = _get_contacts_db_path(backup_dir)
+    rows = list(_iter_contacts(path))
+    rows.insert(0, ('ID', 'Name', 'Value'))
+    return rows
+
+def _get_contacts_db_path(backup_dir):
+    """Get the path to the Address Book of an iOS backup.
+
+    Args:
+      backup_dir: Path to the iOS backup.
+
+    Raises:
+      IOError: The Address Book is not in the backup.
+    """
+    path = backup.get_backup_index(backup_dir).get_path(
+        iosconstants.Backup.HOME_DOMAIN,
+        iosconstants.Backup.CONTACTS_DB_RELATIVE_PATH)
+    if (path is None):
+        raise IOError("iOS Contacts DB does not exist in '%s'" % backup_dir)
+    return path
+
+def _iter_contacts(db_path):
+    """Yield the ID, name and value of every contact entry.
+
+    Args:
+      db_path: Path to the Address Book database.
+    """
     query = "SELECT " \
                 + "p.rowid, " \
                 + "coalesce(p.first, '') || ' ' || " \
@@ -89,7 +223,5 @@ def list_contacts(backup_dir):
                 + "p.rowid=m.record_id and m.value not null " \
             + "order by " \
                 + "p.rowid"
-    rows = db.query(path,
-                    query)
-    rows.insert(0, ('ID', 'Name', 'Value'))
-    return rows
\ No newline at end of file
+    return db.iter_query(db_path,
+                         query)
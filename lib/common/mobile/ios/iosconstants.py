@@ -18,6 +18,28 @@
 
 class Backup(object):
     """The Backup class defines a set of constants related to iOS backups."""
+    # Domains of the files stored in a backup
+    HOME_DOMAIN = "HomeDomain"
+    MEDIA_DOMAIN = "MediaDomain"
+
+    # Types of the entries listed in the backup manifest
+    FLAG_FILE = 1
+    FLAG_DIRECTORY = 2
+    FLAG_SYMBOLIC_LINK = 4
+
+    # List of the files of iOS 10+ backups
+    MANIFEST_DB_FILE_NAME = "Manifest.db"
+    # List of the files of iOS 9 (and earlier) backups
+    MANIFEST_MBDB_FILE_NAME = "Manifest.mbdb"
+
+    # Paths relative to HOME_DOMAIN
+    CONTACT_IMAGES_DB_RELATIVE_PATH = \
+        "Library/AddressBook/AddressBookImages.sqlitedb"
+    CONTACTS_DB_RELATIVE_PATH = \
+        "Library/AddressBook/AddressBook.sqlitedb"
+    MESSAGES_DB_RELATIVE_PATH = \
+        "Library/SMS/sms.db"
+
     CONTACT_IMAGES_DB_FILE_NAME = \
         "HomeDomain-Library/AddressBook/AddressBookImages.sqlitedb"
     CONTACT_IMAGES_DB_FILE_NAME_HASH = \
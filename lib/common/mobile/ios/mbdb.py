@@ -0,0 +1,197 @@
+"""Smartphone Framework Forensics
+    Parser of the Manifest.mbdb file of iOS backups (iOS 9 and earlier).
+    Copyright (C) 2017  Sergio A. Nevarez
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+    Format of Manifest.mbdb (all integers are big-endian):
+      Header: "mbdb" followed by the version (0x05 0x00).
+      Records:
+        domain, path, link target, data hash, encryption key (strings)
+        mode (uint16), inode (uint64), uid (uint32), gid (uint32),
+        mtime (uint32), atime (uint32), ctime (uint32), size (uint64),
+        protection class (uint8), number of properties (uint8)
+        properties: name and value (strings) of each property.
+      Strings are stored as their length (uint16) followed by the
+      bytes of the string. A length of 0xFFFF means the string is empty.
+    For reference:
+    https://www.theiphonewiki.com/wiki/ITunes_Backup
+"""
+
+# Secure hashes and message digests
+# https://docs.python.org/2/library/hashlib.html
+import hashlib
+# Memory-mapped file support
+# https://docs.python.org/2/library/mmap.html
+import mmap
+# Miscellaneous operating system interfaces
+# https://docs.python.org/2/library/os.html
+import os
+# Interpret strings as packed binary data
+# https://docs.python.org/2/library/struct.html
+import struct
+
+# The ioscontants module contains the names of important iOS backup files.
+from lib.common.mobile.ios import iosconstants
+
+# First bytes of a Manifest.mbdb file.
+HEADER = "mbdb\x05\x00"
+
+# Length of a string that is empty.
+EMPTY_STRING_LENGTH = 0xFFFF
+
+# Fixed-size fields between the strings and the properties of a record:
+# mode, inode, uid, gid, mtime, atime, ctime, size, protection class
+# and number of properties.
+_FIELDS = struct.Struct(">HQIIIIIQBB")
+_STRING_LENGTH = struct.Struct(">H")
+
+# File type bits of the mode of a record.
+_FILE_TYPE_MASK = 0xF000
+_FILE_TYPES = {
+    0x8000: iosconstants.Backup.FLAG_FILE,
+    0x4000: iosconstants.Backup.FLAG_DIRECTORY,
+    0xA000: iosconstants.Backup.FLAG_SYMBOLIC_LINK
+}
+
+class Mbdb(object):
+    """Lazy reader of a Manifest.mbdb file.
+
+    The file is memory-mapped and records are decoded on demand.
+    A lookup scans the records that were not read yet until the
+    requested file is found, remembering the offset of each record
+    it passes. Later lookups of those files are served from memory.
+    Only the domain and path of each record are copied out of the
+    memory map until the other fields of a record are requested.
+
+    Lookups use the same (domain, relative path) keys and return the
+    same (file ID, size, flags) tuples as the list of files read
+    from the Manifest.db of newer backups.
+    """
+    def __init__(self, path):
+        """Open the Manifest.mbdb file.
+
+        Args:
+          path: Path to Manifest.mbdb.
+
+        Raises:
+          IOError: The file is not a Manifest.mbdb file.
+        """
+        with open(path, "rb") as f:
+            # An empty file cannot be memory-mapped.
+            if (os.fstat(f.fileno()).st_size < len(HEADER)):
+                raise IOError("'%s' is not a Manifest.mbdb file." % path)
+            try:
+                self._map = \
+                    mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+            except (mmap.error, ValueError) as e:
+                raise IOError("Unable to read '%s': %s" % (path, e))
+        if (self._map[:len(HEADER)] != HEADER):
+            self._map.close()
+            raise IOError("'%s' is not a Manifest.mbdb file." % path)
+        # (domain, relative path) -> offset of the fixed-size fields
+        self._offsets = {}
+        # Offset of the first record that was not scanned
+        self._next_offset = len(HEADER)
+
+    def __iter__(self):
+        """Iterate over the (domain, relative path) keys of all records."""
+        for key in list(self._offsets):
+            yield key
+        while (self._next_offset < len(self._map)):
+            key = self._scan()
+            if (key is not None):
+                yield key
+
+    def get(self, key, default = None):
+        """Get the file of a record.
+
+        Args:
+          key: (domain, relative path) tuple.
+          default: Value returned if the record does not exist.
+
+        Returns:
+          (file ID, size, flags) tuple.
+        """
+        offset = self._offsets.get(key)
+        while (offset is None and self._next_offset < len(self._map)):
+            if (self._scan() == key):
+                offset = self._offsets[key]
+        if (offset is None):
+            return default
+        fields = _FIELDS.unpack_from(self._map, offset)
+        name = key[0] + u"-" + key[1]
+        return (hashlib.sha1(name.encode("utf-8")).hexdigest(),
+            fields[7],
+            _FILE_TYPES.get(fields[0] & _FILE_TYPE_MASK, 0))
+
+    # ***************************************************************
+    # HELPER methods
+    # ***************************************************************
+
+    def _read_string(self, offset):
+        """Read a string of a record.
+
+        Args:
+          offset: Offset of the length of the string.
+
+        Returns:
+          (string, offset after the string) tuple.
+        """
+        length = _STRING_LENGTH.unpack_from(self._map, offset)[0]
+        offset += _STRING_LENGTH.size
+        if (length == EMPTY_STRING_LENGTH):
+            return ("", offset)
+        return (self._map[offset:offset + length], offset + length)
+
+    def _scan(self):
+        """Read the next record that was not scanned.
+
+        A truncated record ends the scan, so the records before
+        it can still be read from a damaged file.
+
+        Returns:
+          The (domain, relative path) key of the record
+          or None if the record is truncated.
+        """
+        offset = self._next_offset
+        try:
+            domain, offset = self._read_string(offset)
+            path, offset = self._read_string(offset)
+            # Link target, data hash and encryption key
+            for i in range(3):
+                offset = self._skip_string(offset)
+            fields_offset = offset
+            num_properties = _FIELDS.unpack_from(self._map, offset)[-1]
+            offset += _FIELDS.size
+            # Name and value of each property
+            for i in range(2 * num_properties):
+                offset = self._skip_string(offset)
+        except struct.error:
+            offset = len(self._map) + 1
+        if (offset > len(self._map)):
+            self._next_offset = len(self._map)
+            return None
+        self._next_offset = offset
+        key = (domain.decode("utf-8"), path.decode("utf-8"))
+        self._offsets[key] = fields_offset
+        return key
+
+    def _skip_string(self, offset):
+        """Get the offset after a string of a record."""
+        length = _STRING_LENGTH.unpack_from(self._map, offset)[0]
+        offset += _STRING_LENGTH.size
+        if (length == EMPTY_STRING_LENGTH):
+            return offset
+        return offset + length
@@ -0,0 +1,185 @@
+"""Smartphone Framework Forensics
+    Helper functions to decode messages from the SMS/iMessage db.
+    Copyright (C) 2017  Sergio A. Nevarez
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+# High-performance container datatypes
+# https://docs.python.org/2/library/collections.html
+import collections
+# Basic date and time types
+# https://docs.python.org/2/library/datetime.html
+import datetime
+# Miscellaneous operating system interfaces
+# https://docs.python.org/2/library/os.html
+import os
+# Time access and conversions
+# https://docs.python.org/2/library/time.html
+import time
+
+# The db module includes the code to run queries on sqlite databases.
+from lib.common.db.sqlite import db
+
+# Placeholder used in the text of a message for each attachment.
+# For reference:
+# http://www.fileformat.info/info/unicode/char/fffc/index.htm
+OBJECT_REPLACEMENT_CHARACTER = u"\ufffc"
+
+# Seconds between the Unix epoch and the Mac Absolute Time epoch
+# (2001-01-01 00:00:00 UTC), which is used by message.date.
+# For reference:
+# https://linuxsleuthing.blogspot.com/2012/10/whos-texting-ios6-smsdb.html
+APPLE_EPOCH_OFFSET = 978307200
+
+# Units of message.date: seconds until iOS 10, nanoseconds since iOS 11.
+# A date in seconds larger than this would be thousands of years
+# after 2001, while any date after 2001-01-01 00:16:40 in nanoseconds
+# is larger.
+MAX_DATE_IN_SECONDS = 10 ** 12
+NANOSECONDS_PER_SECOND = 10 ** 9
+
+# Format of the START_DATE and END_DATE options
+DATE_FORMAT = "%Y-%m-%d"
+
+# Units of the dates of the messages databases keyed by path.
+_date_scales = {}
+
+# Types of message parts
+ATTACHMENT = "attachment"
+TEXT = "text"
+
+# Attachment of a message as stored in the attachment table.
+Attachment = collections.namedtuple("Attachment",
+    ["mime_type", "filename", "transfer_name", "total_bytes"])
+
+# Part of a message.
+#   type: TEXT or ATTACHMENT
+#   value: The text (unicode) or the Attachment. The value of an
+#          ATTACHMENT part is None if the placeholder has no
+#          matching attachment.
+MessagePart = collections.namedtuple("MessagePart", ["type", "value"])
+
+def decode_message(text, attachments):
+    """Split the text of a message into text and attachment parts.
+
+    Each object replacement character in the text is mapped to
+    the attachment in the same position of the attachments list.
+
+    Args:
+      text: The text of the message.
+      attachments: List of Attachments of the message,
+                   in the order in which they appear in the text.
+
+    Yields:
+      The MessageParts of the message in order.
+    """
+    if (not text):
+        return
+    pieces = text.split(OBJECT_REPLACEMENT_CHARACTER)
+    for i in range(len(pieces)):
+        if (i > 0):
+            attachment = None
+            if (i <= len(attachments)):
+                attachment = attachments[i - 1]
+            yield MessagePart(ATTACHMENT, attachment)
+        if (len(pieces[i]) > 0):
+            yield MessagePart(TEXT, pieces[i])
+
+def get_date_bounds(start_date, end_date, scale):
+    """Convert a range of local dates to message.date values.
+
+    The bounds are computed once, so queries can compare
+    message.date with them instead of converting every date.
+
+    Args:
+      start_date: First date (YYYY-MM-DD) or an empty string.
+      end_date: Last date (YYYY-MM-DD), inclusive, or an empty string.
+      scale: Units of message.date per second (see get_date_scale).
+
+    Returns:
+      (start, end) tuple where messages in the range have
+      start <= message.date < end. A bound is None if
+      the date is not set.
+
+    Raises:
+      ValueError: A date does not match DATE_FORMAT.
+    """
+    start = None
+    end = None
+    if (start_date != ""):
+        start = _to_message_date(
+            datetime.datetime.strptime(start_date, DATE_FORMAT), scale)
+    if (end_date != ""):
+        # Midnight of the day after the last date
+        end = _to_message_date(
+            datetime.datetime.strptime(end_date, DATE_FORMAT)
+            + datetime.timedelta(days = 1), scale)
+    return (start, end)
+
+def get_date_scale(sms_db_path):
+    """Get the units of message.date in a messages database.
+
+    The unit is detected from the date of the last message
+    (see MAX_DATE_IN_SECONDS), which only reads one row.
+
+    Args:
+      sms_db_path: Path to the SMS/iMessage database.
+
+    Returns:
+      The number of units per second (1 for seconds or
+      NANOSECONDS_PER_SECOND for nanoseconds).
+    """
+    key = os.path.abspath(sms_db_path)
+    mtime = os.path.getmtime(key)
+    cached = _date_scales.get(key)
+    if (cached is not None and cached[0] == mtime):
+        return cached[1]
+    scale = 1
+    query = "SELECT date FROM message ORDER BY rowid DESC LIMIT 1"
+    for r in db.iter_query(sms_db_path, query):
+        if (r[0] is not None and abs(r[0]) > MAX_DATE_IN_SECONDS):
+            scale = NANOSECONDS_PER_SECOND
+    _date_scales[key] = (mtime, scale)
+    return scale
+
+def get_datetime_expression(column, scale, local = True):
+    """Get the SQL expression that converts a date to local time.
+
+    The DATETIME sqlite function converts the time from Mac Absolute
+    Time to Unix epoch time and then to localtime
+    (e.g., 2017-01-31 14:05:10).
+
+    Args:
+      column: Column with the date (e.g., m.date).
+      scale: Units of the date per second (see get_date_scale).
+      local: Convert the date to local time (UTC if False).
+    """
+    if (scale != 1):
+        column = "(" + column + " / " + str(scale) + ")"
+    expression = "DATETIME(" + column + " + " + str(APPLE_EPOCH_OFFSET) \
+        + ", 'unixepoch'"
+    if (local):
+        expression += ", 'localtime'"
+    return expression + ")"
+
+def _to_message_date(local_time, scale):
+    """Convert a local time to a message.date value.
+
+    Args:
+      local_time: datetime in the local time zone.
+      scale: Units of message.date per second.
+    """
+    seconds = int(time.mktime(local_time.timetuple())) - APPLE_EPOCH_OFFSET
+    return seconds * scale
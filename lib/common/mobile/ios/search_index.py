@@ -0,0 +1,296 @@
+"""Smartphone Framework Forensics
+    Full-text indexes of the iOS SMS/iMessage and Address Book databases.
+    Copyright (C) 2017  Sergio A. Nevarez
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+    Each index is a separate sqlite database (a cache file in the output
+    directory). The evidence databases are only read to build them.
+    They use the FTS5 trigram tokenizer, which answers the same
+    case-insensitive LIKE '%keyword%' filters as the indexed tables
+    without scanning every row.
+    For reference:
+    https://www.sqlite.org/fts5.html#the_trigram_tokenizer
+"""
+
+# Secure hashes and message digests
+# https://docs.python.org/2/library/hashlib.html
+import hashlib
+# JSON encoder and decoder
+# https://docs.python.org/2/library/json.html
+import json
+# Miscellaneous operating system interfaces
+# https://docs.python.org/2/library/os.html
+import os
+# Regular expression operations
+# https://docs.python.org/2/library/re.html
+import re
+# DB-API 2.0 interface for SQLite databases
+# https://docs.python.org/2/library/sqlite3.html
+import sqlite3
+
+# The db module includes the code to run queries on sqlite databases.
+from lib.common.db.sqlite import db
+
+# Version of the format of the index.
+# Indexes with a different version are rebuilt.
+INDEX_VERSION = 1
+
+# Name of the attached index in queries on the messages database
+# (e.g., search.message_fts).
+SCHEMA_NAME = "search"
+
+# Name of the attached index in queries on the Address Book
+# (e.g., contact_search.contact_fts).
+CONTACTS_SCHEMA_NAME = "contact_search"
+
+def attach_index(sms_db_path, cache_dir):
+    """Attach the index to the connection of the messages database.
+
+    The index is built (or rebuilt) first if needed. Queries on the
+    messages database can then filter messages with:
+      m.rowid IN (SELECT message_id FROM search.message_fts
+                  WHERE text LIKE ?)
+
+    Args:
+      sms_db_path: Path to the SMS/iMessage database.
+      cache_dir: Directory where the index is saved.
+    """
+    db.attach(sms_db_path, update_index(sms_db_path, cache_dir),
+        SCHEMA_NAME)
+
+def attach_contacts_index(contacts_db_path, cache_dir):
+    """Attach the contacts index to the connection of the Address Book.
+
+    The index is built (or rebuilt) first if needed. It has a row
+    for every entry of the Address Book (i.e., abmultivalue row)
+    with the following columns, in lower case (see normalize_text):
+      text: Name, organization and value of the entry.
+      split_text: Same as text with the first and last
+                  names as separate fields.
+      digits: Digits of the value (see get_digits), so phone
+              numbers match regardless of their formatting.
+      entry_id: rowid of the entry in abmultivalue.
+    Queries on the Address Book can then filter entries with:
+      m.rowid IN (SELECT entry_id FROM contact_search.contact_fts
+                  WHERE text LIKE ?)
+
+    Args:
+      contacts_db_path: Path to the Address Book database.
+      cache_dir: Directory where the index is saved.
+    """
+    index_path = _get_index_path("contacts", contacts_db_path, cache_dir)
+    _update_index(contacts_db_path, index_path, _fill_contacts_index)
+    db.attach(contacts_db_path, index_path, CONTACTS_SCHEMA_NAME)
+
+def get_digits(value):
+    """Get the digits of a value (e.g., (555) 123-4567 -> 5551234567)."""
+    return re.sub(r"[^0-9]", "", value)
+
+def get_index_path(sms_db_path, cache_dir):
+    """Get the path to the index of a messages database.
+
+    Args:
+      sms_db_path: Path to the SMS/iMessage database.
+      cache_dir: Directory where the index is saved.
+    """
+    return _get_index_path("messages", sms_db_path, cache_dir)
+
+def normalize_text(value):
+    """Convert a value to the lower case unicode text that is indexed.
+
+    Keywords are converted the same way before they are searched.
+    Unlike the LIKE operator, which only ignores the case of ASCII
+    letters, this ignores the case of any letter.
+
+    Args:
+      value: Text, number or None (converted to an empty string).
+    """
+    if (value is None):
+        return u""
+    if (type(value) is str):
+        value = value.decode("utf-8", "replace")
+    return unicode(value).lower()
+
+def update_index(sms_db_path, cache_dir):
+    """Build the index of a messages database if needed.
+
+    The index is built the first time and rebuilt if the messages
+    database changed (i.e., its size or modification time).
+
+    Args:
+      sms_db_path: Path to the SMS/iMessage database.
+      cache_dir: Directory where the index is saved.
+
+    Returns:
+      The path to the index.
+    """
+    index_path = get_index_path(sms_db_path, cache_dir)
+    _update_index(sms_db_path, index_path, _fill_messages_index)
+    return index_path
+
+def _build(db_path, index_path, signature, fill_function):
+    """Build the index of a database.
+
+    The index is written to a temporary file that replaces
+    the previous index when it is complete.
+
+    Args:
+      db_path: Path to the indexed database.
+      index_path: Path to the index.
+      signature: Signature of the indexed database.
+      fill_function: Function that creates and fills the tables
+                     of the index (arguments: connection to the
+                     index and db_path).
+    """
+    temp_path = index_path + ".tmp"
+    if (os.path.exists(temp_path)):
+        os.remove(temp_path)
+    conn = db.connect_writable(temp_path)
+    try:
+        # The file is discarded if the build fails,
+        # so there is no need for a journal.
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        fill_function(conn, db_path)
+        conn.execute("INSERT INTO meta VALUES ('signature', ?)",
+            (signature,))
+        conn.commit()
+    except sqlite3.OperationalError as e:
+        conn.close()
+        os.remove(temp_path)
+        raise IOError("Unable to build the search index (%s). " % e
+            + "The FTS5 trigram tokenizer requires SQLite 3.34 or newer.")
+    conn.close()
+    os.rename(temp_path, index_path)
+
+def _fill_contacts_index(conn, contacts_db_path):
+    """Create and fill the table of the contacts index.
+
+    The table only answers LIKE filters (detail=none),
+    which keeps the index small.
+
+    Args:
+      conn: Connection to the index.
+      contacts_db_path: Path to the Address Book database.
+    """
+    conn.execute("CREATE VIRTUAL TABLE contact_fts USING fts5(" \
+        + "text, split_text, digits, entry_id UNINDEXED, " \
+        + "tokenize = 'trigram', detail = none)")
+    query = "SELECT m.rowid, p.first, p.last, p.organization, m.value " \
+        + "FROM abperson p " \
+        + "JOIN abmultivalue m " \
+        + "ON m.record_id = p.rowid " \
+        + "WHERE m.value IS NOT NULL"
+    conn.executemany("INSERT INTO contact_fts " \
+        + "(text, split_text, digits, entry_id) VALUES (?, ?, ?, ?)",
+        _iter_contact_rows(db.iter_query(contacts_db_path, query)))
+
+def _fill_messages_index(conn, sms_db_path):
+    """Create and fill the table of the messages index.
+
+    Args:
+      conn: Connection to the index.
+      sms_db_path: Path to the SMS/iMessage database.
+    """
+    conn.execute("CREATE VIRTUAL TABLE message_fts USING fts5(" \
+        + "text, message_id UNINDEXED, chat_id UNINDEXED, " \
+        + "date UNINDEXED, tokenize = 'trigram')")
+    query = "SELECT m.text, m.rowid, cmj.chat_id, m.date " \
+        + "FROM message m " \
+        + "JOIN chat_message_join cmj " \
+        + "ON cmj.message_id = m.rowid " \
+        + "WHERE m.text IS NOT NULL"
+    conn.executemany("INSERT INTO message_fts " \
+        + "(text, message_id, chat_id, date) VALUES (?, ?, ?, ?)",
+        db.iter_query(sms_db_path, query))
+
+def _get_index_path(name, db_path, cache_dir):
+    """Get the path to an index of a database.
+
+    Args:
+      name: Name of the type of index (e.g., messages).
+      db_path: Path to the indexed database.
+      cache_dir: Directory where the index is saved.
+    """
+    digest = hashlib.sha1(os.path.abspath(db_path)).hexdigest()
+    return os.path.join(cache_dir, name + "_" + digest + ".fts.db")
+
+def _get_signature(db_path):
+    """Get a signature that changes when the indexed database changes."""
+    stat = os.stat(db_path)
+    return json.dumps([INDEX_VERSION, os.path.abspath(db_path),
+        stat.st_size, stat.st_mtime])
+
+def _iter_contact_rows(rows):
+    """Convert entries of the Address Book to rows of the contacts index.
+
+    Args:
+      rows: (entry ID, first, last, organization, value) tuples.
+
+    Yields
+      (text, split_text, digits, entry ID) tuples.
+    """
+    # The fields are separated by new lines, which keywords
+    # do not contain, so a keyword only matches within a field.
+    for r in rows:
+        first = normalize_text(r[1])
+        last = normalize_text(r[2])
+        organization = normalize_text(r[3])
+        value = normalize_text(r[4])
+        yield (u"\n".join([first + u" " + last, organization, value]),
+            u"\n".join([first, last, organization, value]),
+            get_digits(value),
+            r[0])
+
+def _read_signature(index_path):
+    """Read the signature of the database that an index was built from.
+
+    Returns:
+      The signature or None if the index does not exist or is invalid.
+    """
+    if (not os.path.isfile(index_path)):
+        return None
+    conn = db.connect_writable(index_path)
+    try:
+        rows = conn.execute(
+            "SELECT value FROM meta WHERE key = 'signature'").fetchall()
+    except sqlite3.DatabaseError:
+        return None
+    finally:
+        conn.close()
+    if (len(rows) == 0):
+        return None
+    return rows[0][0]
+
+def _update_index(db_path, index_path, fill_function):
+    """Build the index of a database if needed.
+
+    The index is built the first time and rebuilt if the indexed
+    database changed (i.e., its size or modification time).
+
+    Args:
+      db_path: Path to the indexed database.
+      index_path: Path to the index.
+      fill_function: Function that creates and fills the tables
+                     of the index (see _build).
+    """
+    signature = _get_signature(db_path)
+    if (_read_signature(index_path) != signature):
+        cache_dir = os.path.dirname(index_path)
+        if (not os.path.isdir(cache_dir)):
+            os.makedirs(cache_dir)
+        print "Building search index of '%s'..." % db_path
+        _build(db_path, index_path, signature, fill_function)
@@ -0,0 +1,193 @@
+"""Smartphone Framework Forensics
+    Profiler of module runs.
+    Copyright (C) 2017  Sergio A. Nevarez
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+    The functions that run during a profiled run are grouped by the
+    phase of the framework they belong to (e.g., SQL query), based on
+    the file that defines them or on their name. The time of each
+    phase is the time spent in its functions, excluding the functions
+    they call (i.e., the internal time), so the phases add up to the
+    total time of the run.
+    For reference:
+    https://docs.python.org/2/library/profile.html
+"""
+
+# Deterministic profiling of Python programs
+# https://docs.python.org/2/library/profile.html
+import cProfile
+# Miscellaneous operating system interfaces
+# https://docs.python.org/2/library/os.html
+import os
+# Statistics of the profiler
+# https://docs.python.org/2/library/profile.html#pstats.Stats
+import pstats
+# Regular expression operations
+# https://docs.python.org/2/library/re.html
+import re
+
+# Phases of the framework: (name, file pattern, function pattern).
+# Reading the evidence (sqlite3 execute and fetch) is part of the
+# SQL query phase, and writing the framework's databases (e.g., the
+# case database, with sqlite3 executemany) is part of the Writing phase.
+# A function belongs to the first phase whose file pattern matches
+# the path of the file that defines it, or whose function pattern
+# matches its name. Built-in functions (e.g., methods of sqlite3
+# cursors) have no file, so they are matched by name.
+PHASES = [
+    ("SQL query",
+        r"lib/common/db/|search_index\.py$",
+        r"'(execute|fetch\w*|cursor)' of 'sqlite3\.|<_sqlite3\.connect>|"
+        + r"_get_query$|_read_\w+$"),
+    ("Contact lookup",
+        r"contacts_helper\.py$|/phonenumbers/",
+        r"_get_people$"),
+    ("Attachment I/O",
+        r"lib/common/mobile/ios/(backup|mbdb)\.py$|lib/export/assets\.py$",
+        r"attachment|_get_image$|'read' of|^<open>$|posix\.stat|getsize"),
+    ("Text decoding",
+        r"messages_helper\.py$|/encodings/",
+        r"'decode' of|'encode' of|_format_\w*text$"),
+    ("Rendering",
+        r"lib/export/(table|html|pdf)\.py$|textwrap\.py$|saxutils\.py$|"
+        + r"/pdfkit/|subprocess\.py$",
+        r"unicodedata\.|_format_\w*rows$"),
+    ("Writing",
+        r"lib/export/(casedb|csv|jsonl)\.py$|/json/|csv\.py$",
+        r"'write' of|'writerow' of|'(executemany|commit)' of 'sqlite3\.")
+]
+
+# Phase of the functions that do not belong to any other phase.
+OTHER_PHASE = "Other"
+
+# Number of hotspots shown for each phase.
+TOP_FUNCTIONS = 5
+
+# Compiled patterns of PHASES.
+_PHASES = [(p[0], re.compile(p[1]), re.compile(p[2])) for p in PHASES]
+
+class Profile(object):
+    """Profile of a module run.
+
+    Attributes:
+      stats: The pstats.Stats of the run.
+    """
+    def __init__(self):
+        """Initializes the profile."""
+        self.stats = None
+        self._profiler = cProfile.Profile()
+
+    def run(self, function, *args):
+        """Profile a call to a function.
+
+        Args:
+          function: The function to call.
+          args: The arguments of the function.
+
+        Returns:
+          The value returned by the function.
+        """
+        self._profiler.enable()
+        try:
+            return function(*args)
+        finally:
+            self._profiler.disable()
+            self.stats = pstats.Stats(self._profiler)
+
+    def get_phase_rows(self):
+        """Get the time spent in each phase.
+
+        Returns:
+          List of (phase, seconds, percentage of the total time,
+          number of calls) rows, in the order of PHASES.
+        """
+        totals = dict([(p[0], [0.0, 0]) for p in PHASES + [(OTHER_PHASE,)]])
+        for key, value in self.stats.stats.iteritems():
+            total = totals[get_phase(key)]
+            total[0] += value[2]
+            total[1] += value[1]
+        total_time = sum([t[0] for t in totals.itervalues()]) or 1.0
+        rows = []
+        for name in [p[0] for p in PHASES] + [OTHER_PHASE]:
+            rows.append((name, "%.3f" % totals[name][0],
+                "%.1f%%" % (100 * totals[name][0] / total_time),
+                totals[name][1]))
+        return rows
+
+    def get_hotspot_rows(self, top = TOP_FUNCTIONS):
+        """Get the functions with the highest internal time of each phase.
+
+        Args:
+          top: Number of functions of each phase.
+
+        Returns:
+          List of (phase, function, internal seconds,
+          cumulative seconds, number of calls) rows.
+        """
+        functions = {}
+        for key, value in self.stats.stats.iteritems():
+            functions.setdefault(get_phase(key), []).append((key, value))
+        rows = []
+        for name in [p[0] for p in PHASES] + [OTHER_PHASE]:
+            hotspots = sorted(functions.get(name, []),
+                key = lambda f: f[1][2], reverse = True)[:top]
+            for key, value in hotspots:
+                rows.append((name, get_function_name(key),
+                    "%.3f" % value[2], "%.3f" % value[3], value[1]))
+        return rows
+
+    def save(self, file_path):
+        """Save the statistics to a file.
+
+        The file can be read with pstats (python -m pstats <file>)
+        or other tools that read cProfile output.
+
+        Args:
+          file_path: Path to the statistics file.
+        """
+        self.stats.dump_stats(file_path)
+
+def get_function_name(key):
+    """Get a readable name of a profiled function.
+
+    Args:
+      key: (file name, line number, function name) tuple.
+
+    Returns:
+      The name of the function followed by the file and line
+      (e.g., _get_query (extractconversations.py:840)),
+      or the name of a built-in function.
+    """
+    file_name, line, name = key
+    if (file_name == "~"):
+        return name
+    return "%s (%s:%d)" % (name, os.path.basename(file_name), line)
+
+def get_phase(key):
+    """Get the phase of the framework that a function belongs to.
+
+    Args:
+      key: (file name, line number, function name) tuple.
+
+    Returns:
+      The name of the phase (see PHASES) or OTHER_PHASE.
+    """
+    file_name = key[0].replace(os.sep, "/")
+    for name, file_pattern, function_pattern in _PHASES:
+        if (file_name != "~" and file_pattern.search(file_name)):
+            return name
+        if (function_pattern.search(key[2])):
+            return name
+    return OTHER_PHASE
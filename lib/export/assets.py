@@ -0,0 +1,116 @@
+"""Smartphone Framework Forensics
+    Functions to save files referenced by HTML and PDF output.
+    Copyright (C) 2017  Sergio A. Nevarez
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+# Secure hashes and message digests
+# https://docs.python.org/2/library/hashlib.html
+import hashlib
+# Miscellaneous operating system interfaces
+# https://docs.python.org/2/library/os.html
+import os
+# High-level file operations
+# https://docs.python.org/2/library/shutil.html
+import shutil
+
+# The metrics module keeps the counters and timers of the current run.
+from lib.common import metrics
+
+# Number of bytes read at a time to hash a file.
+HASH_CHUNK_SIZE = 1048576
+
+class AssetStore(object):
+    """Directory of files (e.g., attachments) referenced by the output.
+
+    Files are content-addressed: each file is stored once, named
+    after the SHA-256 hash of its contents, no matter how many times
+    or from how many source files it is added. Files are hard linked
+    from the source when possible and copied otherwise.
+
+    Attributes:
+      directory: Path to the directory where the files are stored.
+    """
+    def __init__(self, directory):
+        """Initializes the store.
+
+        Args:
+          directory: Path to the directory where the files are stored.
+                     The directory is created if it does not exist.
+        """
+        self.directory = directory
+        if (not os.path.isdir(directory)):
+            os.makedirs(directory)
+        # Names of the files that were already added,
+        # by source path and by hash
+        self._names = {}
+        self._names_by_hash = {}
+
+    def add(self, source_path, original_name = None):
+        """Add a file to the store.
+
+        Args:
+          source_path: Path to the file to add.
+          original_name: Optional original name of the file. Used to
+                         choose the file extension when the source
+                         file has none (e.g., files in an iOS backup).
+
+        Returns:
+          The name of the file within the store directory.
+        """
+        name = self._names.get(source_path)
+        if (name is not None):
+            return name
+        digest = _hash_file(source_path)
+        name = self._names_by_hash.get(digest)
+        if (name is None):
+            if (original_name is None):
+                original_name = source_path
+            name = digest + os.path.splitext(original_name)[1].lower()
+            path = os.path.join(self.directory, name)
+            if (not os.path.isfile(path)):
+                try:
+                    os.link(source_path, path)
+                except (AttributeError, OSError):
+                    # Hard links are not supported by the platform or
+                    # the source is on a different file system.
+                    shutil.copyfile(source_path, path)
+            self._names_by_hash[digest] = name
+        self._names[source_path] = name
+        return name
+
+    def get_path(self, name):
+        """Get the full path of a file in the store.
+
+        Args:
+          name: The name of the file returned by add().
+        """
+        return os.path.join(self.directory, name)
+
+def _hash_file(path):
+    """Get the SHA-256 hash of the contents of a file.
+
+    Args:
+      path: Path to the file.
+    """
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if (not chunk):
+                break
+            metrics.increment("attachments.bytes_read", len(chunk))
+            sha256.update(chunk)
+    return sha256.hexdigest()
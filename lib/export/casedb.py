@@ -0,0 +1,237 @@
+"""Smartphone Framework Forensics
+    Functions to generate the sqlite case database.
+    Copyright (C) 2017  Sergio A. Nevarez
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+    The case database is a normalized copy of the data extracted by the
+    modules, so it can be loaded into other tools without parsing the
+    html or pdf output. Every module writes to the same database, and
+    every table starts with the ID of the backup the rows come from,
+    so one database can hold the data of several backups.
+    Rows are identified by the IDs they have in the backup (e.g., the
+    rowid of the message), so exporting the same data again replaces
+    the rows of the previous export instead of duplicating them.
+    When several backups are processed at the same time, each worker
+    writes its own case database, which is then merged into the case
+    database of the run (see CaseDatabase.merge).
+"""
+
+# Efficient arbitrary-length iteration
+# https://docs.python.org/2/library/itertools.html
+import itertools
+# Miscellaneous operating system interfaces
+# https://docs.python.org/2/library/os.html
+import os
+# Time access and conversions
+# https://docs.python.org/2/library/time.html
+import time
+
+# The db module includes the code to run queries on sqlite databases.
+from lib.common.db.sqlite import db
+
+# Number of rows inserted with each executemany call.
+BATCH_SIZE = 10000
+
+# Version of the schema of the case database.
+SCHEMA_VERSION = 1
+
+# Tables of the case database: (name, columns, primary key).
+# The backup_id column is added in front of the columns
+# and of the primary key of every table.
+TABLES = [
+    ("contacts",
+        ["contact_id INTEGER", "first TEXT", "last TEXT",
+         "organization TEXT"],
+        ["contact_id"]),
+    ("contact_entries",
+        ["entry_id INTEGER", "contact_id INTEGER", "type TEXT",
+         "value TEXT"],
+        ["entry_id"]),
+    ("chats",
+        ["chat_id INTEGER", "chat_identifier TEXT"],
+        ["chat_id"]),
+    ("handles",
+        ["handle_id INTEGER", "address TEXT", "service TEXT"],
+        ["handle_id"]),
+    ("chat_handles",
+        ["chat_id INTEGER", "handle_id INTEGER"],
+        ["chat_id", "handle_id"]),
+    # date: message.date as stored in the backup.
+    # date_utc: The same date in UTC (e.g., 2017-01-31 19:05:10).
+    # text: message.text, where each attachment is represented
+    #       by the object replacement character (U+FFFC).
+    ("messages",
+        ["message_id INTEGER", "chat_id INTEGER", "handle_id INTEGER",
+         "date INTEGER", "date_utc TEXT", "is_from_me INTEGER",
+         "service TEXT", "subject TEXT", "text TEXT"],
+        ["message_id"]),
+    # position: Order of the attachment within the message.
+    # path: Path to the attachment in the backup directory
+    #       (NULL if it is not in the backup).
+    ("attachments",
+        ["message_id INTEGER", "position INTEGER", "mime_type TEXT",
+         "filename TEXT", "transfer_name TEXT", "total_bytes INTEGER",
+         "path TEXT"],
+        ["message_id", "position"])
+]
+
+# Indexes of the case database: (table, columns).
+INDEXES = [
+    ("contact_entries", ["backup_id", "contact_id"]),
+    ("contact_entries", ["value"]),
+    ("handles", ["address"]),
+    ("chat_handles", ["backup_id", "handle_id"]),
+    ("messages", ["backup_id", "chat_id", "date"]),
+    ("messages", ["backup_id", "handle_id"]),
+    ("messages", ["date_utc"])
+]
+
+class CaseDatabase(object):
+    """Writer of a sqlite case database.
+
+    The database (and its schema) is created if it does not exist.
+    All the rows are inserted in a single transaction, which is
+    only committed by commit(), so an export that fails does not
+    leave partial data in the database.
+    """
+    def __init__(self, path):
+        """Open the case database.
+
+        Args:
+          path: Path to the case database.
+        """
+        self.path = path
+        self._conn = db.connect_writable(path)
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._create_schema()
+
+    def add_backup(self, backup_dir):
+        """Add a backup to the database.
+
+        Args:
+          backup_dir: Path to the iOS backup.
+
+        Returns:
+          The ID of the backup in the database. A backup that was
+          already added keeps its ID.
+        """
+        backup_dir = os.path.abspath(backup_dir)
+        exported = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+        self._conn.execute("INSERT OR IGNORE INTO backups " \
+            + "(backup_dir, exported) VALUES (?, ?)",
+            (backup_dir, exported))
+        self._conn.execute("UPDATE backups SET exported = ? " \
+            + "WHERE backup_dir = ?", (exported, backup_dir))
+        return self._conn.execute("SELECT backup_id FROM backups " \
+            + "WHERE backup_dir = ?", (backup_dir,)).fetchone()[0]
+
+    def close(self):
+        """Close the database. Rows that were not committed are lost."""
+        self._conn.close()
+
+    def commit(self):
+        """Commit the rows inserted since the database was opened."""
+        self._conn.commit()
+
+    def insert(self, table, backup_id, rows):
+        """Insert rows into a table of the database.
+
+        The rows are read as they are inserted, in batches of
+        BATCH_SIZE rows. Rows with the same primary key as an
+        existing row replace it.
+
+        Args:
+          table: Name of the table (see TABLES).
+          backup_id: ID of the backup the rows come from
+                     (see add_backup).
+          rows: Iterable of tuples with the values of the columns
+                of the table, without the backup_id.
+
+        Returns:
+          The number of rows inserted.
+        """
+        columns = dict([(t[0], t[1]) for t in TABLES])[table]
+        statement = "INSERT OR REPLACE INTO " + table + " VALUES (" \
+            + ", ".join(["?"] * (len(columns) + 1)) + ")"
+        rows = ((backup_id,) + tuple(r) for r in rows)
+        count = 0
+        while True:
+            batch = list(itertools.islice(rows, BATCH_SIZE))
+            if (len(batch) == 0):
+                break
+            self._conn.executemany(statement, batch)
+            count += len(batch)
+        return count
+
+    def merge(self, path):
+        """Add the data of another case database to the database.
+
+        Backups are matched by their directory, so a backup that is
+        already in the database keeps its ID and its rows are replaced.
+        The other database cannot be attached within a transaction, so
+        the rows inserted before the merge are committed first, and the
+        merged rows are committed when the merge is complete.
+
+        Args:
+          path: Path to the other case database.
+
+        Returns:
+          The number of rows added.
+        """
+        self.commit()
+        self._conn.execute("ATTACH DATABASE ? AS merged", (path,))
+        try:
+            count = 0
+            backups = self._conn.execute("SELECT backup_id, backup_dir, " \
+                + "exported FROM merged.backups").fetchall()
+            for backup_id, backup_dir, exported in backups:
+                merged_id = self.add_backup(backup_dir)
+                self._conn.execute("UPDATE backups SET exported = ? " \
+                    + "WHERE backup_id = ?", (exported, merged_id))
+                for name, columns, key in TABLES:
+                    count += self._conn.execute("INSERT OR REPLACE INTO " \
+                        + name + " SELECT ?, " \
+                        + ", ".join([c.split()[0] for c in columns]) \
+                        + " FROM merged." + name + " WHERE backup_id = ?",
+                        (merged_id, backup_id)).rowcount
+            self.commit()
+        finally:
+            # Rows that were not committed are discarded.
+            self._conn.rollback()
+            self._conn.execute("DETACH DATABASE merged")
+        return count
+
+    # ***************************************************************
+    # HELPER methods
+    # ***************************************************************
+
+    def _create_schema(self):
+        """Create the tables and indexes that do not exist."""
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta " \
+            + "(key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute("INSERT OR IGNORE INTO meta " \
+            + "VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
+        self._conn.execute("CREATE TABLE IF NOT EXISTS backups " \
+            + "(backup_id INTEGER PRIMARY KEY, " \
+            + "backup_dir TEXT UNIQUE, exported TEXT)")
+        for name, columns, key in TABLES:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS " + name \
+                + " (backup_id INTEGER, " + ", ".join(columns) \
+                + ", PRIMARY KEY (backup_id, " + ", ".join(key) + "))")
+        for table, columns in INDEXES:
+            self._conn.execute("CREATE INDEX IF NOT EXISTS " \
+                + "_".join(["idx", table] + columns) \
+                + " ON " + table + " (" + ", ".join(columns) + ")")
+        self._conn.commit()
@@ -0,0 +1,73 @@
+"""Smartphone Framework Forensics
+    Functions to export output to CSV.
+    Copyright (C) 2017  Sergio A. Nevarez
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+# This module is named after the csv module of the standard library,
+# which would otherwise be shadowed by it.
+from __future__ import absolute_import
+
+# CSV File Reading and Writing
+# https://docs.python.org/2/library/csv.html
+import csv
+
+# Size of the buffer of the output file.
+BUFFER_SIZE = 1048576
+
+# Separator of the values of a cell that contains a list
+# (e.g., the paths of the attachments of a message).
+LIST_SEPARATOR = u"\n"
+
+def create_document_from_row_list(title, header, row_list,
+    file_path):
+    """Create and save CSV document from a table.
+
+    The document is written as the rows are read,
+    so the rows can be an iterator of any length.
+    The document is encoded in UTF-8.
+
+    Args:
+      title: Not used (CSV documents only contain the table).
+      header: Not used.
+      row_list: List of rows containing the data. The first row
+                contains the headers. The cells can be text, numbers,
+                None (an empty cell) or lists of values.
+      file_path: full path of the csv document to save
+    """
+    with open(file_path, "wb", BUFFER_SIZE) as output_file:
+        write_rows(output_file, row_list)
+
+def write_rows(output_file, row_list):
+    """Write rows of a table to a CSV file.
+
+    Args:
+      output_file: File object where the rows are written.
+      row_list: Rows to write.
+    """
+    writer = csv.writer(output_file)
+    for r in row_list:
+        writer.writerow([_encode(col) for col in r])
+
+def _encode(value):
+    """Encode a cell as UTF-8 text."""
+    if (value is None):
+        return ""
+    if (type(value) is list):
+        value = LIST_SEPARATOR.join(
+            [u"" if (v is None) else unicode(v) for v in value])
+    if (type(value) is str):
+        return value
+    return unicode(value).encode("utf-8")
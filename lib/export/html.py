@@ -16,68 +16,185 @@
     along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-# System-specific parameters and functions
-# https://docs.python.org/2/library/sys.html
-import sys
-
-try:
-    # Python library for generating HTML
-    # http://www.yattag.org/
-    from yattag import Doc
-    from yattag import indent
-except ImportError as e:
-    # At least one of the required modules is not installed
-    # on this system.
-    print "Module \"{0}\" not installed".format(e.message[16:])
-    # Exit program
-    sys.exit(1)
+# Base 64 encoding of binary data
+# https://docs.python.org/2/library/base64.html
+import base64
+# Miscellaneous operating system interfaces
+# https://docs.python.org/2/library/os.html
+import os
+# Escape strings for XML/HTML
+# https://docs.python.org/2/library/xml.sax.utils.html
+from xml.sax.saxutils import escape
+
+# The metrics module keeps the counters and timers of the current run.
+from lib.common import metrics
+
+# Size of the buffer of the output file.
+BUFFER_SIZE = 1048576
+
+# Number of bytes of an image read at a time.
+# Multiple of 3 so that each chunk is encoded to base64 without padding.
+IMAGE_CHUNK_SIZE = 3 * 65536
+
+# Markup written after the last row of a document.
+DOCUMENT_END = "</table></body></html>"
+
+class Image(object):
+    """Image to include in a cell of the document.
+
+    By default the contents of the image file are streamed into the
+    document as a base64 data URI when the document is written.
+    If a source (src) is given, the document references it instead
+    and the browser loads the image lazily.
+
+    Attributes:
+      mime_type: The MIME type of the image (e.g., image/jpeg).
+      path: Path to the image file.
+      src: URL of the image or None to embed the image.
+    """
+    def __init__(self, path, mime_type, src = None):
+        """Initializes the image.
+
+        Args:
+          path: Path to the image file.
+          mime_type: The MIME type of the image.
+          src: Optional URL (e.g., relative path) of the image.
+        """
+        self.path = path
+        self.mime_type = mime_type
+        self.src = src
+
+    def write(self, output_file):
+        """Write the image to the document.
+
+        Args:
+          output_file: File object of the document.
+        """
+        if (self.src is not None):
+            output_file.write('<img loading="lazy" style=' \
+                + '"max-width: 400px; ' \
+                + 'max-height: 400px;" src="' \
+                + _encode(escape(self.src, {"\"": "&quot;"})) \
+                + '" /><br>')
+            return
+        output_file.write('<img style=' \
+            + '"max-width: 400px; ' \
+            + 'max-height: 400px;" src="data:' \
+            + _encode(self.mime_type) + ';base64,')
+        with open(self.path, "rb") as image_file:
+            while True:
+                chunk = image_file.read(IMAGE_CHUNK_SIZE)
+                if (not chunk):
+                    break
+                metrics.increment("attachments.bytes_read", len(chunk))
+                output_file.write(base64.b64encode(chunk))
+        output_file.write('" /><br>')
+
+def append_rows_to_document(row_list, file_path):
+    """Append rows to the table of an HTML document.
+
+    The rows are written in place of the end of the document,
+    so the rest of the document is not read or rewritten.
+
+    Args:
+      row_list: Rows to append.
+      file_path: full path of an html document created by
+                 create_document_from_row_list().
+
+    Raises:
+      IOError: The document is not complete (see is_document_complete).
+    """
+    with open(file_path, "r+b", BUFFER_SIZE) as output_file:
+        output_file.seek(-len(DOCUMENT_END), os.SEEK_END)
+        if (output_file.read(len(DOCUMENT_END)) != DOCUMENT_END):
+            raise IOError("'%s' is not a complete document." % file_path)
+        output_file.seek(-len(DOCUMENT_END), os.SEEK_END)
+        output_file.truncate()
+        write_rows(output_file, row_list)
+        output_file.write(DOCUMENT_END)
 
 def create_document_from_row_list(title, header, row_list,
     file_path):
     """Create and save HTML5 document from a table.
 
+    The document is written as the rows are read,
+    so the rows can be an iterator of any length.
+
     Args:
       title: The title that will be used on the document.
-      row_list: List of rows containing the data
-      file_path: full path of the pdf document to save
+      header: Optional text to show under the title.
+      row_list: List of rows containing the data.
+                The cells can be text, None or a list of
+                text and Image fragments.
+      file_path: full path of the html document to save
+    """
+    with open(file_path, "wb", BUFFER_SIZE) as output_file:
+        write_document(output_file, title, header, row_list)
+
+def is_document_complete(file_path):
+    """Determine if an HTML document exists and was completely written.
+
+    Args:
+      file_path: full path of the html document.
+
+    Returns:
+      True if rows can be appended to the document.
     """
-    with open(file_path, "w+") as output_file:
-        output_file.write(
-            generate_document_from_row_list(
-                title, header, row_list).encode('ascii', 'xmlcharrefreplace')
-        )
+    try:
+        with open(file_path, "rb") as document:
+            document.seek(0, os.SEEK_END)
+            if (document.tell() < len(DOCUMENT_END)):
+                return False
+            document.seek(-len(DOCUMENT_END), os.SEEK_END)
+            return document.read() == DOCUMENT_END
+    except IOError:
+        return False
 
-def generate_document_from_row_list(title, header, row_list):
-    """Create HTML5 document from a table.
+def write_document(output_file, title, header, row_list):
+    """Write HTML5 document from a table to a file.
 
     Args:
+      output_file: File object where the document is written.
       title: Title of html document.
+      header: Optional text to show under the title.
       row_list: Table with the data to generate the document.
     """
-    doc, tag, text = Doc().tagtext()
-    doc.asis("<!DOCTYPE html>")
-    with tag("html"):
-        with tag("head"):
-            doc.asis("<meta charset=\"utf-8\">")
-            with tag("title"):
-                text(title)
-        with tag("body"):
-            with tag("h1"):
-                text(title)
-            if (header is not None):
-                with tag("h3"):
-                    text(header)
-            with tag("table", border="1"):
-                for r in row_list:
-                    num_cols = len(r)
-                    with tag("tr"):
-                        for i in range(num_cols):
-                            with tag("td"):
-                                if r[i] is None:
-                                    text("")
-                                elif unicode(r[i]).encode(
-                                    "unicode-escape").startswith("<img"):
-                                    doc.asis(r[i])
-                                else:
-                                    text(r[i])
-    return doc.getvalue()
+    output_file.write("<!DOCTYPE html>")
+    output_file.write("<html><head><meta charset=\"utf-8\"><title>"
+        + _encode_text(title) + "</title></head><body><h1>"
+        + _encode_text(title) + "</h1>")
+    if (header is not None):
+        output_file.write("<h3>" + _encode_text(header) + "</h3>")
+    output_file.write("<table border=\"1\">")
+    write_rows(output_file, row_list)
+    output_file.write(DOCUMENT_END)
+
+def write_rows(output_file, row_list):
+    """Write rows of the table of a document to a file.
+
+    Args:
+      output_file: File object where the rows are written.
+      row_list: Rows to write.
+    """
+    for r in row_list:
+        output_file.write("<tr>")
+        for col in r:
+            output_file.write("<td>")
+            if (type(col) is list):
+                for fragment in col:
+                    if (isinstance(fragment, Image)):
+                        fragment.write(output_file)
+                    else:
+                        output_file.write(_encode_text(fragment))
+            elif (col is not None):
+                output_file.write(_encode_text(col))
+            output_file.write("</td>")
+        output_file.write("</tr>")
+
+def _encode(value):
+    """Encode text as ASCII using character references if needed."""
+    return unicode(value).encode("ascii", "xmlcharrefreplace")
+
+def _encode_text(value):
+    """Escape and encode text to include it in the document."""
+    return _encode(escape(unicode(value)))
@@ -0,0 +1,68 @@
+"""Smartphone Framework Forensics
+    Functions to export output to JSON Lines.
+    Copyright (C) 2017  Sergio A. Nevarez
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+    Each row of the table is written as a JSON object on its own line,
+    with the headers of the table as keys.
+    For reference:
+    http://jsonlines.org/
+"""
+
+# High-performance container datatypes
+# https://docs.python.org/2/library/collections.html
+from collections import OrderedDict
+# JSON encoder and decoder
+# https://docs.python.org/2/library/json.html
+import json
+
+# Size of the buffer of the output file.
+BUFFER_SIZE = 1048576
+
+def create_document_from_row_list(title, header, row_list,
+    file_path):
+    """Create and save JSON Lines document from a table.
+
+    The document is written as the rows are read,
+    so the rows can be an iterator of any length.
+
+    Args:
+      title: Not used (JSON Lines documents only contain the table).
+      header: Not used.
+      row_list: List of rows containing the data. The first row
+                contains the headers, which are used as the keys of
+                the objects. The cells can be text, numbers, None
+                or lists of values.
+      file_path: full path of the jsonl document to save
+    """
+    row_list = iter(row_list)
+    keys = next(row_list, None)
+    with open(file_path, "wb", BUFFER_SIZE) as output_file:
+        if (keys is not None):
+            write_rows(output_file, keys, row_list)
+
+def write_rows(output_file, keys, row_list):
+    """Write rows of a table to a JSON Lines file.
+
+    Args:
+      output_file: File object where the rows are written.
+      keys: Headers of the table.
+      row_list: Rows to write (without the headers).
+    """
+    # Non-ASCII characters are escaped, so the lines are ASCII text.
+    encoder = json.JSONEncoder(separators = (",", ":"))
+    for r in row_list:
+        output_file.write(encoder.encode(OrderedDict(zip(keys, r))))
+        output_file.write("\n")
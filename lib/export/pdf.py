@@ -16,42 +16,205 @@
     along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-# System-specific parameters and functions
-# https://docs.python.org/2/library/sys.html
-import sys
+# High-performance container datatypes
+# https://docs.python.org/2/library/collections.html
+import collections
+# Thread-based pool of workers
+# https://docs.python.org/2/library/multiprocessing.html
+from multiprocessing.pool import ThreadPool
+# Miscellaneous operating system interfaces
+# https://docs.python.org/2/library/os.html
+import os
+# Subprocess management
+# https://docs.python.org/2/library/subprocess.html
+import subprocess
+# Generate temporary files and directories
+# https://docs.python.org/2/library/tempfile.html
+import tempfile
+# Higher-level threading interface
+# https://docs.python.org/2/library/threading.html
+import threading
 
+# The imports module loads third-party modules when they are first used.
+from lib.common import imports
 # The html module contains functions to generate html output
 from lib.export import html
 
-try:
-    # Wkhtmltopdf python wrapper to convert html to pdf
-    # https://pypi.python.org/pypi/pdfkit
-    import pdfkit
-except ImportError as e:
-    # At least one of the required modules is not installed
-    # on this system.
-    print "Module \"{0}\" not installed".format(e.message[16:])
-    # Exit program
-    sys.exit(1)
+class RenderPool(object):
+    """Pool of threads that convert html documents to pdf concurrently.
 
-def create_document_from_row_list(title, header, row_list,
-    file_path, is_landscape = False):
-    """Create and save PDF document from a table.
+    Each conversion runs in its own wkhtmltopdf process, so the
+    threads only wait for the processes to finish. A failed or timed
+    out conversion does not affect the other conversions.
+    Results are reported in the order in which the
+    conversions were submitted.
+    """
+    def __init__(self, workers, timeout = None):
+        """Initializes the pool.
+
+        Args:
+          workers: Number of conversions to run at the same time.
+          timeout: Optional number of seconds after which a
+                   conversion is stopped.
+        """
+        # Import pdfkit in the calling thread, so that a missing
+        # dependency is reported before any conversion starts.
+        imports.require("pdfkit")
+        self._pool = ThreadPool(workers)
+        self._timeout = timeout
+        # Pending conversions in submission order
+        self._jobs = collections.deque()
+
+    def submit(self, html_paths, file_path, is_landscape = False,
+        local_files = False):
+        """Submit the conversion of html documents to a pdf document.
+
+        The html documents are removed after the conversion.
+
+        Args:
+          html_paths: List of paths to the html documents.
+                      The documents are concatenated in the pdf.
+          file_path: full path of the pdf document to save
+          is_landscape: Whether to use landscape orientation.
+          local_files: Whether the documents reference local files.
+        """
+        result = self._pool.apply_async(_convert_safely,
+            (html_paths, file_path, is_landscape, local_files,
+                self._timeout))
+        self._jobs.append((file_path, result))
+
+    def get_completed(self):
+        """Yield the results of the conversions that already finished.
+
+        Only the conversions that finished before every conversion
+        submitted earlier are reported, to keep the order.
+
+        Yields:
+          Tuples with the path of the pdf document and an error
+          message (None if the conversion succeeded).
+        """
+        while (len(self._jobs) > 0 and self._jobs[0][1].ready()):
+            file_path, result = self._jobs.popleft()
+            yield (file_path, result.get())
+
+    def wait(self):
+        """Wait for every conversion to finish and yield the results.
+
+        Yields:
+          Tuples with the path of the pdf document and an error
+          message (None if the conversion succeeded).
+        """
+        self._pool.close()
+        while (len(self._jobs) > 0):
+            file_path, result = self._jobs.popleft()
+            yield (file_path, result.get())
+        self._pool.join()
+
+def convert(html_paths, file_path, is_landscape = False,
+    local_files = False, timeout = None):
+    """Convert html documents to a pdf document with wkhtmltopdf.
+
+    The html documents are removed after the conversion.
 
     Args:
-      title: The title that will be used on the first page of the document.
-      row_list: List of rows containing the data
+      html_paths: List of paths to the html documents.
+                  The documents are concatenated in the pdf.
       file_path: full path of the pdf document to save
+      is_landscape: Whether to use landscape orientation.
+      local_files: Whether the documents reference local files
+                   (e.g., images saved to an assets directory).
+      timeout: Optional number of seconds after which
+               wkhtmltopdf is stopped.
     """
     options = {
         'page-size': 'Letter',
-        'encoding': "UTF-8"
+        'encoding': "UTF-8",
+        'quiet': None
     }
     if (is_landscape):
         options["orientation"] = 'Landscape'
-    pdfkit.from_string(
-        html.generate_document_from_row_list(
-            title, header, row_list).encode('unicode-escape'),
-        file_path,
-        options
-    )
\ No newline at end of file
+    if (local_files):
+        # Newer versions of wkhtmltopdf block access to local files
+        # referenced by the document unless they are allowed.
+        options["enable-local-file-access"] = None
+    try:
+        # Wkhtmltopdf python wrapper to convert html to pdf
+        # https://pypi.python.org/pypi/pdfkit
+        pdfkit = imports.require("pdfkit")
+        args = pdfkit.PDFKit(html_paths, "file",
+            options = options).command(file_path)
+        process = subprocess.Popen(args,
+            stdout = subprocess.PIPE, stderr = subprocess.PIPE)
+        timed_out = threading.Event()
+        timer = None
+        if (timeout):
+            def stop():
+                timed_out.set()
+                process.kill()
+            timer = threading.Timer(timeout, stop)
+            timer.start()
+        try:
+            stderr = process.communicate()[1]
+        finally:
+            if (timer is not None):
+                timer.cancel()
+        if (timed_out.is_set()):
+            raise IOError("wkhtmltopdf timed out after %s seconds" % timeout)
+        if (process.returncode != 0):
+            raise IOError("wkhtmltopdf exited with code %d: %s" \
+                % (process.returncode, stderr.strip()))
+    finally:
+        for html_path in html_paths:
+            os.remove(html_path)
+
+def create_document_from_row_list(title, header, row_list,
+    file_path, is_landscape = False, local_files = False):
+    """Create and save PDF document from a table.
+
+    The table is first streamed to a temporary html document,
+    which wkhtmltopdf then converts to pdf.
+
+    Args:
+      title: The title that will be used on the first page of the document.
+      header: Optional text to show under the title.
+      row_list: List of rows containing the data
+      file_path: full path of the pdf document to save
+      is_landscape: Whether to use landscape orientation.
+      local_files: Whether the document references local files
+                   (e.g., images saved to an assets directory).
+    """
+    convert([write_html(title, header, row_list)],
+        file_path, is_landscape, local_files)
+
+def write_html(title, header, row_list):
+    """Write a table to a temporary html document to convert to pdf.
+
+    Args:
+      title: The title that will be used on the first page of the document.
+      header: Optional text to show under the title.
+      row_list: List of rows containing the data
+
+    Returns:
+      The path to the html document.
+    """
+    html_file, html_path = tempfile.mkstemp(suffix = ".html")
+    try:
+        with os.fdopen(html_file, "wb", html.BUFFER_SIZE) as output_file:
+            html.write_document(output_file, title, header, row_list)
+    except:
+        os.remove(html_path)
+        raise
+    return html_path
+
+def _convert_safely(html_paths, file_path, is_landscape, local_files,
+    timeout):
+    """Convert html documents to pdf in a RenderPool thread.
+
+    Returns:
+      None if the conversion succeeded or the error message otherwise.
+    """
+    try:
+        convert(html_paths, file_path, is_landscape, local_files, timeout)
+    except Exception as e:
+        return str(e)
+    return None
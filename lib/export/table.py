@@ -0,0 +1,233 @@
+"""Smartphone Framework Forensics
+    Functions to print tables to the terminal.
+    Copyright (C) 2017  Sergio A. Nevarez
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+    Tables are printed in the same format as the AsciiTable class of
+    terminaltables (with inner row borders), but rows are printed as
+    they are read instead of after the whole table was built.
+    For reference:
+    https://pypi.python.org/pypi/terminaltables
+"""
+
+# Efficient arbitrary-length iteration
+# https://docs.python.org/2/library/itertools.html
+import itertools
+# Miscellaneous operating system interfaces
+# https://docs.python.org/2/library/os.html
+import os
+# Regular expression operations
+# https://docs.python.org/2/library/re.html
+import re
+# Subprocess management
+# https://docs.python.org/2/library/subprocess.html
+import subprocess
+# System-specific parameters and functions
+# https://docs.python.org/2/library/sys.html
+import sys
+# Text wrapping and filling
+# https://docs.python.org/2/library/textwrap.html
+from textwrap import wrap
+# Unicode database
+# https://docs.python.org/2/library/unicodedata.html
+import unicodedata
+
+# Longer text is wrapped to lines of this width.
+MAX_CELL_WIDTH = 45
+
+# Number of rows (after the headers) used to compute the width of
+# the columns. Cells of later rows that do not fit are wrapped.
+SAMPLE_SIZE = 100
+
+# Pager used if the PAGER environment variable is not set.
+# -F: exit if the table fits on one screen, -R: keep colors,
+# -S: do not wrap long lines, -X: keep the table on the screen.
+DEFAULT_PAGER = "less -FRSX"
+
+# ANSI color codes, which have no width.
+_ANSI_COLOR = re.compile(r"(\033\[[\d;]+m)")
+
+def iter_table_lines(rows, max_width = MAX_CELL_WIDTH,
+    sample_size = SAMPLE_SIZE):
+    """Yield the lines of a table as its rows are read.
+
+    The rows are read one at a time. Only the headers and the first
+    sample_size rows are read before the first line is yielded, to
+    compute the width of each column.
+
+    Args:
+      rows: Iterable of rows (lists of values). The first row contains
+            the headers and sets the number of columns.
+      max_width: Text longer than this is wrapped.
+      sample_size: Number of rows used to compute the column widths.
+
+    Yields
+      The lines of the table (without line terminators).
+    """
+    rows = iter(rows)
+    sample = [_get_cell_lines(row, max_width)
+        for row in itertools.islice(rows, sample_size + 1)]
+    if (len(sample) == 0):
+        return
+    num_columns = max([len(row) for row in sample])
+    widths = [0] * num_columns
+    for row in sample:
+        for i in range(len(row)):
+            widths[i] = max([widths[i]]
+                + [_get_visible_width(l) for l in row[i]])
+    border = "+" + "+".join(["-" * (w + 2) for w in widths]) + "+"
+    yield border
+    for row in sample:
+        for line in _iter_row_lines(row, widths):
+            yield line
+        yield border
+    for row in rows:
+        row = _get_cell_lines(row, max_width)
+        # Cells that are wider than their column are wrapped again
+        for i in range(min(len(row), num_columns)):
+            if (max([_get_visible_width(l) for l in row[i]]) > widths[i]):
+                row[i] = list(itertools.chain.from_iterable(
+                    [wrap(l, widths[i]) or [u""] for l in row[i]]))
+        for line in _iter_row_lines(row[:num_columns], widths):
+            yield line
+        yield border
+
+def print_table(rows, offset = 0, limit = 0, pager = False):
+    """Print a table to stdout as its rows are read.
+
+    Args:
+      rows: Iterable of rows. The first row contains the headers.
+      offset: Number of rows (after the headers) to skip.
+      limit: Maximum number of rows (after the headers) to print
+             (0 for no limit).
+      pager: Send the table to a pager (the PAGER environment
+             variable or DEFAULT_PAGER) if stdout is a terminal.
+    """
+    lines = iter_table_lines(slice_rows(rows, offset, limit))
+    if (not pager or not sys.stdout.isatty()):
+        for line in lines:
+            print_text(line)
+        return
+    sys.stdout.flush()
+    process = subprocess.Popen(os.environ.get("PAGER", DEFAULT_PAGER),
+        shell = True, stdin = subprocess.PIPE)
+    try:
+        for line in lines:
+            if (type(line) is unicode):
+                line = line.encode("utf-8")
+            process.stdin.write(line + "\n")
+        process.stdin.close()
+    except IOError:
+        # The pager was closed before the end of the table.
+        pass
+    process.wait()
+
+def print_text(text):
+    """Print a line of text to stdout.
+
+    Unicode text is encoded with the encoding of stdout, or UTF-8
+    if stdout is redirected (e.g., to a file), which has no encoding.
+    """
+    if (type(text) is unicode):
+        text = text.encode(sys.stdout.encoding or "utf-8", "replace")
+    print text
+
+def slice_rows(rows, offset = 0, limit = 0):
+    """Select a page of the rows of a table.
+
+    Args:
+      rows: Iterable of rows. The first row contains the headers,
+            which are always included.
+      offset: Number of rows (after the headers) to skip.
+      limit: Maximum number of rows (after the headers) to include
+             (0 for no limit).
+
+    Yields
+      The headers and the selected rows.
+    """
+    rows = iter(rows)
+    headers = next(rows, None)
+    if (headers is None):
+        return
+    yield headers
+    stop = None
+    if (limit > 0):
+        stop = offset + limit
+    for row in itertools.islice(rows, offset, stop):
+        yield row
+
+# ***************************************************************
+# HELPER methods
+# ***************************************************************
+
+def _get_cell_lines(row, max_width):
+    """Split the cells of a row into lines.
+
+    Text longer than max_width is wrapped first.
+
+    Args:
+      row: List of values.
+      max_width: Text longer than this is wrapped.
+
+    Returns:
+      List with the lines of each cell.
+    """
+    cells = []
+    for col in row:
+        if (type(col) is str):
+            col = col.decode("utf-8", "replace")
+        elif (type(col) is not unicode):
+            col = unicode(col)
+        if (len(col) > max_width):
+            col = u"\n".join(wrap(col, max_width))
+        lines = col.splitlines() or [u""]
+        if (col.endswith(u"\n")):
+            lines.append(u"")
+        cells.append(lines)
+    return cells
+
+def _get_visible_width(text):
+    """Get the number of columns that a line takes in the terminal.
+
+    Wide characters (e.g., CJK characters) take two columns.
+    """
+    if (u"\033" in text):
+        text = _ANSI_COLOR.sub(u"", text)
+    width = 0
+    for c in text:
+        if (unicodedata.east_asian_width(c) in (u"F", u"W")):
+            width += 2
+        else:
+            width += 1
+    return width
+
+def _iter_row_lines(row, widths):
+    """Yield the lines of a row of the table.
+
+    Args:
+      row: List with the lines of each cell (see _get_cell_lines).
+           Missing cells are printed empty.
+      widths: Width of each column.
+    """
+    height = max([len(cell) for cell in row] or [1])
+    for i in range(height):
+        line = u"|"
+        for j in range(len(widths)):
+            text = u""
+            if (j < len(row) and i < len(row[j])):
+                text = row[j][i]
+            line += u" " + text \
+                + u" " * (widths[j] - _get_visible_width(text)) + u" |"
+        yield line
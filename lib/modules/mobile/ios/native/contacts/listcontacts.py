@@ -16,21 +16,39 @@
     along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-# Miscellaneous operating system interfaces
-# https://docs.python.org/2/library/os.html
-import os
+# Regular expression operations
+# https://docs.python.org/2/library/re.html
+import re
 
 # The db module includes the code to run queries on sqlite databases.
 from lib.common.db.sqlite import db
-# The ioscontants module contains the names of important iOS backup files.
-from lib.common.mobile.ios import iosconstants
-# The html module contains functions to generate html output
-from lib.export import html
-# The pdf module contains functions to generate pdf output
-from lib.export import pdf
+# Full-text indexes of the iOS databases
+from lib.common.mobile.ios import search_index
 # IOS module is the Base class for modules that need an iOS Backups.
 from sff.core.module import IOSModule
 
+# Keywords that are (part of) a phone number, e.g., +1 (555) 123-45
+PHONE_KEYWORD = re.compile(r"^[0-9+()\-. ]*[0-9][0-9+()\-. ]*$")
+
+# Expressions that compute the columns of the contacts index
+# (see search_index.attach_contacts_index) from an entry of the
+# Address Book. They are used to filter the entries if the index
+# cannot be built. Unlike the index, LIKE only ignores the case of
+# ASCII letters, and only the characters of PHONE_KEYWORD are removed
+# from the digits.
+INDEX_COLUMN_EXPRESSIONS = {
+    "text": "coalesce(p.first, '') || ' ' || coalesce(p.last, '') " \
+        + "|| char(10) || coalesce(p.organization, '') " \
+        + "|| char(10) || m.value",
+    "split_text": "coalesce(p.first, '') || char(10) " \
+        + "|| coalesce(p.last, '') " \
+        + "|| char(10) || coalesce(p.organization, '') " \
+        + "|| char(10) || m.value",
+    "digits": "replace(replace(replace(replace(replace(replace(" \
+        + "m.value, '+', ''), '(', ''), ')', ''), '-', ''), '.', ''), " \
+        + "' ', '')"
+}
+
 class Module(IOSModule):
     """The Module class implements the current module's code.
 
@@ -44,6 +62,13 @@ class Module(IOSModule):
         "author": "Sergio Nevarez",
         "description": "Lists contacts from native iOS Address Book",
         "options": [
+            [
+             "CASE_DATABASE", # Option Name
+             "case.db", # Value
+             True, # Required Option
+             "File name of the sqlite case database in the output " \
+                + "directory (OUTPUT_FORMAT sqlite)." # Description
+            ],
             [
              "INCLUDE_ID", # Option Name
              True, # Value
@@ -74,7 +99,7 @@ class Module(IOSModule):
              "OUTPUT_FORMAT", # Option Name
              "stdout", # Value
              True, # Required Option
-             "Valid options: stdout,pdf,html"
+             "Valid options: stdout,pdf,html,csv,jsonl,sqlite"
             ],
             [
              "SPLIT_NAME", # Option Name
@@ -100,38 +125,39 @@ class Module(IOSModule):
     # ***************************************************************
 
     def run(self):
-        """Run module's code."""
-        contacts = self._list_contacts()
+        """Run module's code.
 
+        Returns:
+          False if the module could not be run (e.g., the
+          OUTPUT_FORMAT is not supported), True otherwise.
+        """
+        # Whether the keywords are searched in the contacts index.
+        # If the index cannot be built, every entry is scanned instead.
+        self.search_index_attached = False
+        if (len(self._get_filters()) > 0):
+            try:
+                search_index.attach_contacts_index(self.contacts_db_path,
+                    self.output_dir + "/cache")
+                self.search_index_attached = True
+            except IOError as e:
+                print "Error: %s" % e
+                print "The KEYWORDS are searched without the index."
         # Output
         title = "Contacts"
         header = None
         output_format = self.get_option_value("OUTPUT_FORMAT").lower()
+        if (output_format == "sqlite"):
+            self._save_to_case_database(self._save_contacts)
+            return True
+        contacts = self._list_contacts()
         if (output_format == "stdout"):
             print title
             self._print_table(contacts)
-        elif (output_format == "html"):
-            if (not os.path.isdir(self.output_dir)):
-                os.mkdir(self.output_dir)
-            output_prefix = self.get_option_value("OUTPUT_FILE_NAME_PREFIX")
-            file_full_path = self.output_dir + "/" + output_prefix + ".html"
-            html.create_document_from_row_list(title,
-                header,
-                contacts,
-                file_full_path)
-            print "Output saved to: " + file_full_path
-        elif (output_format == "pdf"):
-            if (not os.path.isdir(self.output_dir)):
-                os.mkdir(self.output_dir)
-            output_prefix = self.get_option_value("OUTPUT_FILE_NAME_PREFIX")
-            file_full_path = self.output_dir + "/" + output_prefix + ".pdf"
-            pdf.create_document_from_row_list(title,
-                header,
-                contacts,
-                file_full_path)
-            print "Output saved to: " + file_full_path
-        else:
+        elif (not self._save_document(output_format, title, header,
+            contacts)):
             print "Unsupported OUTPUT_FORMAT"
+            return False
+        return True
 
     # ***************************************************************
     # HELPER methods
@@ -157,22 +183,57 @@ class Module(IOSModule):
         headers.append("Value")
         return headers
 
-    def _get_query(self):
+    def _get_filters(self):
+        """Get the filters of the entries of the Address Book.
+
+        Each keyword of the KEYWORDS option is searched in the name,
+        organization and value of the entries. Keywords that look like
+        a phone number are also searched in the digits of the values.
+
+        Returns:
+          List of (column of the contacts index, LIKE pattern) tuples.
+          An entry is listed if it matches any of the filters.
+        """
+        if (self.get_option_value("SPLIT_NAME")):
+            column = "split_text"
+        else:
+            column = "text"
+        filters = []
+        for k in str(self.get_option_value("KEYWORDS")).split(","):
+            k = search_index.normalize_text(k.strip())
+            if (k == ""):
+                continue
+            filters.append((column, "%" + k + "%"))
+            if (PHONE_KEYWORD.match(k)):
+                filters.append(("digits",
+                    "%" + search_index.get_digits(k) + "%"))
+        return filters
+
+    def _get_query(self, filters, case_columns = False):
         """Create SQL statement to query the contacts DB.
 
         The statement is created based on the value set
         to each of the options supported by this module.
+
+        Args:
+          filters: List of (column, pattern) filters (see _get_filters).
+          case_columns: Select the columns of the case database
+                        instead (see _save_contacts).
         """
         q_select = "SELECT "
-        if (self.get_option_value("INCLUDE_ID")):
-            q_select += "p.rowid, "
-        if (self.get_option_value("SPLIT_NAME")):
-            q_select += "p.first, p.last, "
+        if (case_columns):
+            q_select += "p.rowid, p.first, p.last, p.organization, " \
+                        + "m.rowid, "
         else:
-            q_select += "coalesce(p.first, '') || ' ' || " \
-                        + "coalesce(p.last, '') as Name, "
-        if (self.get_option_value("INCLUDE_ORGANIZATION")):
-            q_select += "p.organization, "
+            if (self.get_option_value("INCLUDE_ID")):
+                q_select += "p.rowid, "
+            if (self.get_option_value("SPLIT_NAME")):
+                q_select += "p.first, p.last, "
+            else:
+                q_select += "coalesce(p.first, '') || ' ' || " \
+                            + "coalesce(p.last, '') as Name, "
+            if (self.get_option_value("INCLUDE_ORGANIZATION")):
+                q_select += "p.organization, "
         q_select += "case " \
                     + "when m.label in " \
                         + "(select rowid from abmultivaluelabel) " \
@@ -188,50 +249,72 @@ class Module(IOSModule):
         q_where = "where " \
                     + "p.rowid=m.record_id " \
                     + "and m.value not null"
-        keywords = \
-            [k.strip()
-                for k in str(self.get_option_value("KEYWORDS")).split(",")]
-        i = 0
-        for k in keywords:
-            if (self.get_option_value("SPLIT_NAME")):
-                if (i == 0):
-                    q_where += " and ((m.value like ? " \
-                        + "or p.first like ? or p.last like ?)"
-                else:
-                    q_where += " or (m.value like ? " \
-                        + "or p.first like ? or p.last like ?)"
-            else:
-                if (i == 0):
-                    q_where += " and ((m.value like ? or Name like ?)"
-                else:
-                    q_where += " or (m.value like ? or Name like ?)"
-            i += 1
-        if (len(keywords) > 0):
-            q_where += ")"
+        if (len(filters) > 0 and self.search_index_attached):
+            # One subquery per filter, so that each LIKE
+            # is answered by the trigram index.
+            q_where += " and m.rowid IN (" \
+                + " UNION ".join(["SELECT entry_id FROM " \
+                    + search_index.CONTACTS_SCHEMA_NAME + ".contact_fts " \
+                    + "WHERE " + f[0] + " LIKE ?" for f in filters]) + ")"
+        elif (len(filters) > 0):
+            q_where += " and (" \
+                + " or ".join([INDEX_COLUMN_EXPRESSIONS[f[0]] + " LIKE ?"
+                    for f in filters]) + ")"
         q_order_by = "order by " \
                     + "p.rowid"
         query = " ".join([q_select, q_from, q_where, q_order_by])
         return query
 
+    def _iter_case_entries(self, rows, contacts):
+        """Split the rows of the case database query into entries.
+
+        The rows are sorted by contact, so each contact is read
+        from the first of its entries and appended to contacts.
+
+        Args:
+          rows: Rows of the query (see _get_query).
+          contacts: List where the (contact ID, first, last,
+                    organization) tuples are appended.
+
+        Yields
+          (entry ID, contact ID, type, value) tuples.
+        """
+        for r in rows:
+            if (len(contacts) == 0 or contacts[-1][0] != r[0]):
+                contacts.append(r[0:4])
+            yield (r[4], r[0], r[5], r[6])
+
     def _list_contacts(self):
         """Query the Address Book to get contact information.
 
-        Returns
-          List of tuples with information from the Address Book."
+        Yields
+          Rows with information from the Address Book.
+          The first row contains the headers.
         """
-        query = self._get_query()
-        keywords = \
-            [k.strip()
-                for k in str(self.get_option_value("KEYWORDS")).split(",")]
-        params = []
-        for k in keywords:
-            p = '%' + str(k) + '%'
-            if (self.get_option_value("SPLIT_NAME")):
-                params.extend([p, p, p])
-            else:
-                params.extend([p, p])
-        rows = db.query(self.contacts_db_path,
-                        query, tuple(params))
-        rows.insert(0,
-            self._get_headers())
-        return rows
+        filters = self._get_filters()
+        query = self._get_query(filters)
+        params = [f[1] for f in filters]
+        yield self._get_headers()
+        for r in db.iter_query(self.contacts_db_path,
+                        query, tuple(params)):
+            yield r
+
+    def _save_contacts(self, case_db, backup_id):
+        """Save the contacts to the case database.
+
+        Only the entries that match the KEYWORDS option
+        (and the contacts they belong to) are saved.
+
+        Args:
+          case_db: The CaseDatabase.
+          backup_id: ID of the backup in the case database.
+        """
+        filters = self._get_filters()
+        rows = db.iter_query(self.contacts_db_path,
+            self._get_query(filters, True), tuple([f[1] for f in filters]))
+        contacts = []
+        num_entries = case_db.insert("contact_entries", backup_id,
+            self._iter_case_entries(rows, contacts))
+        case_db.insert("contacts", backup_id, contacts)
+        print "Saved %d contact(s) and %d value(s)." \
+            % (len(contacts), num_entries)
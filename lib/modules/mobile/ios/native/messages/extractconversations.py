@@ -16,28 +16,39 @@
     along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-# Convert between binary and ASCII
-# https://docs.python.org/2/library/binascii.html
-import binascii
-# Secure hashes and message digests
-# https://docs.python.org/2/library/hashlib.html
-import hashlib
 # Functions creating iterators for efficient looping
 # https://docs.python.org/2/library/itertools.html
 import itertools
+# JSON encoder and decoder
+# https://docs.python.org/2/library/json.html
+import json
+# Standard operators as functions
+# https://docs.python.org/2/library/operator.html
+import operator
 # Miscellaneous operating system interfaces
 # https://docs.python.org/2/library/os.html
 import os
-# Regular expression operations
-# https://docs.python.org/2/library/re.html
-import re
+# Time access and conversions
+# https://docs.python.org/2/library/time.html
+import time
+# Quote parts of a URL
+# https://docs.python.org/2/library/urllib.html
+from urllib import pathname2url
 
 # Helper methods that interact with the iOS contacts database
 from lib.common.mobile.ios import contacts_helper
 # The db module includes the code to run queries on sqlite databases.
 from lib.common.db.sqlite import db
+# Helper methods to decode messages from the SMS/iMessage database
+from lib.common.mobile.ios import messages_helper
+# The metrics module keeps the counters and timers of the current run.
+from lib.common import metrics
+# Full-text index of the messages of the SMS/iMessage database
+from lib.common.mobile.ios import search_index
 # The ioscontants module contains the names of important iOS backup files.
 from lib.common.mobile.ios import iosconstants
+# The assets module saves files referenced by html and pdf output
+from lib.export import assets
 # The html module contains functions to generate html output
 from lib.export import html
 # The pdf module contains functions to generate pdf output
@@ -45,6 +56,21 @@ from lib.export import pdf
 # IOS module is the Base class for modules that need an iOS Backups.
 from sff.core.module import IOSModule
 
+# Maximum number of conversation ID ranges included in a single query.
+# Each range takes two parameters and sqlite limits the number of
+# parameters in a statement to 999 by default.
+MAX_RANGES_PER_QUERY = 400
+
+# Version of the format of the incremental export state file.
+STATE_VERSION = 1
+
+# Options that change the content of the exported conversations.
+# Incremental exports are only appended to the output of a previous
+# run if these options had the same values.
+STATE_OPTIONS = ["END_DATE", "EXTERNAL_ATTACHMENTS", "INCLUDE_MESSAGE_ID",
+    "INCLUDE_SERVICE", "INCLUDE_SUBJECT", "KEYWORDS", "OUTPUT_FORMAT",
+    "SHOW_CONTACT_INFO", "START_DATE"]
+
 class Module(IOSModule):
     """The Module class implements the current module's code.
 
@@ -60,6 +86,13 @@ class Module(IOSModule):
         "description": "Extract conversations from " \
             + "native iOS Messages application",
         "options": [
+            [
+             "CASE_DATABASE", # Option Name
+             "case.db", # Value
+             True, # Required Option
+             "File name of the sqlite case database in the output " \
+                + "directory (OUTPUT_FORMAT sqlite)." # Description
+            ],
             [
              "CONVERSATION_IDS", # Option Name
              "", # Value
@@ -76,6 +109,15 @@ class Module(IOSModule):
              "Only include messages on or before this date. " \
                 + "Format: YYYY-MM-DD." # Description
             ],
+            [
+             "EXTERNAL_ATTACHMENTS", # Option Name
+             False, # Value
+             True, # Required Option
+             "Save attachments once to the " \
+                + "<OUTPUT_FILE_NAME_PREFIX>_assets directory and " \
+                + "reference them from html and pdf files instead of " \
+                + "embedding them in every file." # Description
+            ],
             [
              "INCLUDE_MESSAGE_ID", # Option Name
              True, # Value
@@ -96,6 +138,15 @@ class Module(IOSModule):
              True, # Required Option
              "Include conversation 'Subject' in the output." # Description
             ],
+            [
+             "INCREMENTAL", # Option Name
+             False, # Value
+             True, # Required Option
+             "Only export messages newer than the ones exported by " \
+                + "the previous html or pdf run with the same " \
+                + "OUTPUT_FILE_NAME_PREFIX. Set to False for a " \
+                + "full rebuild." # Description
+            ],
             [
              "KEYWORDS", # Option Name
              "", # Value
@@ -114,7 +165,36 @@ class Module(IOSModule):
              "OUTPUT_FORMAT", # Option Name
              "stdout", # Value
              True, # Required Option
-             "Valid options: stdout,pdf,html"
+             "Valid options: stdout,pdf,html,csv,jsonl,sqlite"
+            ],
+            [
+             "PDF_BATCH_SIZE", # Option Name
+             1, # Value
+             True, # Required Option
+             "Number of conversations saved to each pdf file. " \
+                + "Batching small conversations avoids starting " \
+                + "wkhtmltopdf for each one." # Description
+            ],
+            [
+             "PDF_TIMEOUT", # Option Name
+             600, # Value
+             True, # Required Option
+             "Seconds after which the creation of a pdf file " \
+                + "is stopped (0 for no limit)." # Description
+            ],
+            [
+             "PDF_WORKERS", # Option Name
+             4, # Value
+             True, # Required Option
+             "Number of pdf files created at the same time." # Description
+            ],
+            [
+             "SEARCH_INDEX", # Option Name
+             False, # Value
+             True, # Required Option
+             "Use a full-text index of the messages to filter them " \
+                + "by KEYWORDS. The index is saved to output/cache and " \
+                + "is built the first time it is used." # Description
             ],
             [
              "SHOW_CONTACT_INFO", # Option Name
@@ -152,21 +232,138 @@ class Module(IOSModule):
     # ***************************************************************
 
     def run(self):
-        """Run module's code."""
-        conversations = self._get_conversations()
+        """Run module's code.
 
+        Returns:
+          False if the module could not be run (e.g., the
+          OUTPUT_FORMAT is not supported), True otherwise.
+        """
         # Output
         output_format = self.get_option_value("OUTPUT_FORMAT").lower()
         if (output_format != "stdout"
             and output_format != "html"
-            and output_format != "pdf"):
+            and output_format != "pdf"
+            and output_format != "csv"
+            and output_format != "jsonl"
+            and output_format != "sqlite"):
             print "Unsupported OUTPUT_FORMAT"
-            return
+            return False
+        if (output_format != "html"
+            and output_format != "pdf"
+            and self.get_option_value("INCREMENTAL")):
+            print "INCREMENTAL is only supported by the html " \
+                + "and pdf output formats."
+            return False
+        # Units of message.date and range of message.date values
+        # between START_DATE and END_DATE
+        self.date_scale = messages_helper.get_date_scale(self.sms_db_path)
+        try:
+            self.date_bounds = messages_helper.get_date_bounds(
+                str(self.get_option_value("START_DATE")),
+                str(self.get_option_value("END_DATE")),
+                self.date_scale)
+        except ValueError:
+            print "START_DATE and END_DATE must be dates in the " \
+                + "following format: YYYY-MM-DD."
+            return False
+        # Whether the keywords are searched in the full-text index.
+        # If the index cannot be built, every message is scanned
+        # instead, which gives the same results.
+        self.search_index_attached = False
+        if (self._use_search_index()):
+            try:
+                search_index.attach_index(self.sms_db_path,
+                    self.output_dir + "/cache")
+                self.search_index_attached = True
+            except IOError as e:
+                print "Error: %s" % e
+                print "The KEYWORDS are searched without the index."
+
+        # Last exported message of each conversation
+        # (None if the output format is not html or pdf)
+        self.checkpoints = None
+        # Last message read from each conversation during this run
+        self.last_messages = {}
+        # Conversations in each pdf file that is being created
+        self.pdf_conversations = {}
+        # Suffix of the pdf files of an incremental run
+        self.pdf_suffix = ""
+        if (output_format == "html" or output_format == "pdf"):
+            if (not os.path.isdir(self.output_dir)):
+                os.mkdir(self.output_dir)
+            self.checkpoints = {}
+            if (self.get_option_value("INCREMENTAL")):
+                self.checkpoints = self._load_checkpoints(output_format)
+                if (output_format == "pdf" and len(self.checkpoints) > 0):
+                    # Previous pdf files are not overwritten.
+                    self.pdf_suffix = time.strftime("_%Y%m%d%H%M%S")
+        # Conversations that are only updated if they have new messages
+        previous_ids = set()
+        if (self.checkpoints is not None):
+            previous_ids = set(self.checkpoints)
+
+        try:
+            succeeded = self._run(output_format)
+        finally:
+            if (self.checkpoints is not None):
+                self._save_checkpoints()
+        unchanged = [id for id in self._get_conversation_ids()
+            if id in previous_ids and id not in self.last_messages]
+        if (len(unchanged) > 0):
+            print "No new messages in %d conversation(s)." % len(unchanged)
+        return succeeded
+
+    def _run(self, output_format):
+        """Extract the conversations.
+
+        Args:
+          output_format: stdout, html, pdf, csv, jsonl or sqlite.
+
+        Returns:
+          False if the pdf options are not valid or a pdf file
+          was not created, True otherwise.
+        """
+        if (output_format == "sqlite"):
+            self._save_to_case_database(self._save_conversations)
+            return True
+        conversations = self._get_conversations()
+        if (output_format == "csv" or output_format == "jsonl"):
+            # The messages of all the conversations
+            # are saved to a single document.
+            self._save_document(output_format, "Conversations", None,
+                self._format_data_rows(conversations))
+            return True
+
+        # Attachments saved to the assets directory (if enabled)
+        self.assets = None
+        if (output_format != "stdout"
+            and self.get_option_value("EXTERNAL_ATTACHMENTS")):
+            self.assets = assets.AssetStore(self.output_dir + "/" \
+                + self._get_assets_dir_name())
+
+        # Pool of wkhtmltopdf processes (if the output format is pdf)
+        render_pool = None
+        # Conversations waiting to be converted to pdf
+        pdf_batch = []
+        # False if a pdf file was not created
+        succeeded = True
+        if (output_format == "pdf"):
+            pdf_workers = self.get_int_option_value("PDF_WORKERS")
+            pdf_batch_size = self.get_int_option_value("PDF_BATCH_SIZE")
+            pdf_timeout = self.get_int_option_value("PDF_TIMEOUT")
+            if (pdf_workers is None or pdf_workers < 1
+                or pdf_batch_size is None or pdf_batch_size < 1
+                or pdf_timeout is None or pdf_timeout < 0):
+                print "PDF_WORKERS and PDF_BATCH_SIZE must be " \
+                    + "positive integers and PDF_TIMEOUT must be " \
+                    + "0 or a positive integer."
+                return False
+            render_pool = pdf.RenderPool(pdf_workers, pdf_timeout)
 
         for c in conversations:
             conversation_id = str(c[0])
             people = c[1]
-            conversation = [list(t) for t in c[2]]
+            conversation = c[2]
             title = "Conversation ID: " + conversation_id
             header = ""
             if (self.get_option_value("SHOW_CONTACT_INFO")):
@@ -174,174 +371,302 @@ class Module(IOSModule):
                     + "(from Address Book): " \
                     + ", ".join(people)
             if (output_format == "stdout"):
-                print title
-                print header
-                # Remove attachment (i.e., image) references from the data
-                # because they will not display properly in
-                # stdout.
-                num_cols = len(conversation[0])
-                for r in conversation:
-                    text = r[num_cols - 1]
-                    # Convert to hex to search for the
-                    # object replacement character
-                    text = binascii.hexlify(text.encode("utf-8"))
-                    # 0xEF 0xBF 0xBC is the object replacement character
-                    # For reference:
-                    # http://www.fileformat.info/info/unicode/char/fffc/index.htm
-                    result = re.split(r"efbfbc", text)
-                    is_image_at_the_end = False
-                    if (len(result) == 2):
-                        attachment_reference = binascii.unhexlify(result[0])
-                        if (len(attachment_reference) > 0):
-                            ref = re.split(r";", attachment_reference, 2)
-                            if (len(ref[2]) > 0):
-                                is_image_at_the_end = True
-                                text = str(ref[2])
-                        # Remove reference to attachment
-                        # and keep object replacement character
-                        result[0] = binascii.unhexlify(
-                            "efbfbc").decode("utf-8")
-                        if (len(result[1]) > 0):
-                            result[1] = binascii.unhexlify(
-                                result[1]).decode("utf-8")
-                        elif (is_image_at_the_end):
-                            result[1] = text
-                    else:
-                        result[0] = binascii.unhexlify(
-                            result[0]).decode("utf-8")
-                    if (is_image_at_the_end):
-                        r[num_cols - 1] = "".join(reversed(result))
-                    else:
-                        r[num_cols - 1] = "".join(result)
-                self._print_table(conversation)
+                self._print_text(title)
+                self._print_text(header)
+                # Attachments (i.e., images) are not displayed in stdout.
+                self._print_table(
+                    self._format_rows(conversation, self._format_text))
             elif (output_format == "html"):
-                if (not os.path.isdir(self.output_dir)):
-                    os.mkdir(self.output_dir)
                 output_prefix = \
                     self.get_option_value("OUTPUT_FILE_NAME_PREFIX") \
                     + conversation_id
                 file_full_path = \
                     self.output_dir + "/" + output_prefix + ".html"
-                num_cols = len(conversation[0])
-                for r in conversation:
-                    text = r[num_cols - 1]
-                    # Convert to hex to search for the
-                    # object replacement character
-                    text = binascii.hexlify(text.encode("utf-8"))
-                    # 0xEF 0xBF 0xBC is the object replacement character
-                    # For reference:
-                    # http://www.fileformat.info/info/unicode/char/fffc/index.htm
-                    result = re.split(r"efbfbc", text)
-                    is_image_at_the_end = False
-                    if (len(result) == 2):
-                        # Result contains the text before
-                        # and after the object replacement character
-                        attachment_reference = binascii.unhexlify(result[0])
-                        if (len(attachment_reference) > 0):
-                            # There is a file reference to the image
-                            ref = re.split(r";", attachment_reference, 2)
-                            mime_type = ref[0]
-                            path = ref[1]
-                            if (len(ref[2]) > 0):
-                                is_image_at_the_end = True
-                                text = str(ref[2])
-                            attachment_path = "MediaDomain-" + path[2:]
-                            attachment_path = hashlib.sha1(
-                                attachment_path).hexdigest()
-                            attachment_path = \
-                                self.backup_dir + "/" + attachment_path
-                            # check if file exists
-                            if (os.path.isfile(attachment_path)):
-                                with open(attachment_path, "r") as attachment:
-                                    img = '<img style=' \
-                                        + '"max-width: 400px; ' \
-                                        + 'max-height: 400px;" src="data:' \
-                                        + mime_type + ';base64,' \
-                                        + binascii.b2a_base64(
-                                            attachment.read()) \
-                                        + '" /><br>'
-                        result[0] = img
-                        if (len(result[1]) > 0):
-                            result[1] = binascii.unhexlify(
-                                result[1]).decode("utf-8")
-                        elif (is_image_at_the_end):
-                            result[1] = text
-                    else:
-                        result[0] = binascii.unhexlify(
-                            result[0]).decode("utf-8")
-                    r[num_cols - 1] = "".join(result)
-                html.create_document_from_row_list(title,
-                    header,
-                    conversation,
-                    file_full_path)
-                print "Output saved to: " + file_full_path
+                rows = self._format_rows(conversation,
+                    self._format_document_text)
+                if (c[0] in self.checkpoints):
+                    # Skip the headers and append the new messages
+                    next(rows)
+                    with metrics.document("html", file_full_path):
+                        html.append_rows_to_document(rows, file_full_path)
+                    print "Output updated: " + file_full_path
+                else:
+                    with metrics.document("html", file_full_path):
+                        html.create_document_from_row_list(title,
+                            header,
+                            rows,
+                            file_full_path)
+                    print "Output saved to: " + file_full_path
+                self.checkpoints[c[0]] = self.last_messages[c[0]]
             elif (output_format == "pdf"):
-                if (not os.path.isdir(self.output_dir)):
-                    os.mkdir(self.output_dir)
-                output_prefix = \
-                    self.get_option_value("OUTPUT_FILE_NAME_PREFIX") \
-                    + conversation_id
-                file_full_path = \
-                    self.output_dir + "/" + output_prefix + ".pdf"
-                num_cols = len(conversation[0])
-                for r in conversation:
-                    text = r[num_cols - 1]
-                    # Convert to hex to search for the
-                    # object replacement character
-                    text = binascii.hexlify(text.encode("utf-8"))
-                    # 0xEF 0xBF 0xBC is the object replacement character
-                    # For reference:
-                    # http://www.fileformat.info/info/unicode/char/fffc/index.htm
-                    result = re.split(r"efbfbc", text)
-                    is_image_at_the_end = False
-                    if (len(result) == 2):
-                        # Result contains the text before
-                        # and after the object replacement character
-                        attachment_reference = binascii.unhexlify(result[0])
-                        if (len(attachment_reference) > 0):
-                            # There is a file reference to the image
-                            ref = re.split(r";", attachment_reference, 2)
-                            mime_type = ref[0]
-                            path = ref[1]
-                            if (len(ref[2]) > 0):
-                                is_image_at_the_end = True
-                                text = str(ref[2])
-                            attachment_path = "MediaDomain-" + path[2:]
-                            attachment_path = hashlib.sha1(
-                                attachment_path).hexdigest()
-                            attachment_path = \
-                                self.backup_dir + "/" + attachment_path
-                            # check if file exists
-                            if (os.path.isfile(attachment_path)):
-                                with open(attachment_path, "r") as attachment:
-                                    img = '<img style=' \
-                                        + '"max-width: 400px; ' \
-                                        + 'max-height: 400px;" src="data:' \
-                                        + mime_type + ';base64,' \
-                                        + binascii.b2a_base64(
-                                            attachment.read()) \
-                                        + '" /><br>'
-                        result[0] = img
-                        if (len(result[1]) > 0):
-                            result[1] = binascii.unhexlify(
-                                result[1]).decode("utf-8")
-                        elif (is_image_at_the_end):
-                            result[1] = text
-                    else:
-                        result[0] = binascii.unhexlify(
-                            result[0]).decode("utf-8")
-                    r[num_cols - 1] = "".join(result)
-                pdf.create_document_from_row_list(title,
-                    header,
-                    conversation,
-                    file_full_path,
-                    True)
-                print "Output saved to: " + file_full_path
+                # The html document is written here and
+                # converted to pdf by the render pool.
+                with metrics.document("pdf"):
+                    pdf_batch.append((conversation_id,
+                        pdf.write_html(title,
+                            header,
+                            self._format_rows(conversation,
+                                self._format_document_text))))
+                if (len(pdf_batch) == pdf_batch_size):
+                    self._submit_pdf_batch(render_pool, pdf_batch)
+                    pdf_batch = []
+                succeeded = self._print_pdf_results(
+                    render_pool.get_completed()) and succeeded
+
+        if (render_pool is not None):
+            if (len(pdf_batch) > 0):
+                self._submit_pdf_batch(render_pool, pdf_batch)
+            # Time spent waiting for the last conversions
+            with metrics.document("pdf"):
+                succeeded = self._print_pdf_results(
+                    render_pool.wait()) and succeeded
+        return succeeded
 
     # ***************************************************************
     # HELPER methods
     # ***************************************************************
 
+    def _format_data_rows(self, conversations):
+        """Format the messages of the conversations for csv and jsonl.
+
+        Each row starts with the conversation ID. Attachments are not
+        included in the text (see _format_text). Instead, the last
+        column lists the path of each attachment in the backup
+        directory (None if it is not in the backup), so the
+        attachments can be read without copying them.
+
+        Args:
+          conversations: Iterator over the conversations
+                         (see _get_conversations).
+
+        Yields:
+          The headers followed by the formatted rows.
+        """
+        show_contact_info = self.get_option_value("SHOW_CONTACT_INFO")
+        headers = ["Conversation ID"]
+        if (show_contact_info):
+            headers.append("People")
+        yield headers + self._get_headers() + ["Attachments"]
+        for id, people, conversation in conversations:
+            prefix = [id]
+            if (show_contact_info):
+                prefix.append(people)
+            for r, attachments in conversation:
+                r = list(r)
+                r[-1] = self._format_text(
+                    messages_helper.decode_message(r[-1], attachments))
+                yield prefix + r \
+                    + [[self._get_attachment_path(a.filename)
+                        for a in attachments]]
+
+    def _format_document_text(self, parts):
+        """Format the text of a message for html and pdf.
+
+        Image attachments are included as images.
+        Other attachments are represented by the
+        object replacement character.
+
+        Args:
+          parts: Iterator over the MessageParts of the message.
+
+        Returns:
+          List of text and html.Image fragments.
+        """
+        result = []
+        for p in parts:
+            if (p.type == messages_helper.TEXT):
+                result.append(p.value)
+                continue
+            img = None
+            if (p.value is not None):
+                img = self._get_image(p.value)
+            if (img is not None):
+                result.append(img)
+            else:
+                result.append(messages_helper.OBJECT_REPLACEMENT_CHARACTER)
+        return result
+
+    def _format_rows(self, conversation, format_text):
+        """Format the rows of a conversation as they are read.
+
+        Args:
+          conversation: Iterator over (row, attachments) tuples.
+                        The text of the message is the last column.
+          format_text: Method used to format the MessageParts
+                       of each message.
+
+        Yields:
+          The headers followed by the formatted rows.
+        """
+        yield self._get_headers()
+        for r, attachments in conversation:
+            r = list(r)
+            r[-1] = format_text(
+                messages_helper.decode_message(r[-1], attachments))
+            yield r
+
+    def _format_text(self, parts):
+        """Format the text of a message for stdout.
+
+        Attachments are represented by the object replacement character.
+
+        Args:
+          parts: Iterator over the MessageParts of the message.
+        """
+        return "".join(
+            [p.value if (p.type == messages_helper.TEXT)
+                else messages_helper.OBJECT_REPLACEMENT_CHARACTER
+                for p in parts])
+
+    def _get_attachment_path(self, filename):
+        """Get the path of an attachment within the iOS Backup.
+
+        Args:
+          filename: Path of the attachment on the device
+                    (i.e., attachment.filename in the messages DB).
+
+        Returns:
+          The path to the attachment in the backup directory
+          or None if the attachment is not in the backup.
+        """
+        # Path of the attachment relative to the media domain
+        relative_path = None
+        if (filename is None):
+            metrics.increment("attachments.missing")
+            return None
+        if (filename.startswith("~/")):
+            relative_path = filename[2:]
+        elif (filename.startswith("/var/mobile/")):
+            relative_path = filename[len("/var/mobile/"):]
+        path = None
+        if (relative_path is not None):
+            path = self.backup.get_path(iosconstants.Backup.MEDIA_DOMAIN,
+                relative_path)
+        if (path is None):
+            metrics.increment("attachments.missing")
+        else:
+            metrics.increment("attachments.resolved")
+        return path
+
+    def _get_image(self, attachment):
+        """Get the html image of an attachment.
+
+        Args:
+          attachment: The Attachment to include in the document.
+
+        Returns:
+          The html.Image or None if the attachment
+          is not an image or does not exist in the backup.
+        """
+        if (attachment.mime_type is None
+            or not attachment.mime_type.startswith("image/")):
+            return None
+        attachment_path = self._get_attachment_path(attachment.filename)
+        if (attachment_path is None):
+            return None
+        if (self.assets is None):
+            # Embed the image in the document
+            return html.Image(attachment_path, attachment.mime_type)
+        name = self.assets.add(attachment_path, attachment.filename)
+        if (self.get_option_value("OUTPUT_FORMAT").lower() == "pdf"):
+            # The html document converted to pdf is a temporary file,
+            # so the image is referenced by its absolute path.
+            src = "file://" + pathname2url(
+                os.path.abspath(self.assets.get_path(name)))
+        else:
+            # The html document is saved next to the assets directory
+            src = self._get_assets_dir_name() + "/" + name
+        return html.Image(attachment_path, attachment.mime_type, src)
+
+    def _print_pdf_results(self, results):
+        """Print the results of pdf conversions.
+
+        Args:
+          results: Iterator over (file path, error message) tuples.
+
+        Returns:
+          False if any of the files was not created.
+        """
+        succeeded = True
+        for file_full_path, error in results:
+            ids = self.pdf_conversations.pop(file_full_path, [])
+            if (error is None):
+                for id in ids:
+                    self.checkpoints[id] = self.last_messages[id]
+                metrics.add_file(file_full_path, "pdf",
+                    os.path.getsize(file_full_path))
+                print "Output saved to: " + file_full_path
+            else:
+                print "Error: '%s' was not created. %s" \
+                    % (file_full_path, error)
+                succeeded = False
+        return succeeded
+
+    def _submit_pdf_batch(self, render_pool, pdf_batch):
+        """Submit the conversion of a batch of conversations to pdf.
+
+        All the conversations in the batch are saved to the same
+        pdf document, using a single wkhtmltopdf process.
+
+        Args:
+          render_pool: The pdf.RenderPool that converts the documents.
+          pdf_batch: List of (conversation ID, html document path) tuples.
+        """
+        output_prefix = \
+            self.get_option_value("OUTPUT_FILE_NAME_PREFIX") \
+            + pdf_batch[0][0]
+        if (len(pdf_batch) > 1):
+            output_prefix += "-" + pdf_batch[-1][0]
+        file_full_path = \
+            self.output_dir + "/" + output_prefix + self.pdf_suffix + ".pdf"
+        self.pdf_conversations[file_full_path] = \
+            [int(b[0]) for b in pdf_batch]
+        render_pool.submit([b[1] for b in pdf_batch],
+            file_full_path,
+            True,
+            self.assets is not None)
+
+    def _get_assets_dir_name(self):
+        """Get the name of the directory where attachments are saved.
+
+        The directory is shared by all the conversations
+        exported with the same OUTPUT_FILE_NAME_PREFIX.
+        """
+        return self.get_option_value("OUTPUT_FILE_NAME_PREFIX") + "_assets"
+
+    def _get_attachments(self, ranges, min_message_id):
+        """Get the attachments of the messages in a set of conversations.
+
+        The attachments are read with a single query
+        instead of once per message.
+
+        Args:
+          ranges: List of (first, last) conversation ID ranges.
+          min_message_id: Only messages with a greater ID are included.
+
+        Returns:
+          Dictionary of message ID -> list of Attachments.
+          The attachments of each message are in the order
+          in which they appear in the message.
+        """
+        query = "SELECT maj.message_id, a.mime_type, a.filename, " \
+            + "a.transfer_name, a.total_bytes " \
+            + "FROM chat_message_join cmj " \
+            + "JOIN message_attachment_join maj " \
+            + "ON maj.message_id = cmj.message_id " \
+            + "JOIN attachment a " \
+            + "ON a.rowid = maj.attachment_id " \
+            + "WHERE " + _get_range_condition("cmj.chat_id", len(ranges)) \
+            + " and cmj.message_id > ?" \
+            + " ORDER BY maj.message_id, a.rowid"
+        attachments = {}
+        for r in db.iter_query(self.sms_db_path, query,
+            tuple(itertools.chain.from_iterable(ranges))
+                + (min_message_id,)):
+            attachments.setdefault(r[0], []).append(
+                messages_helper.Attachment(*r[1:]))
+        return attachments
+
     def _get_headers(self):
         """Get headers for output table.
 
@@ -361,22 +686,16 @@ class Module(IOSModule):
         headers.append("Text")
         return headers
 
-    def _get_conversations(self):
-        """Query the SMS/iMessage DB to get the list of conversations.
-
-        If the SHOW_CONTACT_INFO option is set to true,
-        attempt to find contact information (i.e., Name) from
-        each person that is part of the conversation.
+    def _get_conversation_ids(self):
+        """Get the sorted list of conversation IDs to extract.
 
-        Returns
-          List of tuples with information from the SMS/iMessage DB."
+        Expands the ranges in the CONVERSATION_IDS option
+        (e.g., 1-3,5 -> [1, 2, 3, 5]) and removes duplicates.
         """
-        query = self._get_query()
         ids = \
             [id.strip()
                 for id in str(self.get_option_value(
                     "CONVERSATION_IDS")).split(",")]
-        conversations = []
         ids = list(itertools.chain.from_iterable(
             [range(int(r[0]), int(r[1]) + 1)
                 if len(r) == 2
@@ -384,107 +703,316 @@ class Module(IOSModule):
                 for r in
                     [id.split("-") for id in ids]])
         )
-        for id in ids:
-            params = [id]
-            keywords = \
-                [k.strip()
-                    for k in str(
-                        self.get_option_value("KEYWORDS")).split(",")]
-            for k in keywords:
-                params.append('%' + str(k) + '%')
-            # Only include messages between
-            # START_DATE and END_DATE (inclusive)
-            # if those options are set.
-            start_date = self.get_option_value("START_DATE")
-            end_date = self.get_option_value("END_DATE")
-            if (start_date != ""):
-                params.append(start_date)
-            if (end_date != ""):
-                params.append(end_date)
-            people = []
-            if (self.get_option_value("SHOW_CONTACT_INFO")):
-                query_phone_numbers = "SELECT h.id " \
-                + "FROM chat c, handle h " \
-                + "JOIN chat_handle_join chj " \
-                + "ON chj.handle_id = h.rowid " \
-                    + "and chj.chat_id = c.rowid " \
-                + "WHERE c.rowid = " + str(id) + " " \
-                + "COLLATE NOCASE"
-                phone_numbers = db.query(
-                    self.sms_db_path, query_phone_numbers)
-                for p in phone_numbers:
-                    name = \
-                        contacts_helper.get_contact_by_id(
-                            self.backup_dir, p[0])
-                    people.append((name, p[0]))
-                people = [p[0] + " (" + p[1] + ")" for p in people]
-            conversation = db.query(self.sms_db_path,
-                            query, tuple(params))
-            if (len(conversation) > 0):
-                conversation.insert(0,
-                    self._get_headers())
-                conversations.append((id, people, conversation))
-        return conversations
-
-    def _get_query(self):
+        return sorted(set(ids))
+
+    def _get_conversations(self, case_columns = False):
+        """Query the SMS/iMessage DB to get the list of conversations.
+
+        All the requested conversations are read with a single
+        query ordered by conversation, and the result is split by
+        conversation as it is read. Consecutive IDs are collapsed
+        into ranges, so the number of queries does not depend on the
+        number of conversations (only on the number of ranges).
+
+        If the SHOW_CONTACT_INFO option is set to true,
+        attempt to find contact information (i.e., Name) from
+        each person that is part of the conversation.
+
+        Conversations with a checkpoint only include the messages
+        after the checkpoint and are skipped if there are none.
+        The ID and date of the last message read from each
+        conversation are stored in last_messages.
+
+        Args:
+          case_columns: Read the columns of the case database
+                        instead (see _save_conversations).
+
+        Yields
+          Tuples with the conversation ID, the people involved and
+          an iterator over the messages of the conversation.
+          Each message is a (row, attachments) tuple.
+        """
+        ids = self._get_conversation_ids()
+        ranges = _get_id_ranges(ids)
+        checkpoints = self.checkpoints or {}
+        # Messages IDs are assigned in increasing order, so the
+        # messages older than every checkpoint are not read.
+        min_message_id = min(
+            [checkpoints.get(id, [0])[0] for id in ids] or [0])
+        params = [min_message_id]
+        keywords = \
+            [k.strip()
+                for k in str(self.get_option_value(
+                    "KEYWORDS")).decode("utf-8").split(",")]
+        for k in keywords:
+            params.append('%' + k + '%')
+        # Only include messages between
+        # START_DATE and END_DATE (inclusive)
+        # if those options are set.
+        params.extend([b for b in self.date_bounds if b is not None])
+        contact_index = None
+        if (self.get_option_value("SHOW_CONTACT_INFO")):
+            # The Address Book is checked for changes once, not
+            # for every handle.
+            contact_index = contacts_helper.get_contact_index(
+                self.backup_dir)
+        for i in range(0, len(ranges), MAX_RANGES_PER_QUERY):
+            chunk = ranges[i:i + MAX_RANGES_PER_QUERY]
+            range_params = list(itertools.chain.from_iterable(chunk))
+            people = {}
+            if (contact_index is not None):
+                people = self._get_people(chunk, contact_index)
+            attachments = self._get_attachments(chunk, min_message_id)
+            query = self._get_query(len(chunk), case_columns)
+            rows = db.iter_query(self.sms_db_path,
+                            query, tuple(range_params + params))
+            # The first column is the conversation ID, the second
+            # column is the message ID and the third column is the
+            # date of the message.
+            for id, conversation in itertools.groupby(rows,
+                operator.itemgetter(0)):
+                if (id in checkpoints):
+                    last_id = checkpoints[id][0]
+                    conversation = itertools.ifilter(
+                        lambda r, last_id = last_id: r[1] > last_id,
+                        conversation)
+                    first = next(conversation, None)
+                    if (first is None):
+                        # No new messages
+                        continue
+                    conversation = itertools.chain([first], conversation)
+                yield (id, people.get(id, []),
+                    self._read_messages(id, conversation, attachments))
+
+    def _get_state_path(self):
+        """Get the path to the state file of incremental exports."""
+        return self.output_dir + "/" \
+            + self.get_option_value("OUTPUT_FILE_NAME_PREFIX") + ".state.json"
+
+    def _get_state_options(self):
+        """Get the values of the options saved in the state file."""
+        options = {}
+        for o in STATE_OPTIONS:
+            value = self.get_option_value(o)
+            if (type(value) is str):
+                value = value.lower()
+            options[o] = value
+        return options
+
+    def _iter_case_messages(self, conversations, attachments):
+        """Read the messages of the conversations for the case database.
+
+        Args:
+          conversations: Iterator over the conversations
+                         (see _get_conversations).
+          attachments: List where the rows of the attachments
+                       table are appended.
+
+        Yields
+          Rows of the messages table.
+        """
+        for id, people, conversation in conversations:
+            for r, message_attachments in conversation:
+                for i in range(len(message_attachments)):
+                    a = message_attachments[i]
+                    attachments.append((r[0], i) + tuple(a)
+                        + (self._get_attachment_path(a.filename),))
+                yield (r[0], id) + tuple(r[1:])
+
+    def _load_checkpoints(self, output_format):
+        """Load the last exported message of each conversation.
+
+        The checkpoints are discarded if the state file does not
+        exist, or if it was saved for another backup or with
+        different options.
+        For html output, conversations whose document is missing
+        or incomplete are exported again.
+
+        Args:
+          output_format: html or pdf.
+
+        Returns:
+          Dictionary of conversation ID -> [message ID, date].
+        """
+        try:
+            with open(self._get_state_path(), "r") as state_file:
+                state = json.load(state_file)
+            if (state["version"] != STATE_VERSION
+                or state["options"] != self._get_state_options()):
+                print "Options changed since the previous export. " \
+                    + "Exporting all messages."
+                return {}
+            if (state.get("backup_dir") != os.path.abspath(self.backup_dir)):
+                print "The previous export is from another backup. " \
+                    + "Exporting all messages."
+                return {}
+            checkpoints = dict([(int(id), c)
+                for id, c in state["conversations"].iteritems()])
+        except (IOError, ValueError, KeyError, TypeError,
+            AttributeError):
+            # Missing or invalid state file.
+            return {}
+        if (output_format == "html"):
+            prefix = self.output_dir + "/" \
+                + self.get_option_value("OUTPUT_FILE_NAME_PREFIX")
+            for id in checkpoints.keys():
+                if (not html.is_document_complete(
+                    prefix + str(id) + ".html")):
+                    del checkpoints[id]
+        return checkpoints
+
+    def _save_checkpoints(self):
+        """Save the last exported message of each conversation."""
+        state = {
+            "version": STATE_VERSION,
+            "backup_dir": os.path.abspath(self.backup_dir),
+            "options": self._get_state_options(),
+            "conversations": self.checkpoints
+        }
+        state_path = self._get_state_path()
+        with open(state_path + ".tmp", "w") as state_file:
+            json.dump(state, state_file)
+        os.rename(state_path + ".tmp", state_path)
+
+    def _save_conversations(self, case_db, backup_id):
+        """Save the conversations to the case database.
+
+        Saves the conversations, their handles (i.e., phone numbers
+        and email addresses), and the messages that match the
+        KEYWORDS, START_DATE and END_DATE options with their
+        attachments.
+
+        Args:
+          case_db: The CaseDatabase.
+          backup_id: ID of the backup in the case database.
+        """
+        ranges = _get_id_ranges(self._get_conversation_ids())
+        for i in range(0, len(ranges), MAX_RANGES_PER_QUERY):
+            chunk = ranges[i:i + MAX_RANGES_PER_QUERY]
+            params = tuple(itertools.chain.from_iterable(chunk))
+            condition = _get_range_condition("chat_id", len(chunk))
+            case_db.insert("chats", backup_id,
+                db.iter_query(self.sms_db_path,
+                    "SELECT rowid, chat_identifier FROM chat WHERE " \
+                    + _get_range_condition("rowid", len(chunk)), params))
+            case_db.insert("chat_handles", backup_id,
+                db.iter_query(self.sms_db_path,
+                    "SELECT chat_id, handle_id FROM chat_handle_join " \
+                    + "WHERE " + condition, params))
+            # Handles of the members of the conversations
+            # and of the senders of the messages
+            case_db.insert("handles", backup_id,
+                db.iter_query(self.sms_db_path,
+                    "SELECT rowid, id, service FROM handle " \
+                    + "WHERE rowid IN (" \
+                    + "SELECT handle_id FROM chat_handle_join " \
+                    + "WHERE " + condition + " UNION " \
+                    + "SELECT m.handle_id FROM chat_message_join cmj " \
+                    + "JOIN message m ON m.rowid = cmj.message_id " \
+                    + "WHERE " \
+                    + _get_range_condition("cmj.chat_id", len(chunk)) + ")",
+                    params + params))
+        attachments = []
+        num_messages = case_db.insert("messages", backup_id,
+            self._iter_case_messages(self._get_conversations(True),
+                attachments))
+        case_db.insert("attachments", backup_id, attachments)
+        print "Saved %d message(s) and %d attachment(s)." \
+            % (num_messages, len(attachments))
+
+    def _read_messages(self, conversation_id, rows, attachments):
+        """Read the messages of a conversation.
+
+        Args:
+          conversation_id: The ID of the conversation.
+          rows: Iterator over the rows of the conversation.
+          attachments: Dictionary of message ID -> list of Attachments.
+
+        Yields:
+          (row, attachments) tuples, without the conversation ID,
+          message ID and date columns.
+        """
+        last_message = self.last_messages.get(conversation_id, [0, 0])
+        for r in rows:
+            if (r[1] > last_message[0]):
+                last_message = [r[1], r[2]]
+                self.last_messages[conversation_id] = last_message
+            yield (r[3:], attachments.get(r[1], []))
+
+    def _use_search_index(self):
+        """Determine if the keywords should be searched in the
+        full-text index (see run).
+        """
+        return (self.get_option_value("SEARCH_INDEX")
+            and str(self.get_option_value("KEYWORDS")).strip() != "")
+
+    def _get_people(self, ranges, contact_index):
+        """Get the people involved in a set of conversations.
+
+        Args:
+          ranges: List of (first, last) conversation ID ranges.
+          contact_index: Contact index of the backup
+                         (see contacts_helper.get_contact_index).
+
+        Returns:
+          Dictionary of conversation ID -> list of
+          "Name (Phone Number / Email Address)" strings.
+        """
+        query_phone_numbers = "SELECT chj.chat_id, h.id " \
+            + "FROM chat_handle_join chj " \
+            + "JOIN handle h " \
+            + "ON chj.handle_id = h.rowid " \
+            + "WHERE " + _get_range_condition("chj.chat_id", len(ranges)) \
+            + " ORDER BY chj.chat_id"
+        phone_numbers = db.iter_query(self.sms_db_path, query_phone_numbers,
+            tuple(itertools.chain.from_iterable(ranges)))
+        people = {}
+        for p in phone_numbers:
+            name = contact_index.get_contact_by_id(p[1])
+            people.setdefault(p[0], []).append(name + " (" + p[1] + ")")
+        return people
+
+    def _get_query(self, num_ranges, case_columns = False):
         """Create SQL statement to query the messages DB.
 
         The statement is created based on the value set
         to each of the options supported by this module.
+
+        Args:
+          num_ranges: Number of conversation ID ranges
+                      included in the query.
+          case_columns: Select the columns of the case database
+                        instead (see _save_conversations).
         """
-        q_select = "SELECT "
-        if (self.get_option_value("INCLUDE_MESSAGE_ID")):
-            q_select += "m.rowid as MsgID, "
-        # Using the DATETIME sqlite function to convert the time
-        # from Mac Absolute Time to Unix epoch time and then
-        # to localtime.
-        # For reference:
-        # https://linuxsleuthing.blogspot.com/2012/10/whos-texting-ios6-smsdb.html
-        q_select += "DATETIME(m.date + 978307200, 'unixepoch', 'localtime')" \
-                    + " as d, "
-        q_select += "h.id as 'Phone Number / Email Address', "
-        if (self.get_option_value("INCLUDE_SERVICE")):
-            q_select += "m.service as Service, "
-        q_select += "CASE is_from_me "
-        q_select += "WHEN 0 THEN 'Received' "
-        q_select += "WHEN 1 THEN 'Sent' "
-        q_select += "ELSE 'Unknown' "
-        q_select += "END as Type, "
-        if (self.get_option_value("INCLUDE_SUBJECT")):
+        q_select = "SELECT c.rowid as ChatID, m.rowid as MessageRowID, " \
+                    + "m.date as MessageDate, "
+        if (case_columns):
+            q_select += "m.rowid, m.handle_id, m.date, "
+            q_select += messages_helper.get_datetime_expression("m.date",
+                        self.date_scale, False) + ", "
+            q_select += "m.is_from_me, m.service, m.subject, m.text "
+        else:
+            if (self.get_option_value("INCLUDE_MESSAGE_ID")):
+                q_select += "m.rowid as MsgID, "
+            q_select += messages_helper.get_datetime_expression("m.date",
+                        self.date_scale) + " as d, "
+            q_select += "h.id as 'Phone Number / Email Address', "
+            if (self.get_option_value("INCLUDE_SERVICE")):
+                q_select += "m.service as Service, "
+            q_select += "CASE is_from_me "
+            q_select += "WHEN 0 THEN 'Received' "
+            q_select += "WHEN 1 THEN 'Sent' "
+            q_select += "ELSE 'Unknown' "
+            q_select += "END as Type, "
+            if (self.get_option_value("INCLUDE_SUBJECT")):
+                q_select += "CASE "
+                q_select += "WHEN m.subject IS NULL THEN '' "
+                q_select += "ELSE m.subject "
+                q_select += "END as Subject, "
             q_select += "CASE "
-            q_select += "WHEN m.subject IS NULL THEN '' "
-            q_select += "ELSE m.subject "
-            q_select += "END as Subject, "
-        q_select += "CASE "
-        q_select += "WHEN m.text IS NULL THEN '' "
-        q_select += "WHEN hex(m.text) like '%EFBFBC%' THEN "
-        q_select += "CASE WHEN ("
-        q_select += "SELECT COUNT(*) from attachment a, message msg "
-        q_select += "JOIN message_attachment_join maj "
-        q_select += "ON maj.attachment_id = a.rowid "
-        q_select += "and maj.message_id = msg.rowid "
-        q_select += "WHERE a.mime_type like 'image/%' "
-        q_select += "and msg.rowid = m.rowid"
-        q_select += ") > 0 THEN "
-        q_select += "coalesce("
-        q_select += "(SELECT a.mime_type from attachment a, message msg "
-        q_select += "JOIN message_attachment_join maj "
-        q_select += "on maj.attachment_id = a.rowid "
-        q_select += "and maj.message_id = msg.rowid "
-        q_select += "WHERE a.mime_type like 'image/%' "
-        q_select += "and msg.rowid = m.rowid), "
-        q_select += "'') || ';' || "
-        q_select += "coalesce("
-        q_select += "(SELECT a.filename from attachment a, message msg "
-        q_select += "JOIN message_attachment_join maj "
-        q_select += "on maj.attachment_id = a.rowid "
-        q_select += "and maj.message_id = msg.rowid "
-        q_select += "WHERE a.mime_type like 'image/%' "
-        q_select += "and msg.rowid = m.rowid), "
-        q_select += "'') || ';' "
-        q_select += "|| m.text ELSE m.text END "
-        q_select += "ELSE m.text "
-        q_select += "END as Text "
+            q_select += "WHEN m.text IS NULL THEN '' "
+            q_select += "ELSE m.text "
+            q_select += "END as Text "
         q_from = "FROM "
         q_from += "message m, "
         q_from += "handle h, "
@@ -494,11 +1022,22 @@ class Module(IOSModule):
         q_join += "and cmj.chat_id = c.rowid"
         q_where = "WHERE "
         q_where += "m.handle_id = h.rowid "
-        q_where += "and c.rowid = ?"
+        q_where += "and " + _get_range_condition("c.rowid", num_ranges)
+        q_where += " and m.rowid > ?"
         # Search for keywords if needed
         keywords = \
             [k.strip()
                 for k in str(self.get_option_value("KEYWORDS")).split(",")]
+        if (self.search_index_attached):
+            # The keywords are searched in the index instead
+            # of scanning the text of every message. One subquery
+            # per keyword, so that each LIKE is answered by the
+            # trigram index.
+            q_where += " and m.rowid IN (" \
+                + " UNION ".join(["SELECT message_id FROM " \
+                    + search_index.SCHEMA_NAME + ".message_fts " \
+                    + "WHERE text LIKE ?"] * len(keywords)) + ")"
+            keywords = []
         i = 0
         for k in keywords:
             if (i == 0):
@@ -510,17 +1049,40 @@ class Module(IOSModule):
             q_where += ")"
         # Only include messages between
         # START_DATE and END_DATE (inclusive)
-        # if those options are set.
-        start_date = self.get_option_value("START_DATE")
-        end_date = self.get_option_value("END_DATE")
-        if (start_date != "" and end_date != ""):
-            q_where += " and date(d) "
-            q_where += " BETWEEN date(?)"
-            q_where += " and date(?)"
-        elif (start_date != "" and end_date == ""):
-            q_where += " and date(d) >= date(?)"
-        elif (start_date == "" and end_date != ""):
-            q_where += " and date(d) <= date(?)"
-        q_order_by = "ORDER BY m.date ASC"
+        # if those options are set. The dates were converted
+        # to message.date values, so the dates of the messages
+        # are compared without converting them.
+        if (self.date_bounds[0] is not None):
+            q_where += " and m.date >= ?"
+        if (self.date_bounds[1] is not None):
+            q_where += " and m.date < ?"
+        q_order_by = "ORDER BY c.rowid ASC, m.date ASC"
         query = " ".join([q_select, q_from, q_join, q_where, q_order_by])
         return query
+
+def _get_id_ranges(ids):
+    """Collapse a sorted list of IDs into ranges of consecutive IDs.
+
+    Args:
+      ids: Sorted list of unique IDs.
+
+    Returns:
+      List of (first, last) tuples (e.g., [1, 2, 3, 5] -> [(1, 3), (5, 5)]).
+    """
+    ranges = []
+    for id in ids:
+        if (len(ranges) > 0 and ranges[-1][1] == id - 1):
+            ranges[-1] = (ranges[-1][0], id)
+        else:
+            ranges.append((id, id))
+    return ranges
+
+def _get_range_condition(column, num_ranges):
+    """Create SQL condition that matches a column against ID ranges.
+
+    Args:
+      column: Name of the column to compare.
+      num_ranges: Number of ranges. Each range takes two parameters.
+    """
+    return "(" + " or ".join(
+        [column + " BETWEEN ? AND ?"] * num_ranges) + ")"
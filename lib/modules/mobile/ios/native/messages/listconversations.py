@@ -16,9 +16,6 @@
     along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-# Miscellaneous operating system interfaces
-# https://docs.python.org/2/library/os.html
-import os
 # Regular expression operations
 # https://docs.python.org/2/library/re.html
 import re
@@ -29,10 +26,6 @@ from lib.common.mobile.ios import contacts_helper
 from lib.common.db.sqlite import db
 # The ioscontants module contains the names of important iOS backup files.
 from lib.common.mobile.ios import iosconstants
-# The html module contains functions to generate html output
-from lib.export import html
-# The pdf module contains functions to generate pdf output
-from lib.export import pdf
 # IOS module is the Base class for modules that need an iOS Backups.
 from sff.core.module import IOSModule
 
@@ -51,6 +44,13 @@ class Module(IOSModule):
         "description": "Lists conversations from " \
             + "native iOS Messages application",
         "options": [
+            [
+             "CASE_DATABASE", # Option Name
+             "case.db", # Value
+             True, # Required Option
+             "File name of the sqlite case database in the output " \
+                + "directory (OUTPUT_FORMAT sqlite)." # Description
+            ],
             [
              "OUTPUT_FILE_NAME_PREFIX", # Option Name
              "conversationlist", # Value
@@ -61,7 +61,7 @@ class Module(IOSModule):
              "OUTPUT_FORMAT", # Option Name
              "stdout", # Value
              True, # Required Option
-             "Valid options: stdout,pdf,html"
+             "Valid options: stdout,pdf,html,csv,jsonl,sqlite"
             ],
             [
              "SERVICE", # Option Name
@@ -99,38 +99,28 @@ class Module(IOSModule):
     # ***************************************************************
 
     def run(self):
-        """Run module's code."""
-        conversations = self._get_conversation_list()
+        """Run module's code.
 
+        Returns:
+          False if the module could not be run (e.g., the
+          OUTPUT_FORMAT is not supported), True otherwise.
+        """
         # Output
         title = "Conversation List"
         header = None
         output_format = self.get_option_value("OUTPUT_FORMAT").lower()
+        if (output_format == "sqlite"):
+            self._save_to_case_database(self._save_conversations)
+            return True
+        conversations = self._get_conversation_list()
         if (output_format == "stdout"):
             print title
             self._print_table(conversations)
-        elif (output_format == "html"):
-            if (not os.path.isdir(self.output_dir)):
-                os.mkdir(self.output_dir)
-            output_prefix = self.get_option_value("OUTPUT_FILE_NAME_PREFIX")
-            file_full_path = self.output_dir + "/" + output_prefix + ".html"
-            html.create_document_from_row_list(title,
-                header,
-                conversations,
-                file_full_path)
-            print "Output saved to: " + file_full_path
-        elif (output_format == "pdf"):
-            if (not os.path.isdir(self.output_dir)):
-                os.mkdir(self.output_dir)
-            output_prefix = self.get_option_value("OUTPUT_FILE_NAME_PREFIX")
-            file_full_path = self.output_dir + "/" + output_prefix + ".pdf"
-            pdf.create_document_from_row_list(title,
-                header,
-                conversations,
-                file_full_path)
-            print "Output saved to: " + file_full_path
-        else:
+        elif (not self._save_document(output_format, title, header,
+            conversations)):
             print "Unsupported OUTPUT_FORMAT"
+            return False
+        return True
 
     # ***************************************************************
     # HELPER methods
@@ -157,43 +147,52 @@ class Module(IOSModule):
         attempt to find contact information (i.e., Name) from
         each person that is part of a conversation.
 
-        Returns
-          List of tuples with information from the SMS/iMessage DB."
+        Yields
+          Rows with information from the SMS/iMessage DB.
+          The first row contains the headers.
         """
         query = self._get_query()
         service = self.get_option_value("SERVICE")
         if (service == "any"):
-            rows = db.query(self.sms_db_path, query)
+            rows = db.iter_query(self.sms_db_path, query)
         else:
             params = [service]
-            rows = db.query(self.sms_db_path, query, tuple(params))
+            rows = db.iter_query(self.sms_db_path, query, tuple(params))
 
+        yield self._get_headers()
         if (self.get_option_value("SHOW_CONTACT_INFO")):
             # SHOW_CONTACT_INFO = True
-            rows_with_contact_info = [self._get_headers()]
+            contact_index = \
+                contacts_helper.get_contact_index(self.backup_dir)
             for r in rows:
                 # The 'id' in the following function name
                 # refers to the "handle id" which is the
                 # phone number or email address that
                 # is stored in the handle table within the
                 # messages db.
-                name = \
-                    contacts_helper.get_contact_by_id(self.backup_dir, r[1])
-                rows_with_contact_info.append((r[0], r[1], name, r[2]))
-            return rows_with_contact_info
+                name = contact_index.get_contact_by_id(r[1])
+                yield (r[0], r[1], name, r[2])
+            return
 
         # SHOW_CONTACT_INFO = False
-        rows.insert(0, self._get_headers())
-        return rows
+        for r in rows:
+            yield r
 
-    def _get_query(self):
+    def _get_query(self, case_columns = False):
         """Create SQL statement to query the messages DB.
 
         The statement is created based on the value set
         to each of the options supported by this module.
+
+        Args:
+          case_columns: Select the columns of the case database
+                        instead (see _save_conversations).
         """
         service = self.get_option_value("SERVICE")
         q_select = "SELECT c.rowid, h.id, h.service"
+        if (case_columns):
+            q_select = "SELECT c.rowid, c.chat_identifier, " \
+                + "h.rowid, h.id, h.service"
         q_from = "FROM chat c, handle h"
         q_join = "JOIN chat_handle_join chj " \
                     + "ON chj.handle_id = h.rowid " \
@@ -205,4 +204,51 @@ class Module(IOSModule):
         else:
             query = " ".join(
                 [q_select, q_from, q_join, q_where, q_case_insensitive])
+        if (case_columns):
+            query += " ORDER BY c.rowid"
         return query
+
+    def _iter_case_chat_handles(self, rows, chats, handles):
+        """Split the rows of the case database query into chat handles.
+
+        Args:
+          rows: Rows of the query (see _get_query),
+                sorted by conversation.
+          chats: List where the (chat ID, chat identifier)
+                 tuples are appended.
+          handles: Dictionary where the (handle ID, address, service)
+                   tuples are added by handle ID.
+
+        Yields
+          (chat ID, handle ID) tuples.
+        """
+        for r in rows:
+            if (len(chats) == 0 or chats[-1][0] != r[0]):
+                chats.append(r[0:2])
+            handles[r[2]] = r[2:5]
+            yield (r[0], r[2])
+
+    def _save_conversations(self, case_db, backup_id):
+        """Save the list of conversations to the case database.
+
+        Saves the conversations, the handles (i.e., phone numbers
+        and email addresses) and the handles of each conversation.
+
+        Args:
+          case_db: The CaseDatabase.
+          backup_id: ID of the backup in the case database.
+        """
+        query = self._get_query(True)
+        service = self.get_option_value("SERVICE")
+        if (service == "any"):
+            rows = db.iter_query(self.sms_db_path, query)
+        else:
+            rows = db.iter_query(self.sms_db_path, query, (service,))
+        chats = []
+        handles = {}
+        case_db.insert("chat_handles", backup_id,
+            self._iter_case_chat_handles(rows, chats, handles))
+        case_db.insert("chats", backup_id, chats)
+        case_db.insert("handles", backup_id, handles.itervalues())
+        print "Saved %d conversation(s) and %d handle(s)." \
+            % (len(chats), len(handles))
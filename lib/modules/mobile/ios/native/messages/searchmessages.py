@@ -0,0 +1,241 @@
+"""Smartphone Framework Forensics
+    Module: mobile/ios/native/messages/search.
+    Copyright (C) 2017  Sergio A. Nevarez
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+# The db module includes the code to run queries on sqlite databases.
+from lib.common.db.sqlite import db
+# Helper methods to decode messages from the SMS/iMessage database
+from lib.common.mobile.ios import messages_helper
+# Full-text index of the messages of the SMS/iMessage database
+from lib.common.mobile.ios import search_index
+# IOS module is the Base class for modules that need an iOS Backups.
+from sff.core.module import IOSModule
+
+class Module(IOSModule):
+    """The Module class implements the current module's code.
+
+    mobile/ios/native/messages/search
+        This module uses a full-text index of the SMS/iMessage db
+        in the iOS Backup to find the messages that contain
+        a set of keywords in any conversation.
+    """
+    info = {
+        "name": "Search iOS messages",
+        "author": "Sergio Nevarez",
+        "description": "Search messages from " \
+            + "native iOS Messages application",
+        "options": [
+            [
+             "CONVERSATION_IDS", # Option Name
+             "", # Value
+             False, # Required Option
+             "Comma-separated list with IDs of the conversations " \
+             + "to search. All the conversations are searched " \
+             + "if it is not set."
+            ],
+            [
+             "KEYWORDS", # Option Name
+             "", # Value
+             True, # Required Option
+             "Comma-separated list of keywords to search in " \
+             + "the content of the messages."
+            ],
+            [
+             "LIMIT", # Option Name
+             100, # Value
+             True, # Required Option
+             "Maximum number of messages in the output " \
+                + "(0 for no limit)." # Description
+            ],
+            [
+             "OUTPUT_FILE_NAME_PREFIX", # Option Name
+             "search", # Value
+             True, # Required Option
+             "Output file name prefix for pdf and html files."
+            ],
+            [
+             "OUTPUT_FORMAT", # Option Name
+             "stdout", # Value
+             True, # Required Option
+             "Valid options: stdout,pdf,html,csv,jsonl"
+            ]
+        ]
+    }
+
+    def __init__(self):
+        """Initializes module.
+
+        Sets require_sms property to True so that IOSModule
+        validates that the SMS/iMessage db is present in the backup directory.
+        """
+        IOSModule.__init__(self,
+            "lib/modules/mobile/ios/native/messages/searchmessages.conf")
+        self.require_sms = True
+
+    # ***************************************************************
+    # COMMANDS
+    # ***************************************************************
+
+    def do_search(self, line):
+        """Implementation of the 'search' command.
+
+        Sets the KEYWORDS option and runs the module.
+
+        Args:
+          self: Reference to the instance of the class.
+          line: The keywords to search.
+        """
+        if not line:
+            # The 'search' command expects keywords as its argument.
+            # Display command documentation.
+            self.help_search()
+            return
+        self.set_option_value("KEYWORDS", line)
+        self.do_run("")
+
+    def run(self):
+        """Run module's code.
+
+        Returns:
+          False if the module could not be run (e.g., the
+          OUTPUT_FORMAT is not supported), True otherwise.
+        """
+        limit = self.get_int_option_value("LIMIT")
+        if (limit is None or limit < 0):
+            print "LIMIT must be 0 or a positive integer."
+            return False
+        try:
+            search_index.attach_index(self.sms_db_path,
+                self.output_dir + "/cache")
+        except IOError as e:
+            print "Error: %s" % e
+            return False
+        messages = self._search(limit)
+
+        # Output
+        title = "Messages that contain: " \
+            + str(self.get_option_value("KEYWORDS"))
+        header = None
+        output_format = self.get_option_value("OUTPUT_FORMAT").lower()
+        if (output_format == "stdout"):
+            print title
+            self._print_table(messages)
+        elif (not self._save_document(output_format, title, header,
+            messages)):
+            print "Unsupported OUTPUT_FORMAT"
+            return False
+        return True
+
+    # ***************************************************************
+    # HELP
+    # ***************************************************************
+
+    def help_search(self):
+        """Print the 'search' command documentation.
+
+        Args:
+          self: Reference to the instance of the class.
+        """
+        print "\n".join(["NAME",
+                         "\tsearch -- Search messages.",
+                         "SYNOPSYS",
+                         "\tsearch <keywords>",
+                         "DESCRIPTION",
+                         "\tSet the KEYWORDS option " \
+                            + "(comma-separated list) and run the module."
+                         ])
+
+    # ***************************************************************
+    # HELPER methods
+    # ***************************************************************
+
+    def _get_conversation_ids(self):
+        """Get the list of conversation IDs to search.
+
+        Expands the ranges in the CONVERSATION_IDS option
+        (e.g., 1-3,5 -> [1, 2, 3, 5]).
+        """
+        ids = []
+        for id in str(self.get_option_value("CONVERSATION_IDS")).split(","):
+            r = id.strip().split("-")
+            if (r[0] == ""):
+                continue
+            if (len(r) == 2):
+                ids.extend(range(int(r[0]), int(r[1]) + 1))
+            else:
+                ids.append(int(r[0]))
+        return ids
+
+    def _get_query(self, num_keywords, num_ids, limit):
+        """Create SQL statement to search the messages.
+
+        Args:
+          num_keywords: Number of keywords to search.
+          num_ids: Number of conversation IDs (0 to search all).
+          limit: Maximum number of messages (0 for no limit).
+        """
+        q_select = "SELECT f.chat_id as ChatID, f.message_id as MsgID, "
+        q_select += messages_helper.get_datetime_expression("f.date",
+                    messages_helper.get_date_scale(self.sms_db_path)) \
+                    + " as d, "
+        q_select += "h.id as 'Phone Number / Email Address', "
+        q_select += "CASE m.is_from_me "
+        q_select += "WHEN 0 THEN 'Received' "
+        q_select += "WHEN 1 THEN 'Sent' "
+        q_select += "ELSE 'Unknown' "
+        q_select += "END as Type, "
+        q_select += "f.text as Text"
+        q_from = "FROM " + search_index.SCHEMA_NAME + ".message_fts f "
+        q_from += "JOIN message m ON m.rowid = f.message_id "
+        q_from += "LEFT JOIN handle h ON h.rowid = m.handle_id"
+        # One subquery per keyword, so that each LIKE is
+        # answered by the trigram index.
+        q_where = "WHERE f.rowid IN (" \
+            + " UNION ".join(["SELECT rowid FROM " \
+                + search_index.SCHEMA_NAME + ".message_fts " \
+                + "WHERE text LIKE ?"] * num_keywords) + ")"
+        if (num_ids > 0):
+            q_where += " and f.chat_id IN (" \
+                + ", ".join(["?"] * num_ids) + ")"
+        q_order_by = "ORDER BY f.date DESC"
+        query = " ".join([q_select, q_from, q_where, q_order_by])
+        if (limit > 0):
+            query += " LIMIT " + str(limit)
+        return query
+
+    def _search(self, limit):
+        """Search the messages that contain the keywords.
+
+        Args:
+          limit: Maximum number of messages (0 for no limit).
+
+        Yields
+          Rows with the messages that contain any of the keywords,
+          newest first. The first row contains the headers.
+        """
+        keywords = \
+            [k.strip()
+                for k in str(self.get_option_value(
+                    "KEYWORDS")).decode("utf-8").split(",")]
+        ids = self._get_conversation_ids()
+        params = ['%' + k + '%' for k in keywords] + ids
+        yield ["Conversation ID", "ID", "Date", "Phone / Email",
+            "Sent/Received", "Text"]
+        for r in db.iter_query(self.sms_db_path,
+            self._get_query(len(keywords), len(ids), limit), tuple(params)):
+            yield r
@@ -20,14 +20,111 @@
 
 __author__ = "Sergio Nevarez"
 
+# Parser for command-line options, arguments and sub-commands
+# https://docs.python.org/2/library/argparse.html
+import argparse
+# System-specific parameters and functions
+# https://docs.python.org/2/library/sys.html
+import sys
+
+# The db module includes the code to run queries on sqlite databases.
+from lib.common.db.sqlite import db
+# The metrics module keeps the counters and timers of the current run.
+from lib.common import metrics
 # Import Forensics class, which implements the main menu
 from sff.core.base import Forensics
 
 # ************************* MAIN *********************************************
 def main():
-    """Start the application loop to read user input."""
-    Forensics().cmdloop()
+    """Start the application loop to read user input.
+
+    If arguments are given, run the modules without user interaction:
+      sff.py run <module> [--set OPTION=VALUE ...]
+                          [--offset N] [--limit N] [--pager] [--profile]
+                          [--stats FILE]
+      sff.py resource <file> [<file> ...]
+    """
+    if (len(sys.argv) == 1):
+        Forensics().cmdloop()
+        return
+
+    args = _parse_args()
+    forensics = Forensics()
+    try:
+        if (args.command == "run"):
+            options = []
+            for o in args.set:
+                option_value = o.split("=", 1)
+                if (len(option_value) != 2):
+                    print "Invalid option '%s'. Use OPTION=VALUE." % o
+                    sys.exit(1)
+                options.append(
+                    (option_value[0].strip(), option_value[1].strip()))
+            run_arguments = []
+            if (args.offset is not None):
+                run_arguments.append("--offset %d" % args.offset)
+            if (args.limit is not None):
+                run_arguments.append("--limit %d" % args.limit)
+            if (args.pager):
+                run_arguments.append("--pager")
+            succeeded = forensics.run_module(args.module, options,
+                " ".join(run_arguments), args.profile)
+            # The metrics of a failed run are saved as well.
+            if (args.stats is not None):
+                metrics.save(args.stats)
+            if (not succeeded):
+                sys.exit(1)
+        elif (args.command == "resource"):
+            for path in args.files:
+                if (path == "-"):
+                    forensics.run_script(sys.stdin)
+                else:
+                    with open(path, "r") as script:
+                        forensics.run_script(script)
+    finally:
+        db.close_all()
+
+def _parse_args():
+    """Parse the command line arguments for non-interactive use."""
+    parser = argparse.ArgumentParser(
+        description = "Smartphone Forensics Framework. " \
+            + "Run without arguments to start the interactive menu.")
+    commands = parser.add_subparsers(dest = "command")
+    run = commands.add_parser("run",
+        help = "Run a module with the given options.")
+    run.add_argument("module",
+        help = "Module name or module id (e.g., 1 or " \
+            + "mobile/ios/native/contacts/list).")
+    run.add_argument("--set", action = "append", default = [],
+        metavar = "OPTION=VALUE",
+        help = "Set a module option. Can be repeated.")
+    run.add_argument("--offset", type = _non_negative_int, metavar = "N",
+        help = "Skip the first N rows of each table printed to stdout.")
+    run.add_argument("--limit", type = _non_negative_int, metavar = "N",
+        help = "Print at most N rows of each table printed to stdout.")
+    run.add_argument("--pager", action = "store_true",
+        help = "Send each table printed to stdout to a pager " \
+            + "($PAGER or less).")
+    run.add_argument("--profile", action = "store_true",
+        help = "Profile the run and print the time spent " \
+            + "in each phase (see 'help profile').")
+    run.add_argument("--stats", metavar = "FILE",
+        help = "Save the counters and timers of the run " \
+            + "to a JSON file (see 'show stats').")
+    resource = commands.add_parser("resource",
+        help = "Run the commands in resource script files " \
+            + "(one command per line, as typed at the prompt).")
+    resource.add_argument("files", nargs = "+", metavar = "file",
+        help = "Resource script ('-' to read from stdin).")
+    return parser.parse_args()
+
+def _non_negative_int(value):
+    """Convert an argument to a non-negative integer."""
+    if (not value.isdigit()):
+        raise argparse.ArgumentTypeError(
+            "'%s' is not a non-negative integer" % value)
+    return int(value)
 
 if __name__ == "__main__":
     # Code to run if this is called from the command line.
-    main()
\ No newline at end of file
+    main()
@@ -16,8 +16,20 @@
     along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+# Miscellaneous operating system interfaces
+# https://docs.python.org/2/library/os.html
+import os
+# Regular expression operations
+# https://docs.python.org/2/library/re.html
+import re
+# System-specific parameters and functions
+# https://docs.python.org/2/library/sys.html
+import sys
+
 # The framework module contains the ForensicsFramework class.
 from sff.core import framework
+# The registry module finds the modules supported by the framework.
+from sff.core import registry
 
 class Forensics(framework.ForensicsFramework):
     """Class for the program's command line menu/interpreter.
@@ -27,22 +39,15 @@ class Forensics(framework.ForensicsFramework):
     """
     def __init__(self):
         """Initializes Forensics class
-        by setting the list of supported modules.
+        by loading the registry of supported modules.
 
         Args:
           self: Reference to the instance of the class.
         """
         framework.ForensicsFramework.__init__(self)
         # Supported modules
-        self._modules = [
-            ["Module ID", "Module Name", "Description"],
-            ["1", "mobile/ios/native/contacts/list",
-                "Lists contacts from native iOS Address Book"],
-            ["2", "mobile/ios/native/messages/extract_conversations",
-                "Extract conversation contents from iOS Messages DB"],
-            ["3", "mobile/ios/native/messages/list",
-                "Lists conversations from native iOS Messages DB"]
-        ]
+        self._registry = registry.ModuleRegistry(
+            os.path.abspath(os.path.dirname(sys.argv[0])))
 
     # ***************************************************************
     # COMMANDS
@@ -85,36 +90,78 @@ class Forensics(framework.ForensicsFramework):
             self.help_use()
             return
 
-        if line == "mobile/ios/native/contacts/list" \
-            or line == "1":
-            # Load and start mobile/ios/native/contacts/list module.
-            from lib.modules.mobile.ios.native.contacts.listcontacts \
-                import Module
-            mod = Module()
-            mod.prompt = "(mobile/ios/native/contacts/list) > "
-            mod.cmdloop()
-            return
-        if line == "mobile/ios/native/messages/extract_conversations" \
-            or line == "2":
-            # Load and start mobile/ios/native/messages/list module.
-            from lib.modules.mobile.ios.native.messages.extractconversations \
-                import Module
-            mod = Module()
-            mod.prompt = "(mobile/ios/native/messages/extract_conversations) > "
-            mod.cmdloop()
-            return
-        if line == "mobile/ios/native/messages/list" \
-            or line == "3":
-            # Load and start mobile/ios/native/messages/list module.
-            from lib.modules.mobile.ios.native.messages.listconversations \
-                import Module
-            mod = Module()
-            mod.prompt = "(mobile/ios/native/messages/list) > "
-            mod.cmdloop()
+        mod = self._get_module(line)
+        if (mod is None):
+            # Unusupported module.
+            print "Module '%s' not implemented" % line
             return
+        mod.cmdloop()
 
-        # Unusupported module.
-        print "Module '%s' not implemented" % line
+    # ***************************************************************
+    # BATCH
+    # ***************************************************************
+
+    def run_module(self, line, options, run_arguments = "", profile = False):
+        """Run a module without user interaction.
+
+        Args:
+          self: Reference to the instance of the class.
+          line: The module name or module id.
+          options: List of (option, value) tuples to set before
+                   running the module.
+          run_arguments: Arguments of the 'run' command
+                         (e.g., --limit 50).
+          profile: True to run the module with the 'profile' command.
+
+        Returns:
+          True if the module was run and succeeded. False if the
+          module or one of the options does not exist, or if the
+          run failed (e.g., BACKUP_DIR is not a backup).
+        """
+        mod = self._get_module(line)
+        if (mod is None):
+            print "Module '%s' not implemented" % line
+            return False
+        for option, value in options:
+            if (not mod.set_option_value(option, value)):
+                print "Option '%s' does not exist" % option
+                return False
+        command = "profile " if profile else "run "
+        mod.onecmd((command + run_arguments).strip())
+        return mod.run_succeeded
+
+    def run_script(self, script):
+        """Run the commands of a resource script.
+
+        The script contains the same commands that would be typed
+        at the prompt (e.g., use, set, run, back), one per line.
+        Lines that start with a '#' character are comments.
+        Every module is run in this process, so database connections
+        and caches are shared by all the commands of the script.
+
+        Args:
+          self: Reference to the instance of the class.
+          script: File object with the commands to run.
+        """
+        mod = None
+        for line in script:
+            line = line.strip()
+            if (len(line) == 0 or line[0] == "#"):
+                continue
+            if (mod is None):
+                print self.prompt + line
+                args = re.split(r'\s+', line, 1)
+                if (args[0] == "use" and len(args) == 2):
+                    mod = self._get_module(args[1])
+                    if (mod is None):
+                        print "Module '%s' not implemented" % args[1]
+                else:
+                    self.onecmd(line)
+            else:
+                print mod.prompt + line
+                if (mod.onecmd(line)):
+                    # The 'back' command exits the module
+                    mod = None
 
     # ***************************************************************
     # HELP
@@ -153,9 +200,28 @@ class Forensics(framework.ForensicsFramework):
     # HELPER methods
     # ***************************************************************
 
+    def _get_module(self, line):
+        """Load a module.
+
+        Args:
+          self: Reference to the instance of the class.
+          line: The module name or module id.
+
+        Returns:
+          An instance of the module or None if the module
+          is not implemented.
+        """
+        entry = self._registry.get(line)
+        if (entry is None):
+            return None
+        return self._registry.load(entry)
+
     def _show_modules(self):
         """Display the list of supported modules."""
-        self._print_table(self._modules)
+        modules = [["Module ID", "Module Name", "Description"]]
+        for m in self._registry.modules:
+            modules.append([m.id, m.name, m.description])
+        self._print_table(modules)
 
     def _show_supported_options(self):
         """Show list of supported options for the 'show' command.
@@ -27,19 +27,9 @@ from datetime import datetime
 # System-specific parameters and functions
 # https://docs.python.org/2/library/sys.html
 import sys
-# Text wrapping and filling
-# https://docs.python.org/2/library/textwrap.html
-from textwrap import wrap
-
-try:
-    # https://pypi.python.org/pypi/terminaltables
-    from terminaltables import AsciiTable
-except ImportError as e:
-    # At least one of the required modules is not installed
-    # on this system.
-    print "Module \"{0}\" not installed".format(e.message[16:])
-    # Exit program
-    sys.exit(1)
+
+# The table module contains functions to print tables to the terminal.
+from lib.export import table
 
 class ForensicsFramework(cmd.Cmd):
     """Base class for the command line menus/interpreters.
@@ -79,6 +69,11 @@ class ForensicsFramework(cmd.Cmd):
         # Set the prompt for the command line interpreter
         self.prompt = "(SFF) > "
 
+        # Rows of the tables to print (see _print_table)
+        self.table_offset = 0
+        self.table_limit = 0
+        self.table_pager = False
+
     # ***************************************************************
     # COMMANDS
     # ***************************************************************
@@ -115,15 +110,23 @@ class ForensicsFramework(cmd.Cmd):
     # ***************************************************************
 
     def _print_table(self, data):
-        """Print table to stdout."""
-        max_width = 45
-        wrapped_data = \
-            [["\n".join(wrap(col, max_width))
-                if ((type(col) is str or type(col) is unicode)
-                    and len(col) > max_width)
-                else col
-                for col in row]
-                for row in data]
-        table = AsciiTable(wrapped_data)
-        table.inner_row_border = True
-        print table.table
\ No newline at end of file
+        """Print table to stdout.
+
+        Rows are printed as they are read, so data can be a generator
+        that reads the rows from a database. The table_offset,
+        table_limit and table_pager attributes select the rows and
+        whether the table is sent to a pager.
+
+        Args:
+          data: Iterable of rows. The first row contains the headers.
+        """
+        table.print_table(data, self.table_offset, self.table_limit,
+            self.table_pager)
+
+    def _print_text(self, text):
+        """Print a line of text (e.g., a title) to stdout.
+
+        Args:
+          text: Text or unicode text.
+        """
+        table.print_text(text)
\ No newline at end of file
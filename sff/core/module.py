@@ -16,21 +16,83 @@
     along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+# Shallow and deep copy operations
+# https://docs.python.org/2/library/copy.html
+import copy
+# Unix style pathname pattern expansion
+# https://docs.python.org/2/library/glob.html
+import glob
+# JSON encoder and decoder
+# https://docs.python.org/2/library/json.html
+import json
+# Process-based parallelism
+# https://docs.python.org/2/library/multiprocessing.html
+import multiprocessing
 # Miscellaneous operating system interfaces
 # https://docs.python.org/2/library/os.html
 import os
 # Regular expression operations
 # https://docs.python.org/2/library/re.html
 import re
+# DB-API 2.0 interface for SQLite databases
+# https://docs.python.org/2/library/sqlite3.html
+import sqlite3
 # System-specific parameters and functions
 # https://docs.python.org/2/library/sys.html
 import sys
+# Time access and conversions
+# https://docs.python.org/2/library/time.html
+import time
+# Print or retrieve a stack traceback
+# https://docs.python.org/2/library/traceback.html
+import traceback
 
+# The db module includes the code to run queries on sqlite databases.
+from lib.common.db.sqlite import db
+# The metrics module keeps the counters and timers of the current run.
+from lib.common import metrics
+# The profiler module groups the profile of a run by framework phase.
+from lib.common import profiler
+# The backup module includes the index of the files of iOS backups.
+from lib.common.mobile.ios import backup
+# Helper methods that interact with the iOS contacts database
+from lib.common.mobile.ios import contacts_helper
 # The ioscontants module contains the names of important iOS backup files.
 from lib.common.mobile.ios import iosconstants
+# The casedb module contains functions to generate the sqlite case database
+from lib.export import casedb
+# The csv module contains functions to generate csv output
+from lib.export import csv
+# The html module contains functions to generate html output
+from lib.export import html
+# The jsonl module contains functions to generate JSON Lines output
+from lib.export import jsonl
+# The pdf module contains functions to generate pdf output
+from lib.export import pdf
 # The framework module contains the ForensicsFramework class.
 from sff.core import framework
 
+# Characters of the glob patterns accepted by BACKUP_DIR.
+GLOB_CHARACTERS = re.compile(r"[*?[]")
+
+# Name of the file, in the output directory of each backup, where the
+# text printed by the module is saved when several backups are
+# processed at the same time.
+BACKUP_LOG_FILE_NAME = "output.txt"
+
+# Number of bytes read from the end of the log file of a backup
+# to show its last line in the summary.
+LAST_LINE_MAX_BYTES = 4096
+
+# Modules that save the output to a document, by OUTPUT_FORMAT.
+# Each module implements create_document_from_row_list().
+DOCUMENT_FORMATS = {
+    "csv": csv,
+    "html": html,
+    "jsonl": jsonl,
+    "pdf": pdf
+}
+
 class BaseModule(framework.ForensicsFramework):
     """Base class for the framework's modules.
 
@@ -41,6 +103,9 @@ class BaseModule(framework.ForensicsFramework):
       info: A dictionary object that stores the module's metadata.
             The module's metadata includes: name, author, description,
             and supported options.
+      run_succeeded: True if the last run of the module succeeded.
+      stats: The metrics of the last run of the module
+             (see metrics.get_stats) or None.
     """
     def __init__(self, config_file = None):
         """Initializes the Module.
@@ -48,10 +113,15 @@ class BaseModule(framework.ForensicsFramework):
         Removes the banner and sets a default prompt.
         """
         framework.ForensicsFramework.__init__(self)
+        # Each instance gets its own copy of the metadata so that
+        # option values do not leak between instances of the module.
+        self.info = copy.deepcopy(self.info)
         self.intro = ""
         self.prompt = "() > "
         self.app_path = os.path.abspath(os.path.dirname(sys.argv[0]))
         self.output_dir = self.app_path + "/output"
+        self.run_succeeded = False
+        self.stats = None
         if (config_file is not None):
             # Load module options from configuration file
             self.config_file = app_path + "/" + config_file
@@ -75,26 +145,58 @@ class BaseModule(framework.ForensicsFramework):
         """
         return True
 
+    def do_profile(self, line):
+        """Implementation of the 'profile' command.
+
+        Runs the module with the profiler enabled, saves the
+        statistics to the output directory and prints the time
+        spent in each phase of the framework and its hotspots.
+
+        Args:
+          self: Reference to the instance of the class.
+          line: The arguments to the 'run' command.
+        """
+        if (self._parse_run_arguments(line) is None):
+            # Display command documentation.
+            self.help_profile()
+            self.run_succeeded = False
+            return
+        profile = profiler.Profile()
+        profile.run(self.do_run, line)
+        if (not os.path.isdir(self.output_dir)):
+            os.mkdir(self.output_dir)
+        file_full_path = self.output_dir + "/profile" \
+            + time.strftime("_%Y%m%d%H%M%S") + ".prof"
+        profile.save(file_full_path)
+        # The paging arguments were reset by do_run(),
+        # so the tables of the profile are printed in full.
+        print "PROFILE"
+        self._print_table([["Phase", "Time (s)", "%", "Calls"]]
+            + profile.get_phase_rows())
+        self._print_table([["Phase", "Function", "Time (s)",
+            "Cumulative (s)", "Calls"]] + profile.get_hotspot_rows())
+        print "Profile saved to: " + file_full_path
+
     def do_run(self, line):
         """Implementation of the 'run' command.
 
+        The metrics of the run (see the metrics module)
+        are kept in the stats attribute, and whether the run
+        succeeded in the run_succeeded attribute (a command that
+        returns True stops the command loop).
+
         Args:
           self: Reference to the instance of the class.
-          line: The arguments to the 'run' command.
-                Not used by the 'run' command.
+          line: The arguments to the 'run' command
+                (see _parse_run_arguments).
         """
-        # Validate required options
-        options = self.info["options"]
-        for o in options:
-            if (o[2] and o[1] == ""):
-                # Missing required option.
-                # Display error message and return.
-                print "Required option '%s' is not set." % o[0]
-                return
-        # All required options are set
-        # The run() method should be implemented
-        # by subclasses of BaseModule.
-        self.run()
+        metrics.reset()
+        self.run_succeeded = False
+        try:
+            with metrics.timer("run"):
+                self.run_succeeded = self._run_module(line)
+        finally:
+            self.stats = metrics.get_stats()
 
     def do_set(self, line):
         """Implementation of the 'set' command.
@@ -145,13 +247,19 @@ class BaseModule(framework.ForensicsFramework):
             return
 
         # Options are case-insensitive
-        option = line.lower()
+        option = " ".join(line.lower().split())
         if (option == "options"):
             # Show module options
             self._show_options()
         elif (option == "info"):
             # Display module metadata
             self._show_info()
+        elif (option == "stats"):
+            # Display the metrics of the last run
+            self._show_stats()
+        elif (option == "stats json"):
+            # Display the metrics of the last run as JSON
+            self._show_stats(True)
         else:
             # Option not supported. Show list of valid options.
             print "Option \"" + option + "\" not supported\n"
@@ -175,6 +283,29 @@ class BaseModule(framework.ForensicsFramework):
                          "\tGo back to previous menu."
                          ])
 
+    def help_profile(self):
+        """Print the 'profile' command documentation.
+
+        Args:
+          self: Reference to the instance of the class.
+        """
+        print "\n".join(["NAME",
+                         "\tprofile -- Execute module's code " \
+                            + "with the profiler enabled.",
+                         "SYNOPSYS",
+                         "\tprofile [--offset N] [--limit N] [--pager]",
+                         "DESCRIPTION",
+                         "\tRun the module (see 'help run') and print " \
+                            + "the time spent in each phase",
+                         "\t(SQL query, contact lookup, attachment I/O, " \
+                            + "text decoding, rendering",
+                         "\tand writing) and the functions " \
+                            + "with the highest time of each phase.",
+                         "\tThe statistics are saved to " \
+                            + "output/profile_<timestamp>.prof",
+                         "\t(read them with: python -m pstats <file>)."
+                         ])
+
     def help_run(self):
         """Print the 'run' command documentation.
 
@@ -184,10 +315,17 @@ class BaseModule(framework.ForensicsFramework):
         print "\n".join(["NAME",
                          "\trun -- Execute module's code.",
                          "SYNOPSYS",
-                         "\trun",
+                         "\trun [--offset N] [--limit N] [--pager]",
                          "DESCRIPTION",
                          "\tCommand to run module's code " \
-                            + "after the required options have been set."
+                            + "after the required options have been set.",
+                         "\tTables printed to stdout are printed as " \
+                            + "their rows are read.",
+                         "OPTIONS",
+                         "\t--offset N: skip the first N rows of each table.",
+                         "\t--limit N: print at most N rows of each table.",
+                         "\t--pager: send each table to a pager " \
+                            + "(the PAGER environment variable or less)."
                          ])
 
     def help_set(self):
@@ -221,7 +359,10 @@ class BaseModule(framework.ForensicsFramework):
         options = [
             ["Option", "Description"],
             ["info", "Show module information"],
-            ["options", "Show list of supported options by this module"]
+            ["options", "Show list of supported options by this module"],
+            ["stats", "Show the counters and timers of the last run"],
+            ["stats json", "Show the counters and timers " \
+                + "of the last run as JSON"]
         ]
         self._print_table(options)
 
@@ -229,6 +370,108 @@ class BaseModule(framework.ForensicsFramework):
     # HELPER methods
     # ***************************************************************
 
+    def _parse_run_arguments(self, line):
+        """Parse the arguments of the 'run' command.
+
+        Args:
+          line: The arguments (e.g., --offset 100 --limit 50 --pager).
+
+        Returns:
+          (offset, limit, pager) tuple or None if the
+          arguments are not valid.
+        """
+        offset = 0
+        limit = 0
+        pager = False
+        args = line.split()
+        i = 0
+        while (i < len(args)):
+            if (args[i] == "--pager"):
+                pager = True
+            elif (args[i] in ("--offset", "--limit") and i + 1 < len(args)
+                and args[i + 1].isdigit()):
+                if (args[i] == "--offset"):
+                    offset = int(args[i + 1])
+                else:
+                    limit = int(args[i + 1])
+                i += 1
+            else:
+                print "Invalid argument '%s'" % args[i]
+                return None
+            i += 1
+        return (offset, limit, pager)
+
+    def _print_table(self, data):
+        """Print table to stdout (see ForensicsFramework._print_table).
+
+        The time spent printing the table, excluding the queries that
+        read its rows, is added to the render.stdout timer.
+
+        Args:
+          data: Iterable of rows. The first row contains the headers.
+        """
+        with metrics.document("stdout"):
+            framework.ForensicsFramework._print_table(self, data)
+
+    def _run_module(self, line):
+        """Validate the options and run the module's code.
+
+        Args:
+          self: Reference to the instance of the class.
+          line: The arguments to the 'run' command
+                (see _parse_run_arguments).
+
+        Returns:
+          True if the module's code was run and succeeded.
+        """
+        arguments = self._validate_run(line)
+        if (arguments is None):
+            return False
+        # All required options are set
+        # The run() method should be implemented
+        # by subclasses of BaseModule. It returns False
+        # if it fails (modules that return nothing succeed).
+        # The paging arguments only apply to the tables
+        # printed by the module's code.
+        self.table_offset, self.table_limit, self.table_pager = arguments
+        try:
+            return self.run() is not False
+        finally:
+            self.table_offset, self.table_limit, self.table_pager = \
+                (0, 0, False)
+
+    def _save_document(self, output_format, title, header, rows):
+        """Save the output of the module to a document.
+
+        The document is saved to the output directory and named after
+        the OUTPUT_FILE_NAME_PREFIX option and the output format
+        (e.g., output/contacts.csv).
+
+        Args:
+          output_format: html, pdf, csv or jsonl.
+          title: Title of the document.
+          header: Optional text to show under the title.
+          rows: Rows of the output. The first row contains the headers.
+
+        Returns:
+          False if the output format is not supported.
+        """
+        document_format = DOCUMENT_FORMATS.get(output_format)
+        if (document_format is None):
+            return False
+        if (not os.path.isdir(self.output_dir)):
+            os.mkdir(self.output_dir)
+        output_prefix = self.get_option_value("OUTPUT_FILE_NAME_PREFIX")
+        file_full_path = self.output_dir + "/" + output_prefix \
+            + "." + output_format
+        with metrics.document(output_format, file_full_path):
+            document_format.create_document_from_row_list(title,
+                header,
+                rows,
+                file_full_path)
+        print "Output saved to: " + file_full_path
+        return True
+
     def _show_info(self):
         """Display module metadata."""
         print "MODULE INFORMATION"
@@ -245,6 +488,60 @@ class BaseModule(framework.ForensicsFramework):
         self._print_table(self.info["options"])
         del self.info["options"][0]
 
+    def _show_stats(self, as_json = False):
+        """Display the metrics of the last run.
+
+        Args:
+          as_json: True to print the metrics as JSON
+                   (see metrics.get_stats).
+        """
+        if (self.stats is None):
+            print "The module has not been run."
+            return
+        if (as_json):
+            print json.dumps(self.stats, indent = 2,
+                separators = (",", ": "), sort_keys = True)
+            return
+        print "COUNTERS"
+        self._print_table([["Counter", "Value"]]
+            + sorted(self.stats["counters"].items()))
+        print "TIMERS"
+        self._print_table([["Timer", "Time (s)", "Calls"]]
+            + [[name, "%.3f" % t["seconds"], t["calls"]]
+                for name, t in sorted(self.stats["timers"].items())])
+        if (len(self.stats["files"]) > 0):
+            print "OUTPUT FILES"
+            self._print_table([["File", "Format", "Bytes"]]
+                + [[path, f["format"], f["bytes"]]
+                    for path, f in sorted(self.stats["files"].items())])
+
+    def _validate_run(self, line):
+        """Validate the arguments of the 'run' command and the options.
+
+        Args:
+          self: Reference to the instance of the class.
+          line: The arguments to the 'run' command
+                (see _parse_run_arguments).
+
+        Returns:
+          The parsed arguments or None if the arguments are not valid
+          or a required option is not set.
+        """
+        arguments = self._parse_run_arguments(line)
+        if (arguments is None):
+            # Display command documentation.
+            self.help_run()
+            return None
+        # Validate required options
+        options = self.info["options"]
+        for o in options:
+            if (o[2] and o[1] == ""):
+                # Missing required option.
+                # Display error message and return.
+                print "Required option '%s' is not set." % o[0]
+                return None
+        return arguments
+
     def get_option_index(self, option):
         """Get option index in metadata 'options' list.
 
@@ -274,6 +571,21 @@ class BaseModule(framework.ForensicsFramework):
         # Option does not exist
         return None
 
+    def get_int_option_value(self, option):
+        """Get option value from metadata 'options' list as an integer.
+
+        Args:
+          option: The option to retrieve its value.
+
+        Returns:
+          The value of the option or None if the option does not
+          exist or its value is not an integer.
+        """
+        try:
+            return int(self.get_option_value(option))
+        except (TypeError, ValueError):
+            return None
+
     def is_option_valid(self, option):
         """Determine if given option is valid for the current module.
 
@@ -340,7 +652,14 @@ class IOSModule(BaseModule):
     This class extends BaseModule and implements common functionality
     that can be reused by new iOS modules.
 
+    BACKUP_DIR can be a comma-separated list of paths or glob patterns
+    (e.g., /case/backups/*). If it matches more than one backup, the
+    backups are processed at the same time by BACKUP_WORKERS worker
+    processes, and the output of each backup is saved to its own
+    subdirectory of the output directory (see _run_backups).
+
     Attributes:
+      backup: The BackupIndex used to find files in the iOS backup.
       backup_dir: A string that stores the path to the iOS backup.
       contacts_db_path: A string that stores the path to the
                         contacts DB within the iOS backup.
@@ -356,18 +675,26 @@ class IOSModule(BaseModule):
 
         Sets default values for class attributes.
           Subclasses can override these defaults.
-        Adds BACKUP_DIR as a required option for iOS modules.
+        Adds BACKUP_DIR and BACKUP_WORKERS as required options
+        for iOS modules.
         """
         BaseModule.__init__(self, None)
         # Adding iOS Backup Directory as a required
         # option for any iOS Module.
         self.info["options"].insert(0,
-            ["BACKUP_DIR", "", True, "Path to iOS Backup"])
+            ["BACKUP_DIR", "", True, "Path to iOS Backup " \
+                + "(or comma-separated list of paths or glob patterns " \
+                + "of several iOS Backups)"])
+        self.info["options"].insert(1,
+            ["BACKUP_WORKERS", 0, True, "Number of iOS Backups " \
+                + "processed at the same time " \
+                + "(0 for the number of CPUs)."])
         self.require_contacts = False
         self.require_sms = False
         self.contacts_db_path = ""
         self.sms_db_path = ""
         self.backup_dir = ""
+        self.backup = None
         # Load general iOS settings
         # This configuration file is where the
         # path to the iOS backup can be set for all
@@ -385,47 +712,350 @@ class IOSModule(BaseModule):
             self.load_config_file()
 
     # ***************************************************************
-    # COMMANDS
+    # HELPER methods
     # ***************************************************************
 
-    def do_run(self, line):
-        """Implementation of the 'run' command.
+    def _get_backup_dirs(self):
+        """Get the paths of the iOS backups selected by BACKUP_DIR.
+
+        Glob patterns are expanded to the directories they match.
+        Paths that are not patterns (or that are existing directories)
+        are kept as they are, so they are validated by _run_backup().
+
+        Returns:
+          List of paths, in the order of BACKUP_DIR, without duplicates.
+        """
+        backup_dirs = []
+        for pattern in str(self.get_option_value("BACKUP_DIR")).split(","):
+            pattern = pattern.strip()
+            if (pattern == ""):
+                continue
+            if (GLOB_CHARACTERS.search(pattern)
+                and not os.path.isdir(pattern)):
+                paths = sorted([p for p in glob.glob(pattern)
+                    if os.path.isdir(p)])
+            else:
+                paths = [pattern]
+            for path in paths:
+                if (path not in backup_dirs):
+                    backup_dirs.append(path)
+        return backup_dirs
+
+    def _get_backup_output_dirs(self, backup_dirs):
+        """Get the output directory of each iOS backup.
+
+        Each directory is named after the directory of the backup
+        (e.g., output/<UDID>), with a numeric suffix if two backups
+        have the same name.
+
+        Args:
+          backup_dirs: Paths to the iOS backups.
+        """
+        output_dirs = []
+        names = set()
+        for backup_dir in backup_dirs:
+            name = os.path.basename(os.path.abspath(backup_dir))
+            unique_name = name
+            i = 2
+            while (unique_name in names):
+                unique_name = "%s_%d" % (name, i)
+                i += 1
+            names.add(unique_name)
+            output_dirs.append(self.output_dir + "/" + unique_name)
+        return output_dirs
+
+    def _merge_case_databases(self, output_dirs):
+        """Merge the case databases of several backups.
+
+        The workers of _run_backups() save the output of each backup
+        to a case database in its own output directory, so that they
+        do not wait for each other to write. Those databases are
+        added to the case database of the run (in the output
+        directory), as if the backups had been processed one by one.
 
         Args:
           self: Reference to the instance of the class.
-          line: The arguments to the 'run' command.
-                Not used by the 'run' command.
+          output_dirs: Output directories of the backups.
+
+        Returns:
+          False if the case databases could not be merged.
+        """
+        output_format = self.get_option_value("OUTPUT_FORMAT")
+        if (str(output_format).lower() != "sqlite"):
+            return True
+        case_database = self.get_option_value("CASE_DATABASE")
+        paths = [d + "/" + case_database for d in output_dirs
+            if os.path.isfile(d + "/" + case_database)]
+        if (len(paths) == 0):
+            return True
+        if (not os.path.isdir(self.output_dir)):
+            os.mkdir(self.output_dir)
+        file_full_path = self.output_dir + "/" + case_database
+        try:
+            with metrics.document("sqlite", file_full_path):
+                case_db = casedb.CaseDatabase(file_full_path)
+                try:
+                    for path in paths:
+                        case_db.merge(path)
+                finally:
+                    case_db.close()
+        except sqlite3.Error as e:
+            print "Error: Unable to merge the case databases " \
+                + "into '%s' (%s)." % (file_full_path, e)
+            return False
+        print "Output saved to: " + file_full_path
+        return True
+
+    def _run_backup(self, backup_dir, line):
+        """Validate an iOS backup and run the module's code.
+
+        Args:
+          self: Reference to the instance of the class.
+          backup_dir: Path to the iOS backup.
+          line: The arguments to the 'run' command
+                (see BaseModule._parse_run_arguments).
+
+        Returns:
+          True if the module's code was run and succeeded.
         """
         # Validate iOS Backup Directory
-        backup_dir = self.get_option_value("backup_dir")
         if (not os.path.isdir(backup_dir)):
             # Path does not exist
             print "Error: '%s' is not a directory." % backup_dir
-            return
+            return False
         self.backup_dir = backup_dir
+        try:
+            self.backup = backup.get_backup_index(backup_dir)
+        except IOError as e:
+            print "Error: %s" % e
+            return False
 
         if (self.require_contacts):
             # The module needs to use the contacts database
             # Check if contacts database exists
-            self.contacts_db_path = backup_dir + "/" \
-                + iosconstants.Backup.CONTACTS_DB_FILE_NAME_HASH
-            if (not os.path.isfile(self.contacts_db_path)):
+            self.contacts_db_path = self.backup.get_path(
+                iosconstants.Backup.HOME_DOMAIN,
+                iosconstants.Backup.CONTACTS_DB_RELATIVE_PATH)
+            if (self.contacts_db_path is None):
                 print "Error: iOS Contacts DB does not exist " \
                     + "in the BACKUP_DIR provided."
-                return
+                return False
 
         if (self.require_sms):
             # The module needs to use the iMessage/SMS database
             # Check if iMessage/SMS database exists
-            self.sms_db_path = backup_dir + "/" \
-                + iosconstants.Backup.MESSSAGES_DB_FILE_NAME_HASH
-            if (not os.path.isfile(self.sms_db_path)):
+            self.sms_db_path = self.backup.get_path(
+                iosconstants.Backup.HOME_DOMAIN,
+                iosconstants.Backup.MESSAGES_DB_RELATIVE_PATH)
+            if (self.sms_db_path is None):
                 print "Error: iOS Messages DB does not exist " \
                     + "in the BACKUP_DIR provided."
-                return
+                return False
 
         # All validations passed, call
-        # BaseModule's implementation of do_run()
+        # BaseModule's implementation of _run_module()
         # for validations not specific to iOS and
         # to run the module's code.
-        BaseModule.do_run(self, line)
+        return BaseModule._run_module(self, line)
+
+    def _run_backups(self, backup_dirs, line):
+        """Run the module's code on several iOS backups at the same time.
+
+        Each backup is processed by a worker process, with its own
+        output directory (see _get_backup_output_dirs), where the text
+        printed by the module (e.g., tables) is saved to
+        BACKUP_LOG_FILE_NAME. A backup that fails does not stop the
+        others. The metrics of the backups are added to the metrics
+        of the run, the case databases of the backups (if the output
+        format is sqlite) are merged into the case database of the run,
+        and a summary is printed at the end.
+
+        Args:
+          self: Reference to the instance of the class.
+          backup_dirs: Paths to the iOS backups.
+          line: The arguments to the 'run' command
+                (see BaseModule._parse_run_arguments).
+
+        Returns:
+          True if the module's code was run and succeeded
+          on every backup.
+        """
+        workers = self.get_int_option_value("BACKUP_WORKERS")
+        if (workers is None or workers < 0):
+            print "BACKUP_WORKERS must be 0 or a positive integer."
+            return False
+        if (self._validate_run(line) is None):
+            return False
+        if (workers == 0):
+            workers = multiprocessing.cpu_count()
+        workers = min(workers, len(backup_dirs))
+        # The workers create their own instance of the module,
+        # with the same options.
+        tasks = [(self.__class__, self.info["options"], d, o, line)
+            for d, o in zip(backup_dirs,
+                self._get_backup_output_dirs(backup_dirs))]
+        print "Processing %d backups with %d worker(s)..." \
+            % (len(tasks), workers)
+        results = {}
+        pool = multiprocessing.Pool(workers, _init_backup_worker)
+        try:
+            for r in pool.imap_unordered(_run_backup_task, tasks):
+                results[r[0]] = r
+                print "[%d/%d] %s: %s (%.1f s)" \
+                    % (len(results), len(tasks), r[0], r[2], r[3])
+            pool.close()
+        finally:
+            # Stop the workers if the results were not all received
+            # (e.g., the run was interrupted).
+            pool.terminate()
+            pool.join()
+
+        # Summary
+        summary = [["Backup", "Status", "Time (s)", "Output", "Error"]]
+        failed = 0
+        for backup_dir in backup_dirs:
+            r = results[backup_dir]
+            metrics.merge(r[5])
+            if (r[2] != "Done"):
+                failed += 1
+            summary.append([r[0], r[2], "%.1f" % r[3], r[1], r[4]])
+        metrics.increment("backups.processed", len(backup_dirs))
+        metrics.increment("backups.failed", failed)
+        succeeded = self._merge_case_databases([results[d][1]
+            for d in backup_dirs if results[d][2] == "Done"])
+        print "SUMMARY"
+        self._print_table(summary)
+        print "%d of %d backups processed, %d failed." \
+            % (len(backup_dirs) - failed, len(backup_dirs), failed)
+        return succeeded and failed == 0
+
+    def _run_module(self, line):
+        """Validate the iOS backups and run the module's code.
+
+        Args:
+          self: Reference to the instance of the class.
+          line: The arguments to the 'run' command
+                (see BaseModule._parse_run_arguments).
+
+        Returns:
+          True if the module's code was run and succeeded.
+        """
+        backup_dirs = self._get_backup_dirs()
+        if (len(backup_dirs) == 0):
+            print "Error: No iOS Backup matches '%s'." \
+                % self.get_option_value("BACKUP_DIR")
+            return False
+        if (len(backup_dirs) > 1):
+            return self._run_backups(backup_dirs, line)
+        return self._run_backup(backup_dirs[0], line)
+
+    def _save_to_case_database(self, save_function):
+        """Save the output of the module to the sqlite case database.
+
+        The case database is saved to the output directory and named
+        after the CASE_DATABASE option. It is shared by all the modules,
+        so the data extracted by each module is added to it.
+
+        Args:
+          save_function: Method that inserts the rows
+                         (arguments: CaseDatabase and backup ID).
+        """
+        if (not os.path.isdir(self.output_dir)):
+            os.mkdir(self.output_dir)
+        file_full_path = self.output_dir + "/" \
+            + self.get_option_value("CASE_DATABASE")
+        with metrics.document("sqlite", file_full_path):
+            case_db = casedb.CaseDatabase(file_full_path)
+            try:
+                save_function(case_db, case_db.add_backup(self.backup_dir))
+                case_db.commit()
+            finally:
+                case_db.close()
+        print "Output saved to: " + file_full_path
+
+    # ***************************************************************
+    # HOOKS
+    # ***************************************************************
+
+    def postloop(self):
+        """Close the pooled database connections when the module exits.
+
+        Connections to the backup databases are kept open while the
+        module is in use so that consecutive runs can reuse them.
+        """
+        db.close_all()
+
+# ***************************************************************
+# BACKUP WORKERS
+# ***************************************************************
+
+def _init_backup_worker():
+    """Initialize a worker process of IOSModule._run_backups().
+
+    The worker is forked from the process that runs the module, so
+    the database connections and the caches of backup and contact
+    indexes it inherits are discarded.
+    """
+    db.reset_after_fork()
+    backup.clear_backup_indexes()
+    contacts_helper.clear_contact_indexes()
+
+def _run_backup_task(task):
+    """Run a module on an iOS backup in a worker process.
+
+    Args:
+      task: (module class, options, backup directory,
+            output directory, arguments of the 'run' command) tuple.
+
+    Returns:
+      (backup directory, output directory, status (Done or Failed),
+      seconds, error message, metrics) tuple. The backup failed if
+      the module was not run, reported an error (i.e., its run()
+      method returned False) or raised an exception. The error
+      message is the last line printed by the module if the backup
+      failed.
+    """
+    module_class, options, backup_dir, output_dir, line = task
+    mod = module_class()
+    mod.info["options"] = options
+    mod.output_dir = output_dir
+    if (not os.path.isdir(output_dir)):
+        os.makedirs(output_dir)
+    log_path = output_dir + "/" + BACKUP_LOG_FILE_NAME
+    status = "Failed"
+    metrics.reset()
+    start = time.time()
+    stdout = sys.stdout
+    with open(log_path, "w") as log:
+        sys.stdout = log
+        try:
+            with metrics.timer("backup"):
+                if (mod._run_backup(backup_dir, line)):
+                    status = "Done"
+        except Exception:
+            # The error is saved to the log,
+            # and the other backups are not affected.
+            traceback.print_exc(file = log)
+        finally:
+            sys.stdout = stdout
+            db.close_all()
+    elapsed = time.time() - start
+    error = u""
+    if (status != "Done"):
+        error = _get_last_line(log_path)
+    return (backup_dir, output_dir, status, elapsed, error,
+        metrics.get_stats())
+
+def _get_last_line(file_path):
+    """Get the last line of a text file that is not empty.
+
+    Only the end of the file is read, since the file can contain
+    the tables printed by the module.
+    """
+    with open(file_path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(f.tell() - LAST_LINE_MAX_BYTES, 0))
+        lines = [l.strip() for l in f.read().splitlines() if l.strip()]
+    if (len(lines) == 0):
+        return u""
+    return lines[-1].decode("utf-8", "replace")
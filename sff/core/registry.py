@@ -0,0 +1,318 @@
+"""Smartphone Framework Forensics
+    Registry of the modules supported by the framework.
+    Copyright (C) 2017  Sergio A. Nevarez
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+# Abstract Syntax Trees
+# https://docs.python.org/2/library/ast.html
+import ast
+# High-performance container datatypes
+# https://docs.python.org/2/library/collections.html
+from collections import namedtuple
+# Convenience wrappers for __import__
+# https://docs.python.org/2/library/importlib.html
+import importlib
+# JSON encoder and decoder
+# https://docs.python.org/2/library/json.html
+import json
+# Miscellaneous operating system interfaces
+# https://docs.python.org/2/library/os.html
+import os
+
+# Directory (relative to the application path) where modules are stored.
+MODULES_DIR = "lib/modules"
+
+# Name of the file (in MODULES_DIR) where the registry is cached.
+MANIFEST_FILE_NAME = ".manifest.json"
+
+# Version of the manifest format. Manifests with a different
+# version are rebuilt (the module IDs they list are kept).
+MANIFEST_VERSION = 2
+
+# First line of module configuration files.
+# The rest of the line is the name of the module.
+CONFIG_FILE_HEADER = "# Configuration file for module:"
+
+# Modules are implemented by a class with this name.
+MODULE_CLASS_NAME = "Module"
+
+# Information about a module.
+#   id: Module ID shown to the user (e.g., "1").
+#   name: Module name (e.g., mobile/ios/native/contacts/list).
+#   description: Description from the module's metadata.
+#   import_path: Python module that implements the module.
+ModuleEntry = namedtuple("ModuleEntry",
+    ["id", "name", "description", "import_path"])
+
+class ModuleRegistry(object):
+    """Registry of the modules found in the modules directory.
+
+    Modules are discovered by looking for Python files in the modules
+    directory that define a Module class and have a configuration file
+    with the same name. The module name is read from the configuration
+    file header and the description from the module's metadata,
+    without importing the module.
+
+    The registry is cached in a manifest file that is only rebuilt
+    when a file of the modules directory changes. Modules are
+    imported when they are loaded.
+
+    Module IDs are assigned in name order the first time the modules
+    are found, and a module added later gets the next free ID. The
+    IDs are saved to the manifest, so adding or removing a module
+    does not change the ID of the others. The ID of a removed
+    module is not given to another module.
+
+    Attributes:
+      modules: List of ModuleEntry objects sorted by name.
+    """
+    def __init__(self, app_path):
+        """Initializes the registry.
+
+        Args:
+          app_path: Path to the application directory.
+        """
+        self._app_path = app_path
+        self._modules_path = os.path.join(app_path, MODULES_DIR)
+        self._manifest_path = \
+            os.path.join(self._modules_path, MANIFEST_FILE_NAME)
+        self.modules = self._load()
+        self._by_id = {}
+        self._by_name = {}
+        for m in self.modules:
+            self._by_id[m.id] = m
+            self._by_name[m.name] = m
+
+    def get(self, line):
+        """Get a module by name or id.
+
+        Args:
+          line: The module name or module id.
+
+        Returns:
+          The ModuleEntry of the module or None if it does not exist.
+        """
+        entry = self._by_name.get(line)
+        if (entry is None):
+            entry = self._by_id.get(line)
+        return entry
+
+    def load(self, entry):
+        """Import a module and create an instance of it.
+
+        Args:
+          entry: The ModuleEntry of the module.
+
+        Returns:
+          An instance of the module's Module class.
+        """
+        mod = getattr(importlib.import_module(entry.import_path),
+            MODULE_CLASS_NAME)()
+        mod.prompt = "(" + entry.name + ") > "
+        return mod
+
+    # ***************************************************************
+    # HELPER methods
+    # ***************************************************************
+
+    def _build(self, ids):
+        """Walk the modules directory to find the supported modules.
+
+        Args:
+          ids: Dictionary with the IDs already assigned to modules
+               (name -> id). The IDs of new modules are added to it.
+
+        Returns:
+          List of ModuleEntry objects sorted by name.
+        """
+        found = []
+        for root, dirs, files in os.walk(self._modules_path):
+            dirs.sort()
+            for f in sorted(files):
+                name, extension = os.path.splitext(f)
+                if (extension != ".py" or name == "__init__"):
+                    continue
+                config_path = os.path.join(root, name + ".conf")
+                if (not os.path.isfile(config_path)):
+                    continue
+                module_name = _get_module_name(config_path)
+                if (module_name is None):
+                    continue
+                source_path = os.path.join(root, f)
+                description = _get_description(source_path)
+                if (description is None):
+                    # No Module class
+                    continue
+                relative_path = \
+                    os.path.relpath(os.path.join(root, name), self._app_path)
+                found.append((module_name, description,
+                    ".".join(relative_path.split(os.sep))))
+        found.sort()
+        next_id = max([int(id) for id in ids.values()] + [0]) + 1
+        modules = []
+        for m in found:
+            if (m[0] not in ids):
+                ids[m[0]] = str(next_id)
+                next_id += 1
+            modules.append(ModuleEntry(ids[m[0]], m[0], m[1], m[2]))
+        return modules
+
+    def _get_signature(self):
+        """Get a signature of the files in the modules directory.
+
+        The signature changes if a module or configuration file is
+        added, removed or modified.
+        """
+        signature = []
+        for root, dirs, files in os.walk(self._modules_path):
+            dirs.sort()
+            for f in sorted(files):
+                if (not (f.endswith(".py") or f.endswith(".conf"))):
+                    continue
+                path = os.path.join(root, f)
+                stat = os.stat(path)
+                signature.append([os.path.relpath(path, self._modules_path),
+                    stat.st_mtime, stat.st_size])
+        return signature
+
+    def _load(self):
+        """Load the registry from the manifest, rebuilding it if needed.
+
+        Returns:
+          List of ModuleEntry objects sorted by name.
+        """
+        signature = self._get_signature()
+        manifest = None
+        try:
+            with open(self._manifest_path, "r") as manifest_file:
+                manifest = json.load(manifest_file)
+            if (manifest["version"] == MANIFEST_VERSION
+                and manifest["signature"] == signature):
+                return [ModuleEntry(*[str(v) for v in m])
+                    for m in manifest["modules"]]
+        except (IOError, ValueError, KeyError, TypeError):
+            # Missing or invalid manifest
+            pass
+
+        ids = _get_module_ids(manifest)
+        modules = self._build(ids)
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "signature": signature,
+            "modules": [list(m) for m in modules],
+            "ids": ids
+        }
+        temp_path = self._manifest_path + ".tmp"
+        try:
+            with open(temp_path, "w") as manifest_file:
+                json.dump(manifest, manifest_file)
+            os.rename(temp_path, self._manifest_path)
+        except (IOError, OSError):
+            # The registry still works without the cache
+            # (e.g., the application directory is read-only).
+            pass
+        return modules
+
+def _get_description(source_path):
+    """Get the description of a module without importing it.
+
+    Args:
+      source_path: Path to the Python file of the module.
+
+    Returns:
+      The description in the metadata of the Module class,
+      an empty string if the class has no description,
+      or None if the file does not define a Module class.
+    """
+    with open(source_path, "r") as source_file:
+        tree = ast.parse(source_file.read(), source_path)
+    for node in tree.body:
+        if (not isinstance(node, ast.ClassDef)
+            or node.name != MODULE_CLASS_NAME):
+            continue
+        for statement in node.body:
+            if (not isinstance(statement, ast.Assign)
+                or not isinstance(statement.value, ast.Dict)):
+                continue
+            if ([t.id for t in statement.targets
+                if isinstance(t, ast.Name)] != ["info"]):
+                continue
+            for key, value in \
+                zip(statement.value.keys, statement.value.values):
+                if (_get_string(key) == "description"):
+                    return _get_string(value) or ""
+        return ""
+    return None
+
+def _get_module_ids(manifest):
+    """Get the module IDs assigned by a previous manifest.
+
+    Manifests of version 1 have no list of IDs, so the IDs
+    of the modules they list are used instead.
+
+    Args:
+      manifest: The previous manifest or None.
+
+    Returns:
+      Dictionary with the IDs of the modules (name -> id), which
+      is empty if there is no manifest or it is not valid.
+    """
+    try:
+        if ("ids" in manifest):
+            ids = dict([(str(name), str(id))
+                for name, id in manifest["ids"].iteritems()])
+        else:
+            ids = dict([(str(m[1]), str(m[0]))
+                for m in manifest["modules"]])
+        # IDs must be numbers (see ModuleRegistry._build)
+        for id in ids.values():
+            int(id)
+        return ids
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+        return {}
+
+def _get_module_name(config_path):
+    """Get the module name from the header of its configuration file.
+
+    Args:
+      config_path: Path to the configuration file of the module.
+
+    Returns:
+      The module name or None if the file has no header.
+    """
+    with open(config_path, "r") as config_file:
+        header = config_file.readline().strip()
+    if (not header.startswith(CONFIG_FILE_HEADER)):
+        return None
+    return header[len(CONFIG_FILE_HEADER):].strip() or None
+
+def _get_string(node):
+    """Get the value of a string literal (or a concatenation of literals).
+
+    Args:
+      node: The AST node.
+
+    Returns:
+      The string or None if the node is not a string literal.
+    """
+    if (isinstance(node, ast.Str)):
+        return node.s
+    if (isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add)):
+        left = _get_string(node.left)
+        right = _get_string(node.right)
+        if (left is not None and right is not None):
+            return left + right
+    return None
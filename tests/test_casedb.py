@@ -0,0 +1,110 @@
+"""Smartphone Framework Forensics
+    Tests of the sqlite case database.
+    Copyright (C) 2017  Sergio A. Nevarez
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+    Usage: python -m unittest discover -s tests
+"""
+
+# Miscellaneous operating system interfaces
+# https://docs.python.org/2/library/os.html
+import os
+# High-level file operations
+# https://docs.python.org/2/library/shutil.html
+import shutil
+# DB-API 2.0 interface for SQLite databases
+# https://docs.python.org/2/library/sqlite3.html
+import sqlite3
+# System-specific parameters and functions
+# https://docs.python.org/2/library/sys.html
+import sys
+# Generate temporary files and directories
+# https://docs.python.org/2/library/tempfile.html
+import tempfile
+# Unit testing framework
+# https://docs.python.org/2/library/unittest.html
+import unittest
+
+APP_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, APP_PATH)
+
+# The casedb module contains the sqlite case database
+from lib.export import casedb
+
+class MergeTest(unittest.TestCase):
+    """Merge of the case databases of several backups."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix = "sff_test_")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, name, backup_dir, chats):
+        """Write a case database with the chats of a backup.
+
+        Args:
+          name: File name of the case database.
+          backup_dir: Path to the backup.
+          chats: (chat ID, chat identifier) tuples.
+
+        Returns:
+          The path to the case database.
+        """
+        path = os.path.join(self.temp_dir, name)
+        case_db = casedb.CaseDatabase(path)
+        try:
+            case_db.insert("chats", case_db.add_backup(backup_dir), chats)
+            case_db.commit()
+        finally:
+            case_db.close()
+        return path
+
+    def read_chats(self, path):
+        """Read the chats of a case database.
+
+        Returns:
+          Sorted list of (backup directory, chat ID, chat identifier).
+        """
+        conn = sqlite3.connect(path)
+        try:
+            return sorted(conn.execute("SELECT b.backup_dir, " \
+                + "c.chat_id, c.chat_identifier FROM chats c " \
+                + "JOIN backups b ON b.backup_id = c.backup_id").fetchall())
+        finally:
+            conn.close()
+
+    def test_merge(self):
+        path = self.write("case.db", "/backups/a", [(1, u"a1"), (2, u"a2")])
+        merged = [
+            self.write("b.db", "/backups/b", [(1, u"b1")]),
+            # Backup already in the case database
+            self.write("a.db", "/backups/a", [(2, u"a2 new"), (3, u"a3")])
+        ]
+        case_db = casedb.CaseDatabase(path)
+        try:
+            self.assertEqual(case_db.merge(merged[0]), 1)
+            self.assertEqual(case_db.merge(merged[1]), 2)
+        finally:
+            case_db.close()
+        self.assertEqual(self.read_chats(path), [
+            (u"/backups/a", 1, u"a1"),
+            (u"/backups/a", 2, u"a2 new"),
+            (u"/backups/a", 3, u"a3"),
+            (u"/backups/b", 1, u"b1")])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+"""Smartphone Framework Forensics
+    Tests of the contact index of the Address Book.
+    Copyright (C) 2017  Sergio A. Nevarez
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+    Usage: python -m unittest discover -s tests
+"""
+
+# Miscellaneous operating system interfaces
+# https://docs.python.org/2/library/os.html
+import os
+# High-level file operations
+# https://docs.python.org/2/library/shutil.html
+import shutil
+# DB-API 2.0 interface for SQLite databases
+# https://docs.python.org/2/library/sqlite3.html
+import sqlite3
+# System-specific parameters and functions
+# https://docs.python.org/2/library/sys.html
+import sys
+# Generate temporary files and directories
+# https://docs.python.org/2/library/tempfile.html
+import tempfile
+# Unit testing framework
+# https://docs.python.org/2/library/unittest.html
+import unittest
+
+APP_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, APP_PATH)
+
+# Generator of synthetic iOS backups
+from benchmarks import generate_backup
+# The db module includes the code to run queries on sqlite databases.
+from lib.common.db.sqlite import db
+# Helper functions to interact with the contacts db.
+from lib.common.mobile.ios import contacts_helper
+# Import Forensics class, which implements the main menu
+from sff.core.base import Forensics
+
+class ContactIndexTest(unittest.TestCase):
+    """Handles resolved by the contact index."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix = "sff_test_")
+        self.db_path = os.path.join(self.temp_dir, "AddressBook.sqlitedb")
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript(generate_backup.CONTACTS_SCHEMA)
+        conn.executemany("INSERT INTO ABPerson (ROWID, First, Last) " \
+            + "VALUES (?, ?, ?)", [
+                (1, u"Ana", u"Lopez"),
+                (2, u"Bank", None),
+                (3, u"Ben", u"Diaz")])
+        conn.executemany("INSERT INTO ABMultiValue (record_id, value) " \
+            + "VALUES (?, ?)", [
+                (1, u"+1 (555) 123-4567"),
+                (2, u"72265"),
+                (3, u"Ben@Example.com")])
+        conn.commit()
+        conn.close()
+        self.index = contacts_helper.ContactIndex(self.db_path)
+
+    def tearDown(self):
+        db.close_all()
+        shutil.rmtree(self.temp_dir)
+
+    def test_phone_number(self):
+        self.assertEqual(self.index.get_contact_by_id(u"+15551234567"),
+            u"Ana Lopez")
+        self.assertEqual(self.index.get_contact_by_id(u"+15557654321"), u"")
+
+    def test_short_code(self):
+        # Numbers shorter than MIN_PHONE_NUMBER_DIGITS only match
+        # the same digits.
+        self.assertEqual(self.index.get_contact_by_id(u"72265"), u"Bank ")
+        self.assertEqual(self.index.get_contact_by_id(u"2265"), u"")
+        self.assertEqual(self.index.get_contact_by_id(u"4567"), u"")
+
+    def test_email_address(self):
+        self.assertEqual(self.index.get_contact_by_id(u"ben@example.COM"),
+            u"Ben Diaz")
+
+class ModuleLookupTest(unittest.TestCase):
+    """Contact lookups of the modules that show contact information."""
+
+    @classmethod
+    def setUpClass(cls):
+        # The modules read their configuration files from the
+        # directory of the script that was run (i.e., sff.py).
+        sys.argv[0] = os.path.join(APP_PATH, "sff.py")
+        cls.temp_dir = tempfile.mkdtemp(prefix = "sff_test_")
+        cls.backup_dir = os.path.join(cls.temp_dir, "backup")
+        generate_backup.BackupGenerator(cls.backup_dir).generate(
+            2000, 50, 100, attachment_rate = 0)
+
+    @classmethod
+    def tearDownClass(cls):
+        db.close_all()
+        shutil.rmtree(cls.temp_dir)
+
+    def setUp(self):
+        self.get_contact_index = contacts_helper.get_contact_index
+        self.backup_dirs = []
+        def get_contact_index(backup_dir):
+            self.backup_dirs.append(backup_dir)
+            return self.get_contact_index(backup_dir)
+        contacts_helper.get_contact_index = get_contact_index
+
+    def tearDown(self):
+        contacts_helper.get_contact_index = self.get_contact_index
+
+    def run_module(self, name, options):
+        """Run a module on the backup with SHOW_CONTACT_INFO set."""
+        mod = Forensics()._get_module(name)
+        for option, value in [("BACKUP_DIR", self.backup_dir),
+            ("SHOW_CONTACT_INFO", "True")] + options:
+            self.assertTrue(mod.set_option_value(option, value))
+        mod.output_dir = os.path.join(self.temp_dir, "output")
+        stdout = sys.stdout
+        with open(os.devnull, "w") as devnull:
+            sys.stdout = devnull
+            try:
+                mod.onecmd("run")
+            finally:
+                sys.stdout = stdout
+        self.assertTrue(mod.run_succeeded)
+
+    def test_index_is_checked_once_per_run(self):
+        self.run_module("mobile/ios/native/messages/extract_conversations",
+            [("CONVERSATION_IDS", "1-50"), ("OUTPUT_FORMAT", "csv")])
+        self.assertEqual(self.backup_dirs, [self.backup_dir])
+        del self.backup_dirs[:]
+        self.run_module("mobile/ios/native/messages/list",
+            [("OUTPUT_FORMAT", "csv")])
+        self.assertEqual(self.backup_dirs, [self.backup_dir])
+
+if __name__ == "__main__":
+    unittest.main()
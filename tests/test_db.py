@@ -0,0 +1,89 @@
+"""Smartphone Framework Forensics
+    Tests of the read-only access to sqlite databases.
+    Copyright (C) 2017  Sergio A. Nevarez
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+    Usage: python -m unittest discover -s tests
+"""
+
+# Miscellaneous operating system interfaces
+# https://docs.python.org/2/library/os.html
+import os
+# High-level file operations
+# https://docs.python.org/2/library/shutil.html
+import shutil
+# DB-API 2.0 interface for SQLite databases
+# https://docs.python.org/2/library/sqlite3.html
+import sqlite3
+# System-specific parameters and functions
+# https://docs.python.org/2/library/sys.html
+import sys
+# Generate temporary files and directories
+# https://docs.python.org/2/library/tempfile.html
+import tempfile
+# Unit testing framework
+# https://docs.python.org/2/library/unittest.html
+import unittest
+
+APP_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, APP_PATH)
+
+# The db module includes the code to run queries on sqlite databases.
+from lib.common.db.sqlite import db
+
+class ReadOnlyTest(unittest.TestCase):
+    """Evidence databases are never modified."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix = "sff_test_")
+        self.db_path = os.path.join(self.temp_dir, "sms.db")
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("CREATE TABLE message (text TEXT)")
+        conn.execute("INSERT INTO message VALUES ('hello')")
+        conn.commit()
+        conn.close()
+        # The file is older than the test, so a change is detected.
+        os.utime(self.db_path, (1000000000, 1000000000))
+
+    def tearDown(self):
+        db.close_all()
+        shutil.rmtree(self.temp_dir)
+
+    def test_wal_database_is_not_modified(self):
+        self.assertEqual(db.query(self.db_path,
+            "SELECT text FROM message"), [(u"hello",)])
+        self.assertEqual(list(db.iter_query(self.db_path,
+            "SELECT text FROM message")), [(u"hello",)])
+        self.assertEqual(os.listdir(self.temp_dir), ["sms.db"])
+        self.assertEqual(os.path.getmtime(self.db_path), 1000000000)
+
+    def test_write_fails(self):
+        self.assertRaises(sqlite3.Error, db.query, self.db_path,
+            "INSERT INTO message VALUES ('changed')")
+        db.close_all()
+        self.assertEqual(db.query(self.db_path,
+            "SELECT text FROM message"), [(u"hello",)])
+        self.assertEqual(os.listdir(self.temp_dir), ["sms.db"])
+
+    def test_missing_database_is_not_created(self):
+        missing_path = os.path.join(self.temp_dir, "missing.db")
+        self.assertRaises(sqlite3.Error, db.query, missing_path,
+            "SELECT 1")
+        self.assertFalse(os.path.exists(missing_path))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+"""Smartphone Framework Forensics
+    Tests of the messages/extract_conversations module.
+    Copyright (C) 2017  Sergio A. Nevarez
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+    Usage: python -m unittest discover -s tests
+"""
+
+# JSON encoder and decoder
+# https://docs.python.org/2/library/json.html
+import json
+# Miscellaneous operating system interfaces
+# https://docs.python.org/2/library/os.html
+import os
+# High-level file operations
+# https://docs.python.org/2/library/shutil.html
+import shutil
+# System-specific parameters and functions
+# https://docs.python.org/2/library/sys.html
+import sys
+# Generate temporary files and directories
+# https://docs.python.org/2/library/tempfile.html
+import tempfile
+# Unit testing framework
+# https://docs.python.org/2/library/unittest.html
+import unittest
+
+APP_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, APP_PATH)
+
+# Generator of synthetic iOS backups
+from benchmarks import generate_backup
+# The db module includes the code to run queries on sqlite databases.
+from lib.common.db.sqlite import db
+# Import Forensics class, which implements the main menu
+from sff.core.base import Forensics
+
+MODULE_NAME = "mobile/ios/native/messages/extract_conversations"
+
+class ModuleTestCase(unittest.TestCase):
+    """Base class of the tests that run the module on generated backups."""
+
+    @classmethod
+    def setUpClass(cls):
+        # The modules read their configuration files from the
+        # directory of the script that was run (i.e., sff.py).
+        sys.argv[0] = os.path.join(APP_PATH, "sff.py")
+        cls.temp_dir = tempfile.mkdtemp(prefix = "sff_test_")
+        cls.backup_dirs = []
+        for seed in range(2):
+            backup_dir = os.path.join(cls.temp_dir, "backup%d" % seed)
+            generate_backup.BackupGenerator(backup_dir, seed = seed).generate(
+                2000, 10, 50, attachment_rate = 0)
+            cls.backup_dirs.append(backup_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        db.close_all()
+        shutil.rmtree(cls.temp_dir)
+
+    def get_module(self, backup_dir, options):
+        """Create the module and set its options.
+
+        Args:
+          backup_dir: BACKUP_DIR option.
+          options: List of (option, value) tuples.
+        """
+        mod = Forensics()._get_module(MODULE_NAME)
+        for option, value in [("BACKUP_DIR", backup_dir)] + options:
+            self.assertTrue(mod.set_option_value(option, value))
+        return mod
+
+    def run_module(self, mod, output_dir):
+        """Run the module with its output sent to output_dir."""
+        mod.output_dir = output_dir
+        stdout = sys.stdout
+        with open(os.devnull, "w") as devnull:
+            sys.stdout = devnull
+            try:
+                mod.onecmd("run")
+            finally:
+                sys.stdout = stdout
+        self.assertTrue(mod.run_succeeded)
+
+class IncrementalTest(ModuleTestCase):
+    """Incremental html exports (INCREMENTAL option)."""
+
+    def export(self, backup_dir, output_dir):
+        """Export conversations 1-10 of a backup incrementally.
+
+        Returns:
+          The state file and the html file of conversation 1.
+        """
+        self.run_module(self.get_module(backup_dir,
+            [("CONVERSATION_IDS", "1-10"),
+             ("INCREMENTAL", "True"),
+             ("OUTPUT_FORMAT", "html")]), output_dir)
+        with open(os.path.join(output_dir, "conversation.state.json")) as f:
+            state = json.load(f)
+        with open(os.path.join(output_dir, "conversation1.html")) as f:
+            return (state, f.read())
+
+    def test_switch_backup(self):
+        # The checkpoints of another backup are not used, so the
+        # output is the same as the one of a new export.
+        output_dir = os.path.join(self.temp_dir, "switch")
+        self.export(self.backup_dirs[0], output_dir)
+        state, document = self.export(self.backup_dirs[1], output_dir)
+        expected_state, expected_document = self.export(
+            self.backup_dirs[1], os.path.join(self.temp_dir, "new"))
+        self.assertEqual(state["backup_dir"], self.backup_dirs[1])
+        self.assertEqual(state["conversations"],
+            expected_state["conversations"])
+        self.assertEqual(document, expected_document)
+
+if __name__ == "__main__":
+    unittest.main()
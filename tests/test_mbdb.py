@@ -0,0 +1,79 @@
+"""Smartphone Framework Forensics
+    Tests of the parser of Manifest.mbdb files.
+    Copyright (C) 2017  Sergio A. Nevarez
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+    Usage: python -m unittest discover -s tests
+"""
+
+# Miscellaneous operating system interfaces
+# https://docs.python.org/2/library/os.html
+import os
+# High-level file operations
+# https://docs.python.org/2/library/shutil.html
+import shutil
+# System-specific parameters and functions
+# https://docs.python.org/2/library/sys.html
+import sys
+# Generate temporary files and directories
+# https://docs.python.org/2/library/tempfile.html
+import tempfile
+# Unit testing framework
+# https://docs.python.org/2/library/unittest.html
+import unittest
+
+APP_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, APP_PATH)
+
+# The mbdb module reads the list of files of iOS 9 backups.
+from lib.common.mobile.ios import mbdb
+
+class MbdbTest(unittest.TestCase):
+    """Manifest.mbdb files that are empty or damaged."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix = "sff_test_")
+        self.path = os.path.join(self.temp_dir, "Manifest.mbdb")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, data):
+        """Write the Manifest.mbdb file."""
+        with open(self.path, "wb") as f:
+            f.write(data)
+
+    def test_empty_file(self):
+        self.write("")
+        self.assertRaises(IOError, mbdb.Mbdb, self.path)
+
+    def test_truncated_header(self):
+        self.write(mbdb.HEADER[:3])
+        self.assertRaises(IOError, mbdb.Mbdb, self.path)
+
+    def test_not_a_manifest(self):
+        self.write("SQLite format 3\x00")
+        self.assertRaises(IOError, mbdb.Mbdb, self.path)
+
+    def test_truncated_record(self):
+        # Domain "HomeDomain" and a path that ends after 2 bytes
+        self.write(mbdb.HEADER + "\x00\x0aHomeDomain\x00\x05ab")
+        manifest = mbdb.Mbdb(self.path)
+        self.assertEqual(list(manifest), [])
+        self.assertEqual(manifest.get((u"HomeDomain", u"ab")), None)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,161 @@
+"""Smartphone Framework Forensics
+    Tests of the metrics of module runs.
+    Copyright (C) 2017  Sergio A. Nevarez
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+    Usage: python -m unittest discover -s tests
+"""
+
+# Miscellaneous operating system interfaces
+# https://docs.python.org/2/library/os.html
+import os
+# High-level file operations
+# https://docs.python.org/2/library/shutil.html
+import shutil
+# System-specific parameters and functions
+# https://docs.python.org/2/library/sys.html
+import sys
+# DB-API 2.0 interface for SQLite databases
+# https://docs.python.org/2/library/sqlite3.html
+import sqlite3
+# Generate temporary files and directories
+# https://docs.python.org/2/library/tempfile.html
+import tempfile
+# Unit testing framework
+# https://docs.python.org/2/library/unittest.html
+import unittest
+
+APP_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, APP_PATH)
+
+# Generator of synthetic iOS backups
+from benchmarks import generate_backup
+# The db module includes the code to run queries on sqlite databases.
+from lib.common.db.sqlite import db
+# The metrics module keeps the counters and timers of the current run.
+from lib.common import metrics
+# Import Forensics class, which implements the main menu
+from sff.core.base import Forensics
+
+# Query that takes about the same time to find each of its 3 rows
+# (the multiples of 500000 up to 1500000).
+SLOW_QUERY = "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL " \
+    + "SELECT x + 1 FROM n WHERE x < 1500000) " \
+    + "SELECT x FROM n WHERE x % 500000 = 0"
+
+class DocumentTest(unittest.TestCase):
+    """Time of the documents measured by metrics.document()."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix = "sff_test_")
+        self.db_path = os.path.join(self.temp_dir, "test.db")
+        sqlite3.connect(self.db_path).close()
+        metrics.reset()
+
+    def tearDown(self):
+        db.close_all()
+        metrics.reset()
+        shutil.rmtree(self.temp_dir)
+
+    def test_query_read_by_several_documents(self):
+        # The rows of one query are written to two documents,
+        # so each document only excludes the time of its own rows.
+        rows = db.iter_query(self.db_path, SLOW_QUERY, batch_size = 1)
+        with metrics.document("first"):
+            self.assertEqual(next(rows), (500000,))
+        with metrics.document("second"):
+            self.assertEqual(list(rows), [(1000000,), (1500000,)])
+        stats = metrics.get_stats()
+        self.assertGreaterEqual(stats["timers"]["render.first"]["seconds"],
+            0)
+        self.assertGreaterEqual(
+            stats["timers"]["render.second"]["seconds"], 0)
+        self.assertEqual(stats["timers"]["db.query"]["calls"], 1)
+        self.assertEqual(stats["counters"]["db.rows"], 3)
+
+class RenderTimeTest(unittest.TestCase):
+    """Render timers of extract_conversations."""
+
+    @classmethod
+    def setUpClass(cls):
+        # The modules read their configuration files from the
+        # directory of the script that was run (i.e., sff.py).
+        sys.argv[0] = os.path.join(APP_PATH, "sff.py")
+        cls.temp_dir = tempfile.mkdtemp(prefix = "sff_test_")
+        cls.backup_dir = os.path.join(cls.temp_dir, "backup")
+        generate_backup.BackupGenerator(cls.backup_dir).generate(
+            20000, 50, 200, attachment_rate = 0)
+
+    @classmethod
+    def tearDownClass(cls):
+        db.close_all()
+        shutil.rmtree(cls.temp_dir)
+
+    def run_module(self, output_format, keywords = ""):
+        """Extract every conversation of the backup.
+
+        Args:
+          output_format: OUTPUT_FORMAT option.
+          keywords: KEYWORDS option.
+
+        Returns:
+          The metrics of the run (see metrics.get_stats).
+        """
+        mod = Forensics()._get_module(
+            "mobile/ios/native/messages/extract_conversations")
+        for option, value in [("BACKUP_DIR", self.backup_dir),
+            ("CONVERSATION_IDS", "1-50"),
+            ("KEYWORDS", keywords),
+            ("OUTPUT_FORMAT", output_format)]:
+            self.assertTrue(mod.set_option_value(option, value))
+        mod.output_dir = os.path.join(self.temp_dir, "output")
+        stdout = sys.stdout
+        with open(os.devnull, "w") as devnull:
+            sys.stdout = devnull
+            try:
+                mod.onecmd("run")
+            finally:
+                sys.stdout = stdout
+        self.assertTrue(mod.run_succeeded)
+        return mod.stats
+
+    def assert_render_times(self, stats, output_format):
+        """Check that the render timers of a run are not negative."""
+        self.assertIn("render." + output_format, stats["timers"])
+        for name, t in stats["timers"].iteritems():
+            if (name.startswith("render.")):
+                self.assertGreaterEqual(t["seconds"], 0, name)
+
+    def test_html(self):
+        self.assert_render_times(self.run_module("html"), "html")
+
+    def test_html_with_keywords(self):
+        self.assert_render_times(
+            self.run_module("html", "noon, love, sounds"), "html")
+
+    def test_stdout_with_keywords(self):
+        self.assert_render_times(
+            self.run_module("stdout", "noon, love, sounds"), "stdout")
+
+    def test_query_calls(self):
+        # Each query is counted once, however many batches it reads.
+        stats = self.run_module("csv")
+        self.assertGreater(stats["counters"]["db.rows"],
+            db.FETCH_BATCH_SIZE)
+        self.assertLess(stats["timers"]["db.query"]["calls"], 10)
+
+if __name__ == "__main__":
+    unittest.main()
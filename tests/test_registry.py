@@ -0,0 +1,107 @@
+"""Smartphone Framework Forensics
+    Tests of the registry of modules.
+    Copyright (C) 2017  Sergio A. Nevarez
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+    Usage: python -m unittest discover -s tests
+"""
+
+# Miscellaneous operating system interfaces
+# https://docs.python.org/2/library/os.html
+import os
+# High-level file operations
+# https://docs.python.org/2/library/shutil.html
+import shutil
+# System-specific parameters and functions
+# https://docs.python.org/2/library/sys.html
+import sys
+# Generate temporary files and directories
+# https://docs.python.org/2/library/tempfile.html
+import tempfile
+# Unit testing framework
+# https://docs.python.org/2/library/unittest.html
+import unittest
+
+APP_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, APP_PATH)
+
+# The registry module finds the modules supported by the framework.
+from sff.core import registry
+
+class ModuleIdTest(unittest.TestCase):
+    """IDs of the modules found by the registry."""
+
+    def setUp(self):
+        self.app_path = tempfile.mkdtemp(prefix = "sff_test_")
+        os.makedirs(os.path.join(self.app_path, registry.MODULES_DIR))
+
+    def tearDown(self):
+        shutil.rmtree(self.app_path)
+
+    def add_module(self, name):
+        """Write a module and its configuration file.
+
+        Args:
+          name: Name of the module (e.g., messages/list). The files
+                are named after its last part.
+        """
+        file_name = os.path.join(self.app_path, registry.MODULES_DIR,
+            name.split("/")[-1])
+        with open(file_name + ".py", "w") as source_file:
+            source_file.write("class Module(object):\n"
+                + "    info = {\"description\": \"Test\"}\n")
+        with open(file_name + ".conf", "w") as config_file:
+            config_file.write(registry.CONFIG_FILE_HEADER + " " + name + "\n")
+
+    def remove_module(self, name):
+        """Remove the files written by add_module()."""
+        file_name = os.path.join(self.app_path, registry.MODULES_DIR,
+            name.split("/")[-1])
+        os.remove(file_name + ".py")
+        os.remove(file_name + ".conf")
+
+    def get_ids(self):
+        """Get the IDs of the modules (name -> id)."""
+        return dict([(m.name, m.id)
+            for m in registry.ModuleRegistry(self.app_path).modules])
+
+    def test_ids_follow_names(self):
+        self.add_module("test/b")
+        self.add_module("test/a")
+        self.assertEqual(self.get_ids(), {"test/a": "1", "test/b": "2"})
+
+    def test_new_module_gets_next_free_id(self):
+        self.add_module("test/b")
+        self.add_module("test/c")
+        self.get_ids()
+        self.add_module("test/a")
+        self.assertEqual(self.get_ids(),
+            {"test/a": "3", "test/b": "1", "test/c": "2"})
+
+    def test_removed_module_id_is_not_reused(self):
+        self.add_module("test/a")
+        self.add_module("test/b")
+        self.get_ids()
+        self.remove_module("test/a")
+        self.assertEqual(self.get_ids(), {"test/b": "2"})
+        self.add_module("test/c")
+        self.assertEqual(self.get_ids(), {"test/b": "2", "test/c": "3"})
+        self.add_module("test/a")
+        self.assertEqual(self.get_ids(),
+            {"test/a": "1", "test/b": "2", "test/c": "3"})
+
+if __name__ == "__main__":
+    unittest.main()
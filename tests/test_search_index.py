@@ -0,0 +1,125 @@
+"""Smartphone Framework Forensics
+    Tests of the keyword searches in the full-text index of the messages.
+    Copyright (C) 2017  Sergio A. Nevarez
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+    Usage: python -m unittest discover -s tests
+"""
+
+# Miscellaneous operating system interfaces
+# https://docs.python.org/2/library/os.html
+import os
+# High-level file operations
+# https://docs.python.org/2/library/shutil.html
+import shutil
+# System-specific parameters and functions
+# https://docs.python.org/2/library/sys.html
+import sys
+# Generate temporary files and directories
+# https://docs.python.org/2/library/tempfile.html
+import tempfile
+# Unit testing framework
+# https://docs.python.org/2/library/unittest.html
+import unittest
+
+APP_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, APP_PATH)
+
+# Generator of synthetic iOS backups
+from benchmarks import generate_backup
+# The db module includes the code to run queries on sqlite databases.
+from lib.common.db.sqlite import db
+# The search_index module builds the full-text index of the messages.
+from lib.common.mobile.ios import search_index
+# Import Forensics class, which implements the main menu
+from sff.core.base import Forensics
+
+KEYWORDS = ["noon", "love", "sounds"]
+
+class QueryPlanTest(unittest.TestCase):
+    """Keywords searched in the index by the messages modules."""
+
+    @classmethod
+    def setUpClass(cls):
+        # The modules read their configuration files from the
+        # directory of the script that was run (i.e., sff.py).
+        sys.argv[0] = os.path.join(APP_PATH, "sff.py")
+        cls.temp_dir = tempfile.mkdtemp(prefix = "sff_test_")
+        cls.backup_dir = os.path.join(cls.temp_dir, "backup")
+        generate_backup.BackupGenerator(cls.backup_dir).generate(
+            2000, 10, 50, attachment_rate = 0)
+
+    @classmethod
+    def tearDownClass(cls):
+        db.close_all()
+        shutil.rmtree(cls.temp_dir)
+
+    def run_module(self, name, options):
+        """Run a module on the backup with the KEYWORDS set.
+
+        Args:
+          name: Name of the module.
+          options: List of (option, value) tuples.
+
+        Returns:
+          The module, with the index attached to its database.
+        """
+        mod = Forensics()._get_module(name)
+        for option, value in [("BACKUP_DIR", self.backup_dir),
+            ("KEYWORDS", ", ".join(KEYWORDS)),
+            ("OUTPUT_FORMAT", "csv")] + options:
+            self.assertTrue(mod.set_option_value(option, value))
+        mod.output_dir = os.path.join(self.temp_dir, "output")
+        stdout = sys.stdout
+        with open(os.devnull, "w") as devnull:
+            sys.stdout = devnull
+            try:
+                mod.onecmd("run")
+            finally:
+                sys.stdout = stdout
+        self.assertTrue(mod.run_succeeded)
+        search_index.attach_index(mod.sms_db_path, mod.output_dir + "/cache")
+        return mod
+
+    def assert_index_used(self, mod, query, params):
+        """Check that every keyword is looked up in the trigram index.
+
+        A LIKE constraint that is not used by the index shows as a
+        scan of the table without arguments ("INDEX 0:").
+        """
+        plan = [r[3] for r in db.query(mod.sms_db_path,
+            "EXPLAIN QUERY PLAN " + query, params)]
+        self.assertEqual(len([p for p in plan
+            if p.endswith("message_fts VIRTUAL TABLE INDEX 0:L0")]),
+            len(KEYWORDS), plan)
+        self.assertEqual([p for p in plan if p.endswith("INDEX 0:")], [],
+            plan)
+
+    def test_extract_conversations(self):
+        mod = self.run_module(
+            "mobile/ios/native/messages/extract_conversations",
+            [("CONVERSATION_IDS", "1-10"), ("SEARCH_INDEX", "True")])
+        self.assertTrue(mod.search_index_attached)
+        self.assert_index_used(mod, mod._get_query(1),
+            tuple([1, 10, 0] + ["%" + k + "%" for k in KEYWORDS]))
+
+    def test_search_messages(self):
+        mod = self.run_module("mobile/ios/native/messages/search", [])
+        self.assert_index_used(mod, mod._get_query(len(KEYWORDS), 0, 0),
+            tuple(["%" + k + "%" for k in KEYWORDS]))
+
+if __name__ == "__main__":
+    unittest.main()
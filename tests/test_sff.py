@@ -0,0 +1,97 @@
+"""Smartphone Framework Forensics
+    Tests of the non-interactive entry point (sff.py run).
+    Copyright (C) 2017  Sergio A. Nevarez
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+    Usage: python -m unittest discover -s tests
+"""
+
+# Miscellaneous operating system interfaces
+# https://docs.python.org/2/library/os.html
+import os
+# High-level file operations
+# https://docs.python.org/2/library/shutil.html
+import shutil
+# Subprocess management
+# https://docs.python.org/2/library/subprocess.html
+import subprocess
+# System-specific parameters and functions
+# https://docs.python.org/2/library/sys.html
+import sys
+# Generate temporary files and directories
+# https://docs.python.org/2/library/tempfile.html
+import tempfile
+# Unit testing framework
+# https://docs.python.org/2/library/unittest.html
+import unittest
+
+APP_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, APP_PATH)
+
+# Generator of synthetic iOS backups
+from benchmarks import generate_backup
+
+def run_sff(*args):
+    """Run sff.py in a new process.
+
+    Args:
+      args: Arguments of sff.py (e.g., run, 3).
+
+    Returns:
+      The exit status of sff.py.
+    """
+    with open(os.devnull, "w") as devnull:
+        return subprocess.call(
+            [sys.executable, os.path.join(APP_PATH, "sff.py")] + list(args),
+            stdout = devnull, stderr = subprocess.STDOUT)
+
+class RunExitStatusTest(unittest.TestCase):
+    """Exit status of sff.py run."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.mkdtemp(prefix = "sff_test_")
+        cls.backup_dir = os.path.join(cls.temp_dir, "backup")
+        generate_backup.BackupGenerator(cls.backup_dir).generate(
+            200, 5, 20, attachment_rate = 0)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.temp_dir)
+
+    def test_run_succeeds(self):
+        self.assertEqual(run_sff("run", "3",
+            "--set", "BACKUP_DIR=" + self.backup_dir), 0)
+
+    def test_backup_dir_does_not_exist(self):
+        self.assertEqual(run_sff("run", "3",
+            "--set", "BACKUP_DIR=/nonexistent"), 1)
+
+    def test_unsupported_output_format(self):
+        for module in ["1", "2", "3"]:
+            self.assertEqual(run_sff("run", module,
+                "--set", "BACKUP_DIR=" + self.backup_dir,
+                "--set", "OUTPUT_FORMAT=xml"), 1)
+
+    def test_module_does_not_exist(self):
+        self.assertEqual(run_sff("run", "nonexistent/module"), 1)
+
+    def test_option_does_not_exist(self):
+        self.assertEqual(run_sff("run", "3",
+            "--set", "NONEXISTENT=1"), 1)
+
+if __name__ == "__main__":
+    unittest.main()